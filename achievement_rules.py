@@ -0,0 +1,188 @@
+from sqlalchemy import func, insert
+
+from app import db
+from models import Category, Achievement
+from utils import get_user_stats, adjust_user_stats, dialect_insert, effective_streak
+from utils import USER_STATS_COUNTERS, task_history
+
+# Achievement rule registry.
+#
+# Each rule awards an achievement once the metric it names reaches its
+# threshold. Metrics are a UserStats counter (e.g. 'completed_count'), a
+# streak ('current_streak', 'longest_streak') or one of the keyed metrics
+# below, which take a 'key':
+#   'completed_with_priority' - completed tasks with priority == key
+#   'completed_in_category'   - completed tasks in the category named key
+ACHIEVEMENT_RULES = [
+    {
+        'name': 'Task Beginner',
+        'description': 'Complete your first task',
+        'metric': 'completed_count',
+        'threshold': 1,
+        'trophy_level': 1
+    },
+    {
+        'name': 'Task Enthusiast',
+        'description': 'Complete 10 tasks',
+        'metric': 'completed_count',
+        'threshold': 10,
+        'trophy_level': 1
+    },
+    {
+        'name': 'Task Master',
+        'description': 'Complete 25 tasks',
+        'metric': 'completed_count',
+        'threshold': 25,
+        'trophy_level': 2
+    },
+    {
+        'name': 'Task Guru',
+        'description': 'Complete 50 tasks',
+        'metric': 'completed_count',
+        'threshold': 50,
+        'trophy_level': 2
+    },
+    {
+        'name': 'Task Legend',
+        'description': 'Complete 100 tasks',
+        'metric': 'completed_count',
+        'threshold': 100,
+        'trophy_level': 3
+    },
+    {
+        'name': 'Priority Handler',
+        'description': 'Complete 5 high-priority tasks',
+        'metric': 'high_priority_completed',
+        'threshold': 5,
+        'trophy_level': 1
+    },
+    {
+        'name': 'Priority Master',
+        'description': 'Complete 20 high-priority tasks',
+        'metric': 'high_priority_completed',
+        'threshold': 20,
+        'trophy_level': 2
+    },
+    {
+        'name': 'On a Roll',
+        'description': 'Complete tasks 3 days in a row',
+        'metric': 'longest_streak',
+        'threshold': 3,
+        'trophy_level': 1
+    },
+    {
+        'name': 'Unstoppable',
+        'description': 'Complete tasks 7 days in a row',
+        'metric': 'longest_streak',
+        'threshold': 7,
+        'trophy_level': 2
+    },
+    {
+        'name': 'Habit Former',
+        'description': 'Complete tasks 30 days in a row',
+        'metric': 'longest_streak',
+        'threshold': 30,
+        'trophy_level': 3
+    },
+    {
+        'name': 'Work Horse',
+        'description': 'Complete 25 tasks in the Work category',
+        'metric': 'completed_in_category',
+        'key': 'Work',
+        'threshold': 25,
+        'trophy_level': 2
+    },
+]
+
+STREAK_METRICS = ('current_streak', 'longest_streak')
+
+def build_metrics_snapshot(user_id, metrics):
+    """Collect the values of the given metrics for a user.
+    
+    Counter and streak metrics come from the UserStats row; keyed metrics are only
+    queried when a pending rule needs them, with one grouped query each.
+    """
+    snapshot = {}
+    
+    if metrics & set(USER_STATS_COUNTERS + STREAK_METRICS):
+        stats = get_user_stats(user_id)
+        for name in USER_STATS_COUNTERS:
+            snapshot[name] = getattr(stats, name)
+        snapshot['current_streak'] = effective_streak(stats)
+        snapshot['longest_streak'] = stats.longest_streak
+    
+    # Keyed metrics count archived tasks too
+    if 'completed_with_priority' in metrics:
+        tasks = task_history([user_id])
+        rows = db.session.query(tasks.c.priority, func.count(tasks.c.id)).filter(
+            tasks.c.is_completed == True
+        ).group_by(tasks.c.priority)
+        snapshot['completed_with_priority'] = dict(rows)
+    
+    if 'completed_in_category' in metrics:
+        tasks = task_history([user_id])
+        rows = db.session.query(Category.name, func.count(tasks.c.id)).join(
+            tasks, tasks.c.category_id == Category.id
+        ).filter(
+            tasks.c.is_completed == True
+        ).group_by(Category.name)
+        snapshot['completed_in_category'] = dict(rows)
+    
+    return snapshot
+
+def metric_value(snapshot, rule):
+    """Get the value of a rule's metric from a snapshot."""
+    value = snapshot.get(rule['metric'], 0)
+    if 'key' in rule:
+        value = value.get(rule['key'], 0) if value else 0
+    return value
+
+def _insert_achievements(user_id, rules):
+    """Insert achievements for the given rules, skipping ones already earned.
+    
+    Relies on the (user_id, name) unique constraint so concurrent evaluations
+    cannot award the same achievement twice. Returns the names inserted.
+    """
+    rows = [
+        {
+            'name': rule['name'],
+            'description': rule['description'],
+            'trophy_level': rule['trophy_level'],
+            'user_id': user_id
+        }
+        for rule in rules
+    ]
+    
+    stmt = dialect_insert(Achievement)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=['user_id', 'name'])
+    else:
+        stmt = insert(Achievement)
+    
+    result = db.session.execute(stmt.returning(Achievement.name), rows)
+    return {name for (name,) in result}
+
+def calculate_achievements(user_id):
+    """Evaluate every achievement rule for a user and award the new ones.
+    
+    The user's earned set is loaded once, all pending rules are checked
+    against a single metrics snapshot and new awards go in with one bulk
+    insert. Returns the rules that were awarded. Callers commit.
+    """
+    earned = {
+        name for (name,) in db.session.query(Achievement.name).filter(
+            Achievement.user_id == user_id
+        )
+    }
+    pending = [rule for rule in ACHIEVEMENT_RULES if rule['name'] not in earned]
+    if not pending:
+        return []
+    
+    snapshot = build_metrics_snapshot(user_id, {rule['metric'] for rule in pending})
+    reached = [rule for rule in pending if metric_value(snapshot, rule) >= rule['threshold']]
+    if not reached:
+        return []
+    
+    inserted = _insert_achievements(user_id, reached)
+    adjust_user_stats(user_id, achievements_count=len(inserted))
+    return [rule for rule in reached if rule['name'] in inserted]
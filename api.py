@@ -0,0 +1,342 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, jsonify, request
+from flask_login import current_user, login_required
+from sqlalchemy import literal, select, tuple_, union_all
+
+from app import db
+from models import Task, SubTask, ArchivedTask, ArchivedSubTask, Category, Achievement
+from utils import apply_task_filters, encode_task_cursor, decode_task_cursor
+from conditional import conditional_on_user_data
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+
+# Fields each resource can return, by name. ?fields= picks a subset; the
+# ids are always included.
+TASK_FIELDS = {
+    'id': Task.id,
+    'title': Task.title,
+    'description': Task.description,
+    'due_date': Task.due_date,
+    'due_time': Task.due_time,
+    'priority': Task.priority,
+    'status': Task.status,
+    'progress': Task.progress,
+    'track_progress': Task.track_progress,
+    'is_recurring': Task.is_recurring,
+    'is_completed': Task.is_completed,
+    'completed_at': Task.completed_at,
+    'created_at': Task.created_at,
+    'last_updated': Task.last_updated,
+    'category_id': Task.category_id,
+    'subtask_total': Task.subtask_total,
+    'subtask_done': Task.subtask_done,
+}
+
+# The same fields of archived tasks, which keep the id they had in task_id
+ARCHIVED_TASK_FIELDS = {
+    name: ArchivedTask.task_id if name == 'id' else getattr(ArchivedTask, name)
+    for name in TASK_FIELDS
+}
+
+SUBTASK_FIELDS = {
+    'id': SubTask.id,
+    'task_id': SubTask.task_id,
+    'title': SubTask.title,
+    'is_completed': SubTask.is_completed,
+}
+
+CATEGORY_FIELDS = {
+    'id': Category.id,
+    'name': Category.name,
+    'is_default': Category.is_default,
+}
+
+ACHIEVEMENT_FIELDS = {
+    'id': Achievement.id,
+    'name': Achievement.name,
+    'description': Achievement.description,
+    'trophy_level': Achievement.trophy_level,
+    'earned_at': Achievement.earned_at,
+}
+
+# Related resources ?include= can embed in tasks
+TASK_INCLUDES = ('subtasks', 'category')
+
+class ApiError(Exception):
+    """A client error, answered with {"error": message} and status 400."""
+
+@api_bp.errorhandler(ApiError)
+def api_error(error):
+    return jsonify({'error': str(error)}), 400
+
+def _json_default(value):
+    return value.isoformat()
+
+def json_response(payload, status=200):
+    """Serialize payload with orjson when it is installed."""
+    if orjson is not None:
+        body = orjson.dumps(payload, default=_json_default)
+    else:
+        body = json.dumps(payload, default=_json_default, separators=(',', ':'))
+    return Response(body, status=status, mimetype='application/json')
+
+def _fields(available):
+    """Names of the fields to return, from ?fields= (default: all)."""
+    requested = request.args.get('fields')
+    if not requested:
+        return list(available)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}; allowed: {', '.join(available)}")
+    return ['id'] + [name for name in names if name != 'id']
+
+def _includes():
+    requested = request.args.get('include')
+    if not requested:
+        return ()
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in TASK_INCLUDES]
+    if unknown:
+        raise ApiError(f"Unknown include: {', '.join(unknown)}; allowed: {', '.join(TASK_INCLUDES)}")
+    return names
+
+def _limit():
+    try:
+        limit = int(request.args.get('limit') or API_PAGE_SIZE)
+    except ValueError:
+        raise ApiError('Invalid limit')
+    return max(1, min(limit, API_MAX_PAGE_SIZE))
+
+def _encode_cursor(*key):
+    return base64.urlsafe_b64encode(json.dumps(key, default=_json_default).encode()).decode()
+
+def _decode_cursor(cursor, *types):
+    """Decode a cursor from _encode_cursor into values of the given types."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return tuple(cast(value) for cast, value in zip(types, key, strict=True))
+    except (TypeError, ValueError, UnicodeError):
+        raise ApiError('Invalid cursor')
+
+def _rows(query, names):
+    """Turn row tuples into dicts keyed by names."""
+    return [dict(zip(names, row)) for row in query]
+
+def _page(items, limit, encode_cursor):
+    """Build a list response from limit + 1 fetched (item, sort key) pairs."""
+    has_more = len(items) > limit
+    items = items[:limit]
+    return {
+        'data': [item for item, _ in items],
+        'next_cursor': encode_cursor(*items[-1][1]) if has_more else None,
+    }
+
+def _embed(tasks, includes):
+    """Embed subtasks and categories into task dicts, one query per include.
+    
+    Tasks with the archived helper key get their subtasks from the archive.
+    """
+    if not tasks:
+        return
+    if 'subtasks' in includes:
+        by_task = {
+            task['id']: task.setdefault('subtasks', [])
+            for task in tasks if not task.get('archived')
+        }
+        by_archived_task = {
+            task['id']: task.setdefault('subtasks', [])
+            for task in tasks if task.get('archived')
+        }
+        names = list(SUBTASK_FIELDS)
+        if by_task:
+            subtasks = db.session.query(*SUBTASK_FIELDS.values()).filter(
+                SubTask.task_id.in_(by_task)
+            ).order_by(SubTask.task_id, SubTask.id)
+            for subtask in _rows(subtasks, names):
+                by_task[subtask['task_id']].append(subtask)
+        if by_archived_task:
+            subtasks = db.session.query(
+                ArchivedSubTask.id, ArchivedTask.task_id, ArchivedSubTask.title, ArchivedSubTask.is_completed
+            ).join(ArchivedTask).filter(
+                ArchivedTask.user_id == current_user.id,
+                ArchivedTask.task_id.in_(by_archived_task)
+            ).order_by(ArchivedTask.task_id, ArchivedSubTask.id)
+            for subtask in _rows(subtasks, names):
+                by_archived_task[subtask['task_id']].append(subtask)
+    if 'category' in includes:
+        category_ids = {task['category_id'] for task in tasks}
+        categories = {
+            category['id']: category
+            for category in _rows(
+                db.session.query(*CATEGORY_FIELDS.values()).filter(
+                    Category.id.in_(category_ids)
+                ), list(CATEGORY_FIELDS)
+            )
+        }
+        for task in tasks:
+            task['category'] = categories.get(task['category_id'])
+
+def _task_columns(names, includes, fields=TASK_FIELDS):
+    # category_id is needed to embed the category even when not requested
+    columns = [fields[name] for name in names]
+    if 'category' in includes and 'category_id' not in names:
+        columns.append(fields['category_id'])
+    return columns
+
+def _filtered(query, filters, model):
+    try:
+        return apply_task_filters(query, filters, model)
+    except ValueError:
+        raise ApiError('Invalid category_id or priority')
+
+def _strip_helpers(tasks, names):
+    for task in tasks:
+        for key in list(task):
+            if key not in names and key not in TASK_INCLUDES:
+                del task[key]
+
+@api_bp.route('/tasks')
+@login_required
+@conditional_on_user_data
+def list_tasks():
+    """List the user's tasks, one page at a time.
+    
+    status=active (the default) lists incomplete tasks by due date, like
+    filter_tasks, and accepts the same category_id/priority filters;
+    status=completed lists completed tasks, most recent first, archived
+    ones included under the id they had; /tasks/<id> does not serve those.
+    Pass next_cursor back as cursor for the next page.
+    """
+    names = _fields(TASK_FIELDS)
+    includes = _includes()
+    limit = _limit()
+    cursor = request.args.get('cursor')
+    status = request.args.get('status', 'active')
+    
+    filters = {
+        'category_id': request.args.get('category_id'),
+        'priority': request.args.get('priority'),
+    }
+    columns = _task_columns(names, includes)
+    
+    if status == 'active':
+        key = (Task.due_date, Task.due_time, Task.id)
+        query = _filtered(db.session.query(*columns).filter(
+            Task.user_id == current_user.id, Task.is_completed == False
+        ), filters, Task)
+        if cursor:
+            try:
+                query = query.filter(tuple_(*key) > decode_task_cursor(cursor))
+            except ValueError:
+                raise ApiError('Invalid cursor')
+        rows = query.order_by(*key).add_columns(*key, literal(False)).limit(limit + 1).all()
+        encode_cursor = encode_task_cursor
+    elif status == 'completed':
+        # Live and archived completed tasks; the columns are labeled by
+        # position so that both halves of the union line up
+        halves = []
+        for model, fields, archived in ((Task, TASK_FIELDS, False), (ArchivedTask, ARCHIVED_TASK_FIELDS, True)):
+            half = _task_columns(names, includes, fields) + [model.completed_at, fields['id'], literal(archived)]
+            halves.append(_filtered(
+                select(*(column.label(f'c{i}') for i, column in enumerate(half))).where(
+                    model.user_id == current_user.id, model.is_completed == True
+                ), filters, model
+            ))
+        completed = union_all(*halves).subquery('completed')
+        key = (completed.c[len(columns)], completed.c[len(columns) + 1])
+        query = select(completed)
+        if cursor:
+            query = query.where(tuple_(*key) < _decode_cursor(cursor, datetime.fromisoformat, int))
+        rows = db.session.execute(
+            query.order_by(key[0].desc(), key[1].desc()).limit(limit + 1)
+        ).all()
+        encode_cursor = _encode_cursor
+    else:
+        raise ApiError('status must be active or completed')
+    
+    task_names = names + (['category_id'] if len(columns) > len(names) else [])
+    items = [
+        (dict(zip(task_names, row[:len(columns)]), archived=row[-1]), tuple(row[len(columns):-1]))
+        for row in rows
+    ]
+    page = _page(items, limit, encode_cursor)
+    _embed(page['data'], includes)
+    _strip_helpers(page['data'], names)
+    return json_response(page)
+
+@api_bp.route('/tasks/<int:task_id>')
+@login_required
+@conditional_on_user_data
+def get_task(task_id):
+    names = _fields(TASK_FIELDS)
+    includes = _includes()
+    columns = _task_columns(names, includes)
+    row = db.session.query(*columns).filter(
+        Task.id == task_id, Task.user_id == current_user.id
+    ).first()
+    if row is None:
+        return json_response({'error': 'Task not found'}, 404)
+    
+    task = dict(zip(names + ['category_id'], row))
+    _embed([task], includes)
+    _strip_helpers([task], names)
+    return json_response({'data': task})
+
+@api_bp.route('/tasks/<int:task_id>/subtasks')
+@login_required
+@conditional_on_user_data
+def list_subtasks(task_id):
+    names = _fields(SUBTASK_FIELDS)
+    owned = db.session.query(Task.id).filter(
+        Task.id == task_id, Task.user_id == current_user.id
+    ).first()
+    if owned is None:
+        return json_response({'error': 'Task not found'}, 404)
+    
+    query = db.session.query(*(SUBTASK_FIELDS[name] for name in names)).filter(
+        SubTask.task_id == task_id
+    )
+    return json_response(_id_page(query, names, SubTask.id))
+
+@api_bp.route('/categories')
+@login_required
+@conditional_on_user_data
+def list_categories():
+    names = _fields(CATEGORY_FIELDS)
+    query = db.session.query(*(CATEGORY_FIELDS[name] for name in names)).filter(
+        Category.user_id == current_user.id
+    )
+    return json_response(_id_page(query, names, Category.id))
+
+@api_bp.route('/achievements')
+@login_required
+@conditional_on_user_data
+def list_achievements():
+    names = _fields(ACHIEVEMENT_FIELDS)
+    query = db.session.query(*(ACHIEVEMENT_FIELDS[name] for name in names)).filter(
+        Achievement.user_id == current_user.id
+    )
+    return json_response(_id_page(query, names, Achievement.id))
+
+def _id_page(query, names, id_column):
+    """One page of query in id order; names[0] is always 'id'."""
+    limit = _limit()
+    cursor = request.args.get('cursor')
+    if cursor:
+        (after,) = _decode_cursor(cursor, int)
+        query = query.filter(id_column > after)
+    rows = query.order_by(id_column).limit(limit + 1).all()
+    items = [(dict(zip(names, row)), (row[0],)) for row in rows]
+    return _page(items, limit, _encode_cursor)
@@ -6,54 +6,175 @@ from flask_login import LoginManager
 from sqlalchemy.orm import DeclarativeBase
 from flask_migrate import Migrate
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+from sqlite_profile import install_sqlite_profile, is_file_database, sqlite_engine_options
+from replicas import RoutingSession, REPLICA_BIND
+from shards import parse_shards, shard_binds
 
 # Create a base class for SQLAlchemy models
 class Base(DeclarativeBase):
     pass
 
-# Initialize SQLAlchemy with the base class
-db = SQLAlchemy(model_class=Base)
-
-# Create the Flask application
-app = Flask(__name__)
-
-# Set the secret key from environment
-app.secret_key = os.environ.get("SESSION_SECRET", "taskito_secret_key")
-
-# Configure the database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///taskito.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-
-# Initialize the database with the app
-db.init_app(app)
-
-# Initialize Flask-Login
+# Extensions are created unbound and attached to each app by create_app
+db = SQLAlchemy(model_class=Base, session_options={"class_": RoutingSession})
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
-login_manager.login_message = 'Please log in to access this page.'
+migrate = Migrate()
 
-# Initialize Flask-Migrate
-migrate = Migrate(app, db)
+# Found from any working directory, e.g. when benchmarks call upgrade()
+MIGRATIONS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
 
-# Import routes after initializing everything to avoid circular imports
-with app.app_context():
-    # Import models to ensure they're registered with SQLAlchemy
-    from models import User, Task, Category, SubTask, Achievement
+def load_config(app):
+    """Load the application settings from the environment."""
+    # Set the secret key from environment
+    app.secret_key = os.environ.get("SESSION_SECRET", "taskito_secret_key")
+    
+    # Configure the database
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///taskito.db")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    
+    # Configure an optional read replica: reads of GET requests go to it,
+    # except for users who wrote something in the last few seconds
+    replica_url = os.environ.get("DATABASE_REPLICA_URL")
+    app.config["SQLALCHEMY_BINDS"] = {REPLICA_BIND: replica_url} if replica_url else {}
+    app.config["READ_YOUR_WRITES_SECONDS"] = float(os.environ.get("READ_YOUR_WRITES_SECONDS", 5))
+    
+    # Configure optional sharding of per-user data (see shards.py):
+    # DATABASE_SHARDS lists shards as name=url pairs separated by commas.
+    # SHARD_STRATEGY places new users by consistent hash over SHARD_RING
+    # ("hash", the ring defaults to every shard) or on the shard with the
+    # fewest users, recorded in the directory ("directory"). `flask
+    # move-user` fences a user's writes for SHARD_MOVE_DRAIN_SECONDS, longer
+    # than any write request takes, before copying their rows
+    app.config["SHARDS"] = parse_shards(os.environ.get("DATABASE_SHARDS", ""))
+    app.config["SHARD_STRATEGY"] = os.environ.get("SHARD_STRATEGY", "hash")
+    app.config["SHARD_RING"] = [name for name in os.environ.get("SHARD_RING", "").split(",") if name]
+    app.config["SHARD_MOVE_DRAIN_SECONDS"] = float(os.environ.get("SHARD_MOVE_DRAIN_SECONDS", 5))
+    
+    # Configure the SQLite profile used when DATABASE_URL is an SQLite file:
+    # WAL journal, connection pragmas, a pool of one connection per worker
+    # thread and writes serialized with BEGIN IMMEDIATE, retried with backoff
+    # (SQLITE_PROFILE=0 keeps the driver defaults)
+    app.config["SQLITE_PROFILE"] = os.environ.get("SQLITE_PROFILE", "1") != "0"
+    app.config["SQLITE_BUSY_TIMEOUT_MS"] = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    app.config["SQLITE_SYNCHRONOUS"] = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    app.config["SQLITE_CACHE_SIZE_KB"] = int(os.environ.get("SQLITE_CACHE_SIZE_KB", 64000))
+    app.config["SQLITE_MMAP_SIZE"] = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    app.config["SQLITE_POOL_SIZE"] = int(os.environ.get("SQLITE_POOL_SIZE", os.environ.get("GUNICORN_THREADS", 8)))
+    app.config["SQLITE_POOL_OVERFLOW"] = int(os.environ.get("SQLITE_POOL_OVERFLOW", 4))
+    app.config["SQLITE_POOL_TIMEOUT"] = float(os.environ.get("SQLITE_POOL_TIMEOUT", 10))
+    app.config["SQLITE_WRITE_RETRIES"] = int(os.environ.get("SQLITE_WRITE_RETRIES", 5))
+    app.config["SQLITE_WRITE_BACKOFF_MS"] = float(os.environ.get("SQLITE_WRITE_BACKOFF_MS", 20))
+    
+    # Configure password hashing; hashes run in a small process pool
+    # (PASSWORD_HASH_WORKERS=0 hashes inline on the request thread)
+    app.config["PASSWORD_HASH_METHOD"] = os.environ.get("PASSWORD_HASH_METHOD", "scrypt")
+    app.config["PASSWORD_SALT_LENGTH"] = int(os.environ.get("PASSWORD_SALT_LENGTH", 16))
+    app.config["PASSWORD_HASH_WORKERS"] = int(os.environ.get("PASSWORD_HASH_WORKERS", 2))
+    app.config["PASSWORD_HASH_MAX_PENDING"] = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", 8))
+    app.config["PASSWORD_HASH_TIMEOUT"] = float(os.environ.get("PASSWORD_HASH_TIMEOUT", 5))
+    
+    # Configure due-date reminders pushed over /reminders/stream
+    app.config["REMINDER_LEAD_MINUTES"] = int(os.environ.get("REMINDER_LEAD_MINUTES", 15))
+    app.config["REMINDER_HEARTBEAT_SECONDS"] = int(os.environ.get("REMINDER_HEARTBEAT_SECONDS", 15))
     
-    # Create all tables if they don't exist
-    db.create_all()
+    # Configure background jobs (see jobs.py): JOB_WORKERS threads per
+    # process run them (0 leaves them to `flask run-jobs`), waking up on new
+    # jobs and every JOB_POLL_SECONDS. A job holds a JOB_LEASE_SECONDS lease
+    # while it runs and failed jobs are retried with exponential backoff
+    # from JOB_RETRY_SECONDS, up to JOB_MAX_ATTEMPTS attempts in all.
+    # `flask prune-jobs` deletes finished jobs after JOB_RETENTION_DAYS
+    app.config["JOB_WORKERS"] = int(os.environ.get("JOB_WORKERS", 2))
+    app.config["JOB_POLL_SECONDS"] = float(os.environ.get("JOB_POLL_SECONDS", 5))
+    app.config["JOB_LEASE_SECONDS"] = int(os.environ.get("JOB_LEASE_SECONDS", 60))
+    app.config["JOB_RETRY_SECONDS"] = float(os.environ.get("JOB_RETRY_SECONDS", 2))
+    app.config["JOB_MAX_ATTEMPTS"] = int(os.environ.get("JOB_MAX_ATTEMPTS", 5))
+    app.config["JOB_RETENTION_DAYS"] = int(os.environ.get("JOB_RETENTION_DAYS", 7))
     
-    # Import routes
-    from routes import *
+    # Completed tasks older than this are moved to the archive by `flask archive-tasks`
+    app.config["ARCHIVE_COMPLETED_AFTER_DAYS"] = int(os.environ.get("ARCHIVE_COMPLETED_AFTER_DAYS", 30))
     
-    # Register user loader for Flask-Login
-    @login_manager.user_loader
-    def load_user(user_id):
-        return User.query.get(int(user_id))
+    # Configure SQL instrumentation: requests over these limits are logged as
+    # warnings and counted in /metrics. /metrics is off unless METRICS_TOKEN
+    # is set, and then needs it as a bearer token; its values are per
+    # worker process (see instrumentation.metrics)
+    app.config["SQL_WARN_QUERIES"] = int(os.environ.get("SQL_WARN_QUERIES", 30))
+    app.config["SQL_WARN_MILLISECONDS"] = float(os.environ.get("SQL_WARN_MILLISECONDS", 250))
+    app.config["SQL_WARN_REPEATED_STATEMENTS"] = int(os.environ.get("SQL_WARN_REPEATED_STATEMENTS", 10))
+    app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN")
+    
+    # Configure logging
+    app.config["LOG_LEVEL"] = os.environ.get("LOG_LEVEL", "INFO").upper()
+
+def create_app(config=None):
+    """Create and configure an application instance.
+    
+    config, if given, overrides settings loaded from the environment.
+    Creating the app does not connect to the database: the schema is
+    managed with Flask-Migrate (`flask db upgrade`) and connections are
+    opened on first use, so workers boot quickly and can be forked from a
+    preloaded master.
+    """
+    app = Flask(__name__)
+    load_config(app)
+    if config:
+        app.config.update(config)
+    
+    logging.basicConfig(level=app.config["LOG_LEVEL"])
+    
+    # Every shard not on the primary database gets a bind of its own
+    app.config["SQLALCHEMY_BINDS"] = {**app.config["SQLALCHEMY_BINDS"], **shard_binds(app.config)}
+    
+    sqlite = app.config["SQLITE_PROFILE"] and is_file_database(app.config["SQLALCHEMY_DATABASE_URI"])
+    if sqlite:
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = sqlite_engine_options(app.config)
+    
+    # Initialize extensions
+    db.init_app(app)
+    if sqlite:
+        # Creating the engines does not connect; the pragmas run per
+        # connection, on the primary and on SQLite replicas and shards alike
+        with app.app_context():
+            for engine in db.engines.values():
+                if is_file_database(engine.url):
+                    install_sqlite_profile(engine, app.config)
+    login_manager.init_app(app)
+    login_manager.login_view = 'auth.login'
+    login_manager.login_message = 'Please log in to access this page.'
+    # The JSON API answers 401 instead of redirecting to the login page
+    login_manager.blueprint_login_views['api'] = None
+    migrate.init_app(app, db, directory=MIGRATIONS_DIRECTORY)
+    
+    # Import models to ensure they're registered with SQLAlchemy
+    import models  # noqa: F401
+    
+    # Register routes, the JSON API, CLI commands, SQL instrumentation,
+    # replica routing, shard routing and background jobs (after shard
+    # routing: job results are read from the user's shard)
+    from auth import auth_bp
+    from routes import main_bp
+    from commands import commands_bp
+    from instrumentation import instrumentation_bp
+    from replicas import replicas_bp
+    from shards import shards_bp
+    from jobs import jobs_bp
+    from api import api_bp
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(main_bp)
+    app.register_blueprint(commands_bp)
+    app.register_blueprint(instrumentation_bp)
+    app.register_blueprint(replicas_bp)
+    app.register_blueprint(shards_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(api_bp)
+    
+    return app
+
+# Register user loader for Flask-Login; identities are served from a
+# small cache and the full User row is only loaded when needed
+@login_manager.user_loader
+def load_user(user_id):
+    from identity import load_identity
+    return load_identity(int(user_id))
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import DateTime, delete, insert, literal, select
+
+from app import db
+from models import Task, SubTask, ArchivedTask, ArchivedSubTask
+
+# Columns copied from task to archived_task as they are
+ARCHIVED_TASK_COLUMNS = (
+    'title', 'description', 'due_date', 'due_time', 'created_at', 'last_updated',
+    'priority', 'status', 'progress', 'track_progress', 'subtask_total',
+    'subtask_done', 'is_recurring', 'is_completed', 'completed_at', 'user_id',
+    'category_id',
+)
+
+# Tasks moved per transaction
+ARCHIVE_BATCH_SIZE = 500
+
+def _archive_batch(task_ids, archived_at):
+    """Move the given tasks and their subtasks to the archive tables."""
+    moved = db.session.execute(
+        insert(ArchivedTask).from_select(
+            ('task_id', 'archived_at') + ARCHIVED_TASK_COLUMNS,
+            select(Task.id, literal(archived_at, DateTime), *(getattr(Task, name) for name in ARCHIVED_TASK_COLUMNS))
+            .where(Task.id.in_(task_ids))
+        ).returning(ArchivedTask.id, ArchivedTask.task_id)
+    ).all()
+    archived_ids = {task_id: archived_id for archived_id, task_id in moved}
+    
+    subtasks = [
+        {'archived_task_id': archived_ids[task_id], 'title': title, 'is_completed': is_completed}
+        for task_id, title, is_completed in db.session.query(
+            SubTask.task_id, SubTask.title, SubTask.is_completed
+        ).filter(SubTask.task_id.in_(task_ids)).order_by(SubTask.id)
+    ]
+    if subtasks:
+        db.session.execute(insert(ArchivedSubTask), subtasks)
+    
+    db.session.execute(
+        delete(SubTask).where(SubTask.task_id.in_(task_ids))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        delete(Task).where(Task.id.in_(task_ids))
+        .execution_options(synchronize_session=False)
+    )
+    return len(moved)
+
+def archive_completed_tasks(older_than_days, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move tasks completed more than older_than_days ago out of the task table.
+    
+    Tasks are moved with their subtasks in batches of batch_size, one
+    transaction per batch, so the job can be interrupted and rerun safely.
+    User counters and the completion rollup already include the tasks and
+    are left unchanged. Returns the number of tasks archived.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    archived = 0
+    while True:
+        task_ids = [
+            task_id for (task_id,) in db.session.query(Task.id).filter(
+                Task.is_completed == True,
+                Task.completed_at < cutoff
+            ).order_by(Task.id).limit(batch_size)
+        ]
+        if not task_ids:
+            return archived
+        
+        archived += _archive_batch(task_ids, datetime.utcnow())
+        db.session.commit()
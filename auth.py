@@ -1,63 +1,76 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
-from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_login import login_user, logout_user, current_user
+from urllib.parse import urlparse
+
 from app import db
-from models import User
-from forms import LoginForm, RegisterForm
+from models import User, Category, UserStats
+from forms import LoginForm, RegistrationForm
+from passwords import HashingBusy
+from shards import place_user
 
 auth_bp = Blueprint('auth', __name__)
 
-@auth_bp.route('/login', methods=['GET', 'POST'])
+@auth_bp.app_errorhandler(HashingBusy)
+def hashing_busy(error):
+    # Backpressure from the password hashing pool during login storms
+    return 'The server is busy, please try again in a moment.', 503, {'Retry-After': '1'}
+
+@auth_bp.route('/login.html', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     form = LoginForm()
-    
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data).first()
+        if user is None or not user.check_password(form.password.data):
+            flash('Invalid email or password', 'danger')
+            return redirect(url_for('auth.login'))
         
-        if user and check_password_hash(user.password_hash, form.password.data):
-            login_user(user, remember=form.remember_me.data)
-            next_page = request.args.get('next')
-            return redirect(next_page or url_for('dashboard'))
-        else:
-            flash('Invalid email or password.', 'danger')
+        # Saves the password hash if check_password upgraded it
+        db.session.commit()
+        
+        login_user(user)
+        next_page = request.args.get('next')
+        if not next_page or urlparse(next_page).netloc != '':
+            next_page = url_for('main.dashboard')
+        return redirect(next_page)
     
-    return render_template('login.html', form=form)
+    return render_template('login.html', title='Sign In', form=form)
 
-@auth_bp.route('/register', methods=['GET', 'POST'])
+@auth_bp.route('/register.html', methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
-    
-    form = RegisterForm()
+        return redirect(url_for('main.dashboard'))
     
+    form = RegistrationForm()
     if form.validate_on_submit():
-        # Check if user already exists
-        existing_user = User.query.filter_by(email=form.email.data).first()
-        if existing_user:
-            flash('Email already registered.', 'danger')
-            return render_template('register.html', form=form)
-        
-        # Create new user
-        user = User(
-            username=form.username.data,
-            email=form.email.data,
-            password_hash=generate_password_hash(form.password.data)
-        )
+        user = User(username=form.username.data, email=form.email.data)
+        user.set_password(form.password.data)
         
         db.session.add(user)
-        db.session.commit()
+        # The user's id picks their shard, which their rows below go to
+        db.session.flush()
+        place_user(user)
+        
+        # Create default categories for new user
+        default_categories = [
+            {"name": "Work", "is_default": True},
+            {"name": "Personal", "is_default": True}
+        ]
         
-        flash('Registration successful! Please log in.', 'success')
+        for cat in default_categories:
+            category = Category(name=cat["name"], is_default=cat["is_default"], user=user)
+            db.session.add(category)
+        
+        db.session.add(UserStats(user=user, categories_count=len(default_categories)))
+        db.session.commit()
+        flash('Congratulations, you are now a registered user!', 'success')
         return redirect(url_for('auth.login'))
     
-    return render_template('register.html', form=form)
+    return render_template('register.html', title='Register', form=form)
 
 @auth_bp.route('/logout')
-@login_required
 def logout():
     logout_user()
-    flash('You have been logged out.', 'info')
     return redirect(url_for('auth.login'))
@@ -0,0 +1,256 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import delete, insert, update
+
+from app import db
+from models import Task, Category, SubTask
+from utils import adjust_user_stats, record_completion, remove_completion
+
+# Largest number of operations accepted in one batch request
+BATCH_MAX_OPERATIONS = 500
+
+def _parse_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _validate_create(op, category_ids):
+    """Validate a create operation. Returns (task values, error)."""
+    title = op.get('title')
+    description = op.get('description')
+    if not isinstance(title, str) or not title.strip() or len(title) > 100:
+        return None, 'title is required and must be at most 100 characters'
+    if not isinstance(description, str) or not description.strip():
+        return None, 'description is required'
+    
+    try:
+        due_date = date.fromisoformat(op.get('due_date'))
+        due_time = time.fromisoformat(op.get('due_time'))
+    except (TypeError, ValueError):
+        return None, 'due_date (YYYY-MM-DD) and due_time (HH:MM) are required'
+    
+    priority = _parse_int(op.get('priority'))
+    if priority not in (1, 2, 3):
+        return None, 'priority must be 1, 2 or 3'
+    
+    category_id = _parse_int(op.get('category_id'))
+    if category_id not in category_ids:
+        return None, 'Category not found'
+    
+    subtasks = op.get('subtasks') or []
+    if not isinstance(subtasks, list) or not all(isinstance(s, str) for s in subtasks):
+        return None, 'subtasks must be a list of titles'
+    subtasks = [s for s in subtasks if s.strip()]
+    
+    return {
+        'title': title,
+        'description': description,
+        'due_date': due_date,
+        'due_time': due_time,
+        'priority': priority,
+        'category_id': category_id,
+        'is_recurring': bool(op.get('is_recurring')),
+        'track_progress': bool(op.get('track_progress')),
+        'subtask_total': len(subtasks),
+        'subtasks': subtasks
+    }, None
+
+def _insert_tasks(rows):
+    """Insert task rows and their subtask titles, returning the new task ids."""
+    subtasks = [row.pop('subtasks') for row in rows]
+    task_ids = db.session.execute(
+        insert(Task).returning(Task.id, sort_by_parameter_order=True), rows
+    ).scalars().all()
+    
+    subtask_rows = [
+        {'task_id': task_id, 'title': title, 'is_completed': False}
+        for task_id, titles in zip(task_ids, subtasks)
+        for title in titles
+    ]
+    if subtask_rows:
+        db.session.execute(insert(SubTask), subtask_rows)
+    return task_ids
+
+def apply_task_batch(user_id, operations):
+    """Validate and apply a batch of task operations for a user.
+    
+    Supported operations (the "op" key) are create, complete, delete and
+    progress. All referenced tasks and the user's categories are loaded up
+    front, every operation is validated, and the valid ones are applied with
+    one bulk statement per kind, in the caller's transaction. Invalid
+    operations are skipped. Returns one result dict per operation.
+    """
+    results = [None] * len(operations)
+    
+    def fail(index, error):
+        results[index] = {'index': index, 'ok': False, 'error': error}
+    
+    # Load every referenced task and the user's categories in one query each
+    task_ids = {
+        _parse_int(op.get('task_id')) for op in operations
+        if isinstance(op, dict) and op.get('op') != 'create'
+    }
+    tasks = {
+        row.id: row for row in db.session.query(
+            Task.id, Task.title, Task.description, Task.due_time, Task.priority,
+            Task.category_id, Task.track_progress, Task.is_recurring,
+            Task.is_completed, Task.completed_at
+        ).filter(Task.user_id == user_id, Task.id.in_(task_ids - {None}))
+    }
+    category_ids = {
+        category_id for (category_id,) in db.session.query(Category.id).filter(
+            Category.user_id == user_id
+        )
+    }
+    
+    creates, completes, deletes, progress_updates = [], [], [], []
+    targeted = set()
+    for index, op in enumerate(operations):
+        if not isinstance(op, dict):
+            fail(index, 'Operation must be an object')
+            continue
+        
+        kind = op.get('op')
+        if kind == 'create':
+            values, error = _validate_create(op, category_ids)
+            if error:
+                fail(index, error)
+            else:
+                values['user_id'] = user_id
+                creates.append((index, values))
+            continue
+        
+        if kind not in ('complete', 'delete', 'progress'):
+            fail(index, 'Unknown operation')
+            continue
+        
+        task = tasks.get(_parse_int(op.get('task_id')))
+        if task is None:
+            fail(index, 'Task not found')
+        elif task.id in targeted:
+            fail(index, 'Task is already changed by an earlier operation in this batch')
+        elif kind == 'complete':
+            if task.is_completed:
+                fail(index, 'Task is already completed')
+            else:
+                completes.append((index, task))
+        elif kind == 'delete':
+            deletes.append((index, task))
+        else:
+            progress = _parse_int(op.get('progress'))
+            if progress is None or not 0 <= progress <= 100:
+                fail(index, 'progress must be an integer between 0 and 100')
+            else:
+                progress_updates.append((index, task, progress))
+        
+        if results[index] is None:
+            targeted.add(task.id)
+    
+    now = datetime.utcnow()
+    tasks_delta = completed_delta = high_priority_delta = 0
+    
+    if deletes:
+        ids = [task.id for _, task in deletes]
+        db.session.execute(
+            delete(SubTask).where(SubTask.task_id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            delete(Task).where(Task.user_id == user_id, Task.id.in_(ids))
+            .execution_options(synchronize_session=False)
+        )
+        
+        removed_by_day = defaultdict(list)
+        for index, task in deletes:
+            tasks_delta -= 1
+            if task.is_completed:
+                completed_delta -= 1
+                high_priority_delta -= 1 if task.priority == 3 else 0
+                if task.completed_at:
+                    removed_by_day[task.completed_at.date()].append(task.completed_at)
+            results[index] = {'index': index, 'ok': True, 'task_id': task.id}
+        for completed_ats in removed_by_day.values():
+            remove_completion(user_id, completed_ats[0], count=len(completed_ats))
+    
+    if completes:
+        ids = [task.id for _, task in completes]
+        db.session.execute(
+            update(Task).where(Task.user_id == user_id, Task.id.in_(ids)).values(
+                is_completed=True,
+                status=2,
+                progress=100,
+                completed_at=now,
+                subtask_done=Task.subtask_total
+            ).execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            update(SubTask).where(SubTask.task_id.in_(ids)).values(is_completed=True)
+            .execution_options(synchronize_session=False)
+        )
+        
+        # Recurring tasks get a copy due tomorrow, with fresh subtasks
+        recurring = [(index, task) for index, task in completes if task.is_recurring]
+        copy_ids = {}
+        if recurring:
+            subtask_titles = defaultdict(list)
+            for task_id, title in db.session.query(SubTask.task_id, SubTask.title).filter(
+                SubTask.task_id.in_([task.id for _, task in recurring])
+            ).order_by(SubTask.id):
+                subtask_titles[task_id].append(title)
+            
+            rows = [
+                {
+                    'title': task.title,
+                    'description': task.description,
+                    'due_date': date.today() + timedelta(days=1),
+                    'due_time': task.due_time,
+                    'priority': task.priority,
+                    'category_id': task.category_id,
+                    'is_recurring': True,
+                    'track_progress': task.track_progress,
+                    'user_id': user_id,
+                    'subtask_total': len(subtask_titles[task.id]),
+                    'subtasks': subtask_titles[task.id]
+                }
+                for _, task in recurring
+            ]
+            copy_ids = dict(zip([index for index, _ in recurring], _insert_tasks(rows)))
+            tasks_delta += len(recurring)
+        
+        for index, task in completes:
+            completed_delta += 1
+            high_priority_delta += 1 if task.priority == 3 else 0
+            results[index] = {'index': index, 'ok': True, 'task_id': task.id}
+            if index in copy_ids:
+                results[index]['recurring_task_id'] = copy_ids[index]
+        record_completion(user_id, now, count=len(completes))
+    
+    if progress_updates:
+        rows = []
+        for index, task, progress in progress_updates:
+            # Update task status based on progress
+            if progress == 0:
+                status = 0  # Not Started
+            elif progress < 100:
+                status = 1  # In Progress
+            else:
+                status = 2  # Completed
+            rows.append({'id': task.id, 'progress': progress, 'status': status})
+            results[index] = {'index': index, 'ok': True, 'task_id': task.id}
+        db.session.execute(update(Task), rows)
+    
+    if creates:
+        task_ids = _insert_tasks([values for _, values in creates])
+        for (index, _), task_id in zip(creates, task_ids):
+            results[index] = {'index': index, 'ok': True, 'task_id': task_id}
+        tasks_delta += len(creates)
+    
+    adjust_user_stats(
+        user_id,
+        tasks_count=tasks_delta,
+        completed_count=completed_delta,
+        high_priority_completed=high_priority_delta
+    )
+    return results
@@ -0,0 +1,112 @@
+"""Benchmark login latency and concurrent dashboard latency.
+
+Logins and dashboard loads run concurrently from a pool of threads through
+the Flask test client, which mirrors one threaded gunicorn worker. The run
+is repeated with hashing inline on the request thread ("before") and
+through the hashing process pool ("after"), and p50/p99 latencies for both
+request kinds are printed.
+
+    python benchmarks/bench_login.py --logins 100 --dashboards 400 --threads 8
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault(
+    "DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_login.db")
+)
+
+from flask_migrate import upgrade  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from models import User, UserStats  # noqa: E402
+
+PASSWORD = "benchmark-password"
+
+app = create_app()
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+def seed(users):
+    with app.app_context():
+        upgrade()
+        db.session.query(UserStats).delete()
+        db.session.query(User).delete()
+        for i in range(users):
+            user = User(username=f"bench{i}", email=f"bench{i}@example.com")
+            user.set_password(PASSWORD)
+            db.session.add(user)
+            db.session.add(UserStats(user=user))
+        db.session.commit()
+
+def run(workers, logins, dashboards, threads, users):
+    app.config["PASSWORD_HASH_WORKERS"] = workers
+    seed(users)
+    
+    local = threading.local()
+    login_times, dashboard_times = [], []
+    
+    def client():
+        if not hasattr(local, "client"):
+            local.client = app.test_client()
+            local.client.post("/login.html", data={
+                "email": "bench0@example.com", "password": PASSWORD
+            })
+        return local.client
+    
+    def login(i):
+        started = time.perf_counter()
+        response = app.test_client().post("/login.html", data={
+            "email": f"bench{i % users}@example.com", "password": PASSWORD
+        })
+        login_times.append(time.perf_counter() - started)
+        assert response.status_code in (302, 503), response.status_code
+    
+    def dashboard(_):
+        c = client()
+        started = time.perf_counter()
+        response = c.get("/dashboard.html")
+        dashboard_times.append(time.perf_counter() - started)
+        assert response.status_code == 200, response.status_code
+    
+    jobs = [(login, i) for i in range(logins)] + [(dashboard, i) for i in range(dashboards)]
+    jobs.sort(key=lambda job: job[1])
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda job: job[0](job[1]), jobs))
+    elapsed = time.perf_counter() - started
+    
+    return {
+        "hash_workers": workers,
+        "elapsed_s": round(elapsed, 3),
+        "login_p50_ms": round(statistics.median(login_times) * 1000, 1),
+        "login_p99_ms": round(percentile(login_times, 99) * 1000, 1),
+        "dashboard_p50_ms": round(statistics.median(dashboard_times) * 1000, 1),
+        "dashboard_p99_ms": round(percentile(dashboard_times, 99) * 1000, 1),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--dashboards", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--hash-workers", type=int, default=2)
+    args = parser.parse_args()
+    
+    app.config["WTF_CSRF_ENABLED"] = False
+    for label, workers in (("before (inline)", 0), ("after (pool)", args.hash_workers)):
+        result = run(workers, args.logins, args.dashboards, args.threads, args.users)
+        print(label, result)
+
+if __name__ == "__main__":
+    main()
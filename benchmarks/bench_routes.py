@@ -0,0 +1,292 @@
+"""Benchmark the main routes against a seeded synthetic data set.
+
+Seeds the database (see seed.py), logs one client in per seeded user and
+drives each route from a pool of threads, either through the Flask test
+client (the default) or against a running server given with --url, e.g. a
+local gunicorn started with the same DATABASE_URL. For every route the
+p50/p95/p99 latency, throughput and SQL statements per request are printed
+as JSON, optionally saved with --output and compared with a saved run
+with --baseline.
+
+    python benchmarks/bench_routes.py --users 8 --tasks 500 --requests 200 --output run.json
+    python benchmarks/bench_routes.py --baseline run.json --max-regression 0.2
+
+SQL counts are measured in-process for the test client; with --url they
+are taken from the server's /metrics, which needs the server's
+METRICS_TOKEN in the environment, and are only exact with one worker.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault(
+    "DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_routes.db")
+)
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from models import User, Task, Category, SubTask  # noqa: E402
+from seed import PASSWORD, seed  # noqa: E402
+
+ROUTES = (
+    "dashboard", "filter_tasks", "complete_task", "toggle_subtask",
+    "progress", "achievements", "profile",
+)
+
+# Metrics compared against the baseline; higher is worse for all of them
+COMPARED_METRICS = ("p50_ms", "p95_ms", "p99_ms", "sql_mean")
+
+_local = threading.local()
+
+app = create_app()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    _local.statements = getattr(_local, "statements", 0) + 1
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+class TestClientDriver:
+    """Send requests through the Flask test client, counting SQL in-process."""
+    
+    def __init__(self):
+        app.config["WTF_CSRF_ENABLED"] = False
+    
+    def login(self, email):
+        client = app.test_client()
+        response = client.post("/login.html", data={"email": email, "password": PASSWORD})
+        assert response.status_code == 302, response.status_code
+        return client
+    
+    def request(self, client, method, path):
+        _local.statements = 0
+        response = client.open(path, method=method)
+        response.close()
+        return response.status_code, _local.statements
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Time the route itself, not the page it redirects to
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+class URLDriver:
+    """Send requests to a running server over HTTP."""
+    
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+    
+    def login(self, email):
+        jar = http.cookiejar.CookieJar()
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar), _NoRedirect)
+        page = opener.open(self.url + "/login.html").read().decode()
+        token = re.search(r'name="csrf_token"[^>]*value="([^"]+)"', page)
+        data = {"email": email, "password": PASSWORD}
+        if token:
+            data["csrf_token"] = token.group(1)
+        status, _ = self.request(opener, "POST", "/login.html", urllib.parse.urlencode(data).encode())
+        assert status == 302, status
+        return opener
+    
+    def request(self, opener, method, path, data=None):
+        if method == "POST" and data is None:
+            data = b""
+        req = urllib.request.Request(self.url + path, method=method, data=data)
+        try:
+            with opener.open(req) as response:
+                response.read()
+                return response.status, None
+        except urllib.error.HTTPError as error:
+            return error.code, None
+    
+    def sql_totals(self):
+        """Total SQL statements and requests per endpoint from /metrics."""
+        totals = {}
+        req = urllib.request.Request(
+            self.url + "/metrics",
+            headers={"Authorization": f"Bearer {os.environ.get('METRICS_TOKEN', '')}"}
+        )
+        text = urllib.request.urlopen(req).read().decode()
+        for name, endpoint, value in re.findall(
+            r'taskito_request_sql_queries_(sum|count)\{worker="[^"]*",endpoint="([^"]+)"\} (\S+)', text
+        ):
+            totals.setdefault(endpoint, {})[name] = float(value)
+        return totals
+
+def build_workload(emails, requests_per_route, rng):
+    """Build the (email, method, path) requests to send for each route.
+    
+    Requests are shuffled so concurrent threads act for different users.
+    """
+    workload = {route: [] for route in ROUTES}
+    with app.app_context():
+        for email in emails:
+            user = User.query.filter_by(email=email).one()
+            active = [
+                task_id for (task_id,) in db.session.query(Task.id).filter_by(
+                    user_id=user.id, is_completed=False
+                )
+            ]
+            subtasks = db.session.query(SubTask.task_id, SubTask.id).join(Task).filter(
+                Task.user_id == user.id, Task.is_completed == False
+            ).all()
+            categories = [c for (c,) in db.session.query(Category.id).filter_by(user_id=user.id)]
+            rng.shuffle(active)
+            
+            per_user = -(-requests_per_route // len(emails))
+            for _ in range(per_user):
+                workload["dashboard"].append((email, "GET", "/dashboard.html"))
+                workload["progress"].append((email, "GET", "/progress.html"))
+                workload["achievements"].append((email, "GET", "/achievements.html"))
+                workload["profile"].append((email, "GET", "/profile.html"))
+                workload["filter_tasks"].append((
+                    email, "GET",
+                    f"/filter_tasks?category_id={rng.choice(categories)}&priority={rng.randint(1, 3)}"
+                ))
+                if subtasks:
+                    task_id, subtask_id = rng.choice(subtasks)
+                    workload["toggle_subtask"].append(
+                        (email, "POST", f"/task/{task_id}/subtask/{subtask_id}/toggle")
+                    )
+                # Each task is completed once; completing consumes the pool
+                if active:
+                    workload["complete_task"].append((email, "POST", f"/task/{active.pop()}/complete"))
+    for requests in workload.values():
+        rng.shuffle(requests)
+    return {route: requests[:requests_per_route] for route, requests in workload.items()}
+
+def run_route(driver, clients, requests, threads):
+    latencies, statements, errors = [], [], 0
+    lock = threading.Lock()
+    
+    def send(item):
+        nonlocal errors
+        email, method, path = item
+        started = time.perf_counter()
+        status, count = driver.request(clients[email], method, path)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if count is not None:
+                statements.append(count)
+            if status >= 400:
+                errors += 1
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(send, requests))
+    elapsed = time.perf_counter() - started
+    
+    if not latencies:
+        return None
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "sql_mean": round(statistics.mean(statements), 2) if statements else None,
+        "sql_max": max(statements) if statements else None,
+    }
+
+def compare(results, baseline, max_regression):
+    """Print per-route changes against a baseline; return the regressions."""
+    regressions = []
+    for route, current in results["routes"].items():
+        before = baseline.get("routes", {}).get(route)
+        if not current or not before:
+            continue
+        changes = []
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            changes.append(f"{metric} {old} -> {new} ({change:+.0%})")
+            if change > max_regression:
+                regressions.append(f"{route} {metric}")
+        print(f"{route}: " + ", ".join(changes), file=sys.stderr)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--tasks", type=int, default=200, help="Tasks per user.")
+    parser.add_argument("--subtasks", type=int, default=2, help="Average subtasks per task.")
+    parser.add_argument("--categories", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per route.")
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--routes", default=",".join(ROUTES), help="Comma-separated subset of routes.")
+    parser.add_argument("--url", help="Benchmark a running server instead of the test client.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Write the JSON results to this file.")
+    parser.add_argument("--baseline", help="Compare with the JSON results of an earlier run.")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Exit with status 1 if a compared metric grows by more than this fraction.")
+    args = parser.parse_args()
+    
+    routes = [route for route in args.routes.split(",") if route]
+    unknown = set(routes) - set(ROUTES)
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(sorted(unknown))}")
+    
+    rng = random.Random(args.seed)
+    with app.app_context():
+        emails = seed(args.users, args.tasks, args.subtasks, args.categories, random_seed=args.seed)
+    workload = build_workload(emails, args.requests, rng)
+    
+    driver = URLDriver(args.url) if args.url else TestClientDriver()
+    clients = {email: driver.login(email) for email in emails}
+    
+    results = {
+        "config": {
+            key: getattr(args, key)
+            for key in ("users", "tasks", "subtasks", "categories", "requests", "threads", "url", "seed")
+        },
+        "routes": {},
+    }
+    for route in routes:
+        before = driver.sql_totals() if args.url else None
+        stats = run_route(driver, clients, workload[route], args.threads)
+        if stats and before is not None:
+            endpoint = "main." + route
+            after = driver.sql_totals().get(endpoint, {})
+            queries = after.get("sum", 0) - before.get(endpoint, {}).get("sum", 0)
+            count = after.get("count", 0) - before.get(endpoint, {}).get("count", 0)
+            stats["sql_mean"] = round(queries / count, 2) if count else None
+        results["routes"][route] = stats
+    
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.max_regression)
+        if regressions:
+            print("Regressions: " + ", ".join(regressions), file=sys.stderr)
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Benchmark read/write throughput on SQLite across worker process counts.
+
+Seeds an SQLite database (see seed.py), then for each worker count starts
+that many processes, like gunicorn workers, each running --threads client
+threads through the Flask test client. Every thread logs in as a seeded
+user and for --duration seconds sends reads (GET /filter_tasks) and, with
+probability --write-ratio, writes (POST .../subtask/<id>/toggle). Runs with
+the driver defaults (SQLITE_PROFILE=0) and then with the tuned SQLite
+profile, and prints reads/s, writes/s and failed requests ("database is
+locked" surfaces as a 500) for each.
+
+    python benchmarks/bench_sqlite.py --workers 1,2,4,8 --threads 4 --duration 10
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault(
+    "DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_sqlite.db")
+)
+
+# The driver defaults run first: WAL mode, once set, stays on the file
+PROFILES = (("defaults", False), ("tuned", True))
+
+def _worker(profile, emails, threads, duration, write_ratio, seed, results):
+    """Drive one worker process; put (reads, writes, errors) on results."""
+    import threading
+    
+    from app import create_app, db
+    from models import User, Task, SubTask
+    
+    logging.disable(logging.CRITICAL)
+    # Logins hash inline: password hashing is not what is measured here
+    app = create_app({
+        "WTF_CSRF_ENABLED": False, "PASSWORD_HASH_WORKERS": 0,
+        "SQLITE_PROFILE": profile, "SQLITE_POOL_SIZE": threads,
+    })
+    totals = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    
+    def run(index):
+        rng = random.Random(seed * 1000 + index)
+        email = emails[index % len(emails)]
+        with app.app_context():
+            user_id = User.query.filter_by(email=email).one().id
+            subtasks = db.session.query(SubTask.task_id, SubTask.id).join(Task).filter(
+                Task.user_id == user_id
+            ).all()
+            db.session.remove()
+        client = app.test_client()
+        client.post("/login.html", data={"email": email, "password": "benchmark-password"})
+        
+        counts = {"reads": 0, "writes": 0, "errors": 0}
+        deadline = time.monotonic() + duration
+        while time.monotonic() < deadline:
+            if subtasks and rng.random() < write_ratio:
+                task_id, subtask_id = rng.choice(subtasks)
+                response = client.post(f"/task/{task_id}/subtask/{subtask_id}/toggle")
+                kind = "writes"
+            else:
+                response = client.get(f"/filter_tasks?priority={rng.randint(1, 3)}")
+                kind = "reads"
+            response.close()
+            counts[kind if response.status_code < 400 else "errors"] += 1
+        with lock:
+            for key, value in counts.items():
+                totals[key] += value
+    
+    pool = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    results.put(totals)
+
+def run_workers(profile, workers, emails, args):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=_worker,
+            args=(profile, emails[i::workers] or emails, args.threads, args.duration,
+                  args.write_ratio, args.seed + i, results)
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    totals = {"reads": 0, "writes": 0, "errors": 0}
+    for _ in processes:
+        for key, value in results.get().items():
+            totals[key] += value
+    for process in processes:
+        process.join()
+    return {
+        "reads_per_s": round(totals["reads"] / args.duration, 1),
+        "writes_per_s": round(totals["writes"] / args.duration, 1),
+        "errors": totals["errors"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma-separated worker process counts.")
+    parser.add_argument("--threads", type=int, default=4, help="Client threads per worker.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per run.")
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--tasks", type=int, default=200, help="Tasks per user.")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    from app import create_app
+    from seed import seed
+    with create_app({"SQLITE_PROFILE": False}).app_context():
+        emails = seed(args.users, args.tasks, random_seed=args.seed)
+    
+    results = {}
+    for name, profile in PROFILES:
+        for workers in (int(count) for count in args.workers.split(",")):
+            results.setdefault(name, {})[workers] = run_workers(profile, workers, emails, args)
+            print(name, workers, results[name][workers], file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark application startup and time to the first request.
+
+Each run starts a fresh interpreter that imports the app module, calls
+create_app() and then serves one request through the test client, so
+import caches from earlier runs do not count. Prints the median and max
+of the import, create_app and first request times and the number of
+database connections opened before the first request, which should be 0.
+
+    python benchmarks/bench_startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter; prints one JSON line of timings
+CHILD = """
+import json, time
+started = time.perf_counter()
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+connections = []
+event.listen(Engine, "connect", lambda dbapi_connection, record: connections.append(1))
+
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+boot_connections = len(connections)
+
+response = app.test_client().get("/login.html")
+served = time.perf_counter()
+
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "first_request_ms": (served - created) * 1000,
+    "total_ms": (served - started) * 1000,
+    "boot_connections": boot_connections,
+    "status": response.status_code,
+}))
+"""
+
+def run_once(env):
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=ROOT, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+    
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench_startup.db"))
+    env.setdefault("LOG_LEVEL", "WARNING")
+    
+    runs = [run_once(env) for _ in range(args.runs)]
+    results = {
+        key: {
+            "median": round(statistics.median(run[key] for run in runs), 1),
+            "max": round(max(run[key] for run in runs), 1),
+        }
+        for key in ("import_ms", "create_app_ms", "first_request_ms", "total_ms")
+    }
+    results["boot_connections"] = max(run["boot_connections"] for run in runs)
+    print(json.dumps(results, indent=2))
+    if results["boot_connections"]:
+        print("create_app() opened database connections", file=sys.stderr)
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
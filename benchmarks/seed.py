@@ -0,0 +1,166 @@
+"""Seed a database with synthetic users, categories, tasks and subtasks.
+
+Every user gets the two default categories plus extra ones, a mix of
+active, completed and recurring tasks spread over the last and next few
+weeks, and subtasks. Counters and the completion rollup are rebuilt at the
+end, the same way `flask rebuild-user-stats` does. All users share the
+password "benchmark-password" and are called bench0@example.com,
+bench1@example.com and so on.
+
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/seed.py --users 20 --tasks 500
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask_migrate import upgrade  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from models import User, Task, Category, SubTask, UserStats, DailyCompletion  # noqa: E402
+from passwords import hash_password  # noqa: E402
+from utils import compute_user_stats, compute_daily_completions  # noqa: E402
+
+PASSWORD = "benchmark-password"
+
+# Rows per INSERT statement
+CHUNK_SIZE = 1000
+
+def _insert_returning_ids(model, rows):
+    ids = []
+    for start in range(0, len(rows), CHUNK_SIZE):
+        ids += db.session.execute(
+            insert(model).returning(model.id, sort_by_parameter_order=True),
+            rows[start:start + CHUNK_SIZE]
+        ).scalars().all()
+    return ids
+
+def _insert(model, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(insert(model), rows[start:start + CHUNK_SIZE])
+
+def _task_rows(rng, user_id, category_ids, tasks, subtasks, completed_ratio, recurring_ratio):
+    now = datetime.utcnow()
+    task_rows, subtask_counts = [], []
+    for i in range(tasks):
+        completed = rng.random() < completed_ratio
+        # Subtask counts average out at `subtasks` per task
+        total = rng.randint(0, 2 * subtasks) if subtasks else 0
+        done = total if completed else rng.randint(0, total)
+        created_at = now - timedelta(days=rng.randint(1, 60), minutes=rng.randint(0, 1439))
+        if completed:
+            status, progress = 2, 100
+        elif total:
+            status, progress = (1 if done else 0), done * 100 // total
+        else:
+            status = rng.choice((0, 0, 1))
+            progress = 50 if status == 1 else 0
+        task_rows.append({
+            "title": f"Task {i} for user {user_id}",
+            "description": f"Synthetic task {i} with some searchable words: report review meeting {i % 17}",
+            "due_date": (now + timedelta(days=rng.randint(-30, 30))).date(),
+            "due_time": dt_time(rng.randint(7, 20), rng.choice((0, 15, 30, 45))),
+            "priority": rng.choice((1, 1, 2, 2, 3)),
+            "status": status,
+            "progress": progress,
+            "track_progress": rng.random() < 0.3,
+            "is_recurring": rng.random() < recurring_ratio,
+            "is_completed": completed,
+            "completed_at": created_at + timedelta(hours=rng.randint(1, 24 * 5)) if completed else None,
+            "created_at": created_at,
+            "last_updated": created_at,
+            "subtask_total": total,
+            "subtask_done": done,
+            "user_id": user_id,
+            "category_id": rng.choice(category_ids),
+        })
+        subtask_counts.append((total, done))
+    # Completions cannot be in the future
+    for row in task_rows:
+        if row["completed_at"] and row["completed_at"] > now:
+            row["completed_at"] = now
+    return task_rows, subtask_counts
+
+def seed(users=10, tasks=200, subtasks=2, categories=4, completed_ratio=0.5,
+         recurring_ratio=0.1, random_seed=1):
+    """Create the synthetic data set in the current app's database.
+    
+    Must run inside an app context; the schema is brought up to date first.
+    Existing bench users are removed first, so seeding is repeatable.
+    Returns a list of the seeded users' emails.
+    """
+    rng = random.Random(random_seed)
+    upgrade()
+    
+    password_hash = hash_password(PASSWORD)
+    stale = User.query.filter(User.email.like("bench%@example.com")).all()
+    DailyCompletion.query.filter(
+        DailyCompletion.user_id.in_([user.id for user in stale])
+    ).delete(synchronize_session=False)
+    for user in stale:
+        db.session.delete(user)
+    db.session.flush()
+    
+    user_ids = _insert_returning_ids(User, [
+        {"username": f"bench{i}", "email": f"bench{i}@example.com", "password_hash": password_hash}
+        for i in range(users)
+    ])
+    
+    for user_id in user_ids:
+        names = ["Work", "Personal"] + [f"Category {i}" for i in range(2, categories)]
+        category_ids = _insert_returning_ids(Category, [
+            {"name": name, "is_default": i < 2, "user_id": user_id}
+            for i, name in enumerate(names)
+        ])
+        
+        task_rows, subtask_counts = _task_rows(
+            rng, user_id, category_ids, tasks, subtasks, completed_ratio, recurring_ratio
+        )
+        task_ids = _insert_returning_ids(Task, task_rows)
+        _insert(SubTask, [
+            {"task_id": task_id, "title": f"Step {n}", "is_completed": n < done}
+            for task_id, (total, done) in zip(task_ids, subtask_counts)
+            for n in range(total)
+        ])
+    
+    # Rebuild the counters and completion rollup for the new users
+    daily = compute_daily_completions(user_ids)
+    counters = compute_user_stats(user_ids, daily=daily)
+    _insert(UserStats, [
+        dict(fields, user_id=user_id, data_version=1) for user_id, fields in counters.items()
+    ])
+    _insert(DailyCompletion, [
+        {"user_id": user_id, "day": day, "count": count}
+        for user_id, days in daily.items()
+        for day, count in days.items()
+    ])
+    db.session.commit()
+    
+    return [f"bench{i}@example.com" for i in range(users)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--tasks", type=int, default=200, help="Tasks per user.")
+    parser.add_argument("--subtasks", type=int, default=2, help="Average subtasks per task.")
+    parser.add_argument("--categories", type=int, default=4, help="Categories per user (at least 2).")
+    parser.add_argument("--completed-ratio", type=float, default=0.5)
+    parser.add_argument("--recurring-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    
+    started = time.perf_counter()
+    with create_app().app_context():
+        emails = seed(
+            args.users, args.tasks, args.subtasks, max(2, args.categories),
+            args.completed_ratio, args.recurring_ratio, args.seed
+        )
+    print(f"Seeded {len(emails)} users in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+import sqlite3
+import time
+
+import click
+from flask import Blueprint, current_app
+from flask_migrate import upgrade
+from sqlalchemy import case, func
+
+from app import db, MIGRATIONS_DIRECTORY
+from models import User, Task, SubTask, UserStats, DailyCompletion
+from utils import USER_STATS_COUNTERS, USER_STATS_STREAK_FIELDS
+from utils import compute_user_stats, compute_daily_completions
+from archive import archive_completed_tasks, ARCHIVE_BATCH_SIZE
+from transfer import export_user_data, import_user_data, TransferError, TRANSFER_FORMATS
+from query_plans import explain_hot_queries, HOT_QUERIES, QueryPlanUnavailable
+from replicas import REPLICA_BIND
+from sqlite_profile import is_file_database
+from shards import each_shard, shard_binds, shard_for, shard_scope
+from shard_moves import move_user, rebalance_plan, drop_redundant_pins, ShardMoveError
+from jobs import run_due_jobs, prune_jobs
+
+USER_STATS_FIELDS = USER_STATS_COUNTERS + USER_STATS_STREAK_FIELDS
+
+# Maintenance commands, registered at the top level of the flask CLI
+commands_bp = Blueprint('commands', __name__, cli_group=None)
+
+def _user_scopes(user_ids):
+    """Map each shard to the given users living there (None: all of its users)."""
+    if not user_ids:
+        return dict.fromkeys(each_shard())
+    scopes = {}
+    for user_id in user_ids:
+        scopes.setdefault(shard_for(user_id), []).append(user_id)
+    return scopes
+
+@commands_bp.cli.command('rebuild-user-stats')
+@click.option('--check', is_flag=True, help='Only report drift, do not write.')
+@click.option('--user-id', 'user_ids', type=int, multiple=True, help='Limit to these users.')
+def rebuild_user_stats(check, user_ids):
+    """Rebuild the UserStats counters and completion rollup from source data.
+    
+    Reports every user whose stored counters, streaks or daily completion
+    counts drifted from what the Task table says.
+    """
+    checked = drifted = 0
+    for shard, scope in _user_scopes(user_ids).items():
+        with shard_scope(shard):
+            shard_checked, shard_drifted = _rebuild_user_stats(check, scope)
+        checked += shard_checked
+        drifted += shard_drifted
+    
+    click.echo(f'{checked} users checked, {drifted} with drift.')
+    if check and drifted:
+        raise SystemExit(1)
+
+def _rebuild_user_stats(check, scope):
+    # Returns (users checked, users with drift) on the current shard
+    daily = compute_daily_completions(scope)
+    expected = compute_user_stats(scope, daily=daily)
+    
+    rollup_query = DailyCompletion.query
+    if scope is not None:
+        rollup_query = rollup_query.filter(DailyCompletion.user_id.in_(scope))
+    stored_daily = {}
+    for row in rollup_query:
+        stored_daily.setdefault(row.user_id, {})[row.day] = row
+    stored = {
+        stats.user_id: stats
+        for stats in UserStats.query.filter(UserStats.user_id.in_(expected.keys()))
+    }
+    
+    drifted = set()
+    for user_id, counters in expected.items():
+        stats = stored.get(user_id)
+        if stats is None:
+            drifted.add(user_id)
+            click.echo(f'user {user_id}: missing counters row')
+            if not check:
+                db.session.add(UserStats(user_id=user_id, **counters))
+            continue
+        
+        diffs = [
+            f'{name} {getattr(stats, name)} -> {counters[name]}'
+            for name in USER_STATS_FIELDS
+            if getattr(stats, name) != counters[name]
+        ]
+        if diffs:
+            drifted.add(user_id)
+            click.echo(f'user {user_id}: ' + ', '.join(diffs))
+            if not check:
+                for name in USER_STATS_FIELDS:
+                    setattr(stats, name, counters[name])
+                stats.data_version += 1
+    
+    for user_id in expected:
+        days = daily.get(user_id, {})
+        rows = stored_daily.get(user_id, {})
+        diffs = [
+            f'{day} {rows[day].count if day in rows else 0} -> {days.get(day, 0)}'
+            for day in sorted(set(days) | set(rows))
+            if (rows[day].count if day in rows else 0) != days.get(day, 0)
+        ]
+        if diffs:
+            drifted.add(user_id)
+            click.echo(f'user {user_id} daily completions: ' + ', '.join(diffs))
+            if not check:
+                for day in set(days) | set(rows):
+                    if day not in days:
+                        db.session.delete(rows[day])
+                    elif day not in rows:
+                        db.session.add(DailyCompletion(user_id=user_id, day=day, count=days[day]))
+                    else:
+                        rows[day].count = days[day]
+                # The dashboard stats cache is keyed on the data version
+                if user_id in stored:
+                    stored[user_id].data_version += 1
+    
+    if not check:
+        db.session.commit()
+    return len(expected), len(drifted)
+
+@commands_bp.cli.command('rebuild-subtask-counters')
+@click.option('--check', is_flag=True, help='Only report drift, do not write.')
+def rebuild_subtask_counters(check):
+    """Recount Task.subtask_total/subtask_done from the SubTask table."""
+    drifted = 0
+    for shard in each_shard():
+        with shard_scope(shard):
+            drifted += _rebuild_subtask_counters(check)
+    
+    click.echo(f'{drifted} tasks with drift.')
+    if check and drifted:
+        raise SystemExit(1)
+
+def _rebuild_subtask_counters(check):
+    # Returns the number of tasks with drift on the current shard
+    done = func.sum(case((SubTask.is_completed == True, 1), else_=0))
+    counts = {
+        task_id: (total, done_count or 0)
+        for task_id, total, done_count in db.session.query(
+            SubTask.task_id, func.count(SubTask.id), done
+        ).group_by(SubTask.task_id)
+    }
+    
+    drifted = 0
+    for task in Task.query.filter(
+        (Task.subtask_total != 0) | Task.id.in_(counts.keys())
+    ):
+        total, done_count = counts.get(task.id, (0, 0))
+        if (task.subtask_total, task.subtask_done) != (total, done_count):
+            drifted += 1
+            click.echo(
+                f'task {task.id}: {task.subtask_done}/{task.subtask_total} -> {done_count}/{total}'
+            )
+            if not check:
+                task.subtask_total, task.subtask_done = total, done_count
+    
+    if not check:
+        db.session.commit()
+    return drifted
+
+@commands_bp.cli.command('archive-tasks')
+@click.option('--days', type=int, default=None,
+              help='Archive tasks completed more than this many days ago '
+                   '(default: ARCHIVE_COMPLETED_AFTER_DAYS).')
+@click.option('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE, show_default=True)
+def archive_tasks(days, batch_size):
+    """Move old completed tasks and their subtasks to the archive tables.
+    
+    Meant to run periodically, e.g. nightly from cron.
+    """
+    if days is None:
+        days = current_app.config['ARCHIVE_COMPLETED_AFTER_DAYS']
+    archived = 0
+    for shard in each_shard():
+        with shard_scope(shard):
+            archived += archive_completed_tasks(days, batch_size)
+    click.echo(f'{archived} tasks archived.')
+
+@commands_bp.cli.command('export-tasks')
+@click.option('--user-id', type=int, required=True)
+@click.option('--format', 'fmt', type=click.Choice(TRANSFER_FORMATS), default='ndjson')
+@click.option('--output', type=click.File('w'), default='-', help='Defaults to stdout.')
+def export_tasks(user_id, fmt, output):
+    """Stream a user's categories, tasks and subtasks as NDJSON or CSV."""
+    with shard_scope(shard_for(user_id)):
+        for chunk in export_user_data(user_id, fmt):
+            output.write(chunk)
+
+@commands_bp.cli.command('import-tasks')
+@click.option('--user-id', type=int, required=True)
+@click.option('--format', 'fmt', type=click.Choice(TRANSFER_FORMATS), default='ndjson')
+@click.argument('source', type=click.File('r'))
+def import_tasks(user_id, fmt, source):
+    """Import an export file into a user's account in one transaction."""
+    if db.session.get(User, user_id) is None:
+        raise click.ClickException(f'user {user_id} does not exist')
+    with shard_scope(shard_for(user_id)):
+        try:
+            counts = import_user_data(user_id, source, fmt)
+        except TransferError as error:
+            db.session.rollback()
+            raise click.ClickException(str(error))
+        db.session.commit()
+    click.echo(', '.join(f'{count} {name}' for name, count in counts.items()) + ' imported.')
+
+@commands_bp.cli.command('explain-hot-queries')
+@click.option('--user-id', type=int, default=1, show_default=True,
+              help='User the queries are planned for; any id works.')
+def explain_hot_queries_command(user_id):
+    """Check that every hot query is served by an index.
+    
+    Runs EXPLAIN for each query in query_plans.HOT_QUERIES on the current
+    database (SQLite or PostgreSQL) and exits with status 1 if any plan
+    scans a whole table or sorts rows that an index should return in order.
+    Meant to run in CI after `flask db upgrade`.
+    """
+    with shard_scope(shard_for(user_id)):
+        try:
+            results = explain_hot_queries(user_id)
+        except QueryPlanUnavailable as error:
+            raise click.ClickException(str(error))
+    failed = 0
+    for entry in HOT_QUERIES:
+        problems = results[entry['name']]
+        status = 'ok' if not problems else 'FAIL'
+        click.echo(f"{status:4} {entry['name']} ({entry['source']})")
+        for problem in problems:
+            click.echo(f'       {problem}')
+        failed += bool(problems)
+    if failed:
+        raise click.ClickException(f'{failed} hot queries are not served by an index')
+
+@commands_bp.cli.command('sync-sqlite-replica')
+def sync_sqlite_replica():
+    """Copy the primary SQLite database over the replica.
+    
+    Stands in for replication when trying read-replica routing locally
+    with two SQLite files as DATABASE_URL and DATABASE_REPLICA_URL.
+    """
+    replica = db.engines.get(REPLICA_BIND)
+    if replica is None or not (is_file_database(db.engine.url) and is_file_database(replica.url)):
+        raise click.ClickException('DATABASE_URL and DATABASE_REPLICA_URL must both be SQLite files')
+    
+    source = sqlite3.connect(db.engine.url.database)
+    target = sqlite3.connect(replica.url.database)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    click.echo(f'Copied {db.engine.url.database} to {replica.url.database}.')
+
+def _require_shards():
+    if not current_app.config['SHARDS']:
+        raise click.ClickException('sharding is off: set DATABASE_SHARDS')
+
+@commands_bp.cli.command('upgrade-shards')
+def upgrade_shards():
+    """Apply the migrations to every shard database.
+    
+    Shards on the primary database are migrated by `flask db upgrade`.
+    """
+    _require_shards()
+    for bind in shard_binds(current_app.config):
+        click.echo(f'Upgrading {bind}.')
+        upgrade(directory=MIGRATIONS_DIRECTORY, x_arg=[f'bind={bind}'])
+
+@commands_bp.cli.command('move-user')
+@click.option('--user-id', type=int, required=True)
+@click.option('--to', 'target', required=True, help='Name of the target shard.')
+@click.option('--drain-seconds', type=float, default=None,
+              help='Wait after fencing writes (default: SHARD_MOVE_DRAIN_SECONDS).')
+def move_user_command(user_id, target, drain_seconds):
+    """Move one user's data to another shard while the site runs.
+    
+    The user's writes are refused (503) and their background jobs wait from
+    the start of the move until their rows have been copied; reads are
+    served throughout.
+    """
+    _require_shards()
+    try:
+        counts = move_user(user_id, target, drain_seconds)
+    except ShardMoveError as error:
+        raise click.ClickException(str(error))
+    click.echo(', '.join(f'{count} {name}' for name, count in counts.items()) + f' moved to {target}.')
+
+@commands_bp.cli.command('rebalance-shards')
+@click.option('--ring', default=None,
+              help='Comma-separated shards of the ring to balance on (default: SHARD_RING).')
+@click.option('--dry-run', is_flag=True, help='Only list the moves.')
+@click.option('--drain-seconds', type=float, default=None,
+              help='Wait after fencing writes (default: SHARD_MOVE_DRAIN_SECONDS).')
+def rebalance_shards(ring, dry_run, drain_seconds):
+    """Move users to the shard the hash ring puts them on.
+    
+    To add a shard under the hash strategy: add it to DATABASE_SHARDS, run
+    `flask upgrade-shards`, run this with --ring listing the new ring,
+    deploy that ring as SHARD_RING, then run this again without --ring to
+    drop the directory entries the moves left behind.
+    """
+    _require_shards()
+    if current_app.config['SHARD_STRATEGY'] != 'hash':
+        raise click.ClickException('users are placed by the directory; move them with move-user')
+    names = ring.split(',') if ring else None
+    unknown = set(names or ()) - set(current_app.config['SHARDS'])
+    if unknown:
+        raise click.ClickException(f"unknown shards: {', '.join(sorted(unknown))}")
+    
+    moved = failed = 0
+    for user_id, source, target in list(rebalance_plan(names)):
+        click.echo(f'user {user_id}: {source} -> {target}')
+        if dry_run:
+            continue
+        try:
+            move_user(user_id, target, drain_seconds)
+            moved += 1
+        except ShardMoveError as error:
+            click.echo(f'user {user_id}: {error}')
+            failed += 1
+    if not dry_run and not names:
+        click.echo(f'{drop_redundant_pins()} directory entries dropped.')
+    click.echo(f'{moved} users moved, {failed} failed.')
+    if failed:
+        raise SystemExit(1)
+
+@commands_bp.cli.command('run-jobs')
+@click.option('--once', is_flag=True, help='Run the jobs that are due, then exit.')
+def run_jobs(once):
+    """Run queued background jobs in the foreground.
+    
+    For deployments with JOB_WORKERS=0, or to drain the queue by hand.
+    Without --once, keeps polling every JOB_POLL_SECONDS.
+    """
+    poll = current_app.config['JOB_POLL_SECONDS']
+    while True:
+        ran = run_due_jobs()
+        if ran:
+            click.echo(f'{ran} jobs run.')
+        if once:
+            return
+        time.sleep(poll)
+
+@commands_bp.cli.command('prune-jobs')
+@click.option('--days', type=int, default=None,
+              help='Delete jobs finished more than this many days ago '
+                   '(default: JOB_RETENTION_DAYS).')
+def prune_jobs_command(days):
+    """Delete finished background jobs; meant to run from cron."""
+    if days is None:
+        days = current_app.config['JOB_RETENTION_DAYS']
+    deleted = 0
+    for shard in each_shard():
+        with shard_scope(shard):
+            deleted += prune_jobs(days)
+    click.echo(f'{deleted} jobs deleted.')
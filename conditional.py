@@ -0,0 +1,62 @@
+from datetime import date
+from functools import wraps
+
+from flask import g, make_response, request, session
+from flask_login import current_user
+
+from app import db
+from models import UserStats
+
+def _user_data_watermark(user_id):
+    """Get (data_version, data_updated_at) for a user, or None without a row."""
+    return db.session.query(
+        UserStats.data_version, UserStats.data_updated_at
+    ).filter(UserStats.user_id == user_id).first()
+
+def conditional_on_user_data(view):
+    """Answer GETs with 304 Not Modified while the user's data is unchanged.
+    
+    The ETag is built from the user's data version (bumped by every write
+    route) and today's date, since several pages split tasks into today,
+    upcoming and overdue. Last-Modified comes from the data watermark. The
+    check costs one primary-key lookup and runs before the view, so a 304
+    runs no task queries. Responses with pending flash messages are never
+    short-circuited. The version read is left in g.user_data_version for
+    the view, which keys the dashboard stats cache on it.
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+            return view(*args, **kwargs)
+        
+        watermark = _user_data_watermark(current_user.id)
+        if watermark is None:
+            return view(*args, **kwargs)
+        
+        version, updated_at = watermark
+        g.user_data_version = (current_user.id, version)
+        etag = f'{current_user.id}-{version}-{date.today():%Y%m%d}'
+        
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            not_modified = bool(
+                updated_at and request.if_modified_since
+                and updated_at.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+            )
+        
+        if not_modified:
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        
+        response.set_etag(etag)
+        if updated_at:
+            response.last_modified = updated_at
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response
+    return wrapped
@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, SubmitField, TextAreaField, SelectField
+from wtforms import StringField, PasswordField, SubmitField, TextAreaField, SelectField, HiddenField
 from wtforms import DateField, TimeField, BooleanField, IntegerField, FieldList, FormField
 from wtforms.validators import DataRequired, Email, EqualTo, Length, ValidationError
 from models import User
@@ -23,6 +23,8 @@ class RegistrationForm(FlaskForm):
             raise ValidationError('Email already registered. Please log in instead.')
 
 class SubTaskForm(FlaskForm):
+    # Identifies an existing subtask when editing; empty for new ones
+    subtask_id = HiddenField()
     title = StringField('Subtask Title', validators=[DataRequired()])
     is_completed = BooleanField('Completed')
 
@@ -0,0 +1,28 @@
+import os
+
+# The app is imported once in the master and forked into the workers, so
+# boot cost is paid once. create_app opens no database connections and
+# starts no threads or process pools (the reminder thread and the password
+# hashing pool are created on first use in each worker), which keeps the
+# fork safe.
+wsgi_app = "main:app"
+preload_app = True
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", 2))
+
+# Threads let one worker hold open /reminders/stream connections while it
+# keeps serving other requests
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+
+def post_fork(server, worker):
+    # Anything that did connect in the master (e.g. an import-time query)
+    # must not share its sockets with the workers; drop the inherited pool
+    # without closing the parent's connections
+    from main import app
+    from app import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,61 @@
+from flask_login import UserMixin
+from sqlalchemy import event
+
+from app import db
+from models import User
+from utils import TTLCache
+
+# Cache of (id, username, email) per user id for the Flask-Login user loader
+IDENTITY_CACHE_TTL = 300
+IDENTITY_CACHE_MAX_USERS = 4096
+_identity_cache = TTLCache(IDENTITY_CACHE_TTL, IDENTITY_CACHE_MAX_USERS)
+
+class CachedUser(UserMixin):
+    """Lightweight stand-in for User carrying only id, username and email.
+    
+    Any other attribute (joined_at, relationships, check_password, ...)
+    loads the full User row on first access and is served from it.
+    """
+    def __init__(self, id, username, email):
+        self.id = id
+        self.username = username
+        self.email = email
+        self._user = None
+    
+    @property
+    def user(self):
+        """The full User row, loaded on first use."""
+        if self._user is None:
+            self._user = db.session.get(User, self.id)
+        return self._user
+    
+    def __getattr__(self, name):
+        # Only called for attributes not set in __init__
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+    
+    def __repr__(self):
+        return f'<CachedUser {self.username}>'
+
+def load_identity(user_id):
+    """Get a CachedUser for a user id, or None if the user does not exist."""
+    identity = _identity_cache.get(user_id)
+    if identity is None:
+        row = db.session.query(User.id, User.username, User.email).filter(
+            User.id == user_id
+        ).first()
+        if row is None:
+            return None
+        identity = tuple(row)
+        _identity_cache.set(user_id, identity)
+    return CachedUser(*identity)
+
+def invalidate_identity(user_id):
+    """Drop a user's cached identity."""
+    _identity_cache.invalidate(user_id)
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_on_change(mapper, connection, target):
+    invalidate_identity(target.id)
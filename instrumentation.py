@@ -0,0 +1,177 @@
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from flask import Blueprint, Response, abort, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+instrumentation_bp = Blueprint('instrumentation', __name__)
+
+# Histogram buckets for queries per request and SQL seconds per request
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+SQL_SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+class Histogram:
+    """Cumulative Prometheus-style histogram, one series per label value."""
+    
+    def __init__(self, name, help_text, label, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, label_value, value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = {
+                    'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0
+                }
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+    
+    def render(self, worker):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for label_value, series in sorted(self._series.items()):
+                label = f'worker="{worker}",{self.label}="{_escape(label_value)}"'
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{label}}} {series["sum"]}')
+                lines.append(f'{self.name}_count{{{label}}} {series["count"]}')
+        return lines
+
+class LabelledCounter:
+    """Prometheus counter keyed by a tuple of label values."""
+    
+    def __init__(self, name, help_text, labels):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self._values = Counter()
+        self._lock = threading.Lock()
+    
+    def inc(self, *label_values):
+        with self._lock:
+            self._values[label_values] += 1
+    
+    def render(self, worker):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                labels = ','.join(
+                    [f'worker="{worker}"']
+                    + [f'{name}="{_escape(v)}"' for name, v in zip(self.labels, label_values)]
+                )
+                lines.append(f'{self.name}{{{labels}}} {value}')
+        return lines
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+sql_queries = Histogram(
+    'taskito_request_sql_queries', 'SQL statements executed per request.',
+    'endpoint', QUERY_COUNT_BUCKETS
+)
+sql_seconds = Histogram(
+    'taskito_request_sql_seconds', 'Time spent in SQL statements per request.',
+    'endpoint', SQL_SECONDS_BUCKETS
+)
+sql_warnings = LabelledCounter(
+    'taskito_request_sql_warnings_total',
+    'Requests that crossed an SQL instrumentation threshold.',
+    ('endpoint', 'reason')
+)
+
+# Literal lists and placeholders vary between executions of the same query
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|:\w+|\d+)\s*,?)+\)')
+_WHITESPACE = re.compile(r'\s+')
+
+def statement_shape(statement):
+    """Normalize a SQL statement so repeated executions compare equal."""
+    return _PLACEHOLDER_LIST.sub('(?)', _WHITESPACE.sub(' ', statement).strip())
+
+# Listen on the Engine class so every engine (and bind) is instrumented
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    if not has_request_context():
+        return
+    
+    stats = g.get('sql_stats')
+    if stats is None:
+        stats = g.sql_stats = {'count': 0, 'seconds': 0.0, 'shapes': Counter()}
+    stats['count'] += 1
+    stats['seconds'] += elapsed
+    stats['shapes'][statement_shape(statement)] += 1
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(exception_context):
+    # after_cursor_execute does not run for failed statements
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_started'):
+        conn.info['query_started'].pop()
+
+@instrumentation_bp.teardown_app_request
+def record_sql_stats(error=None):
+    # Runs after streamed responses finish too, so their queries count
+    stats = g.pop('sql_stats', None)
+    endpoint = request.endpoint or 'unmatched'
+    if endpoint == 'instrumentation.metrics':
+        return
+    count = stats['count'] if stats else 0
+    seconds = stats['seconds'] if stats else 0.0
+    sql_queries.observe(endpoint, count)
+    sql_seconds.observe(endpoint, seconds)
+    if not stats:
+        return
+    
+    if count > current_app.config['SQL_WARN_QUERIES']:
+        sql_warnings.inc(endpoint, 'queries')
+        logger.warning('%s %s ran %d SQL statements', request.method, request.path, count)
+    if seconds * 1000 > current_app.config['SQL_WARN_MILLISECONDS']:
+        sql_warnings.inc(endpoint, 'time')
+        logger.warning('%s %s spent %.1f ms in SQL', request.method, request.path, seconds * 1000)
+    shape, repeats = stats['shapes'].most_common(1)[0]
+    if repeats >= current_app.config['SQL_WARN_REPEATED_STATEMENTS']:
+        sql_warnings.inc(endpoint, 'repeated_statement')
+        logger.warning(
+            '%s %s repeated one statement %d times (possible N+1): %s',
+            request.method, request.path, repeats, shape[:300]
+        )
+
+@instrumentation_bp.route('/metrics')
+def metrics():
+    """Expose the per-endpoint SQL histograms in Prometheus text format.
+    
+    Answers 404 unless METRICS_TOKEN is set, and then requires it as a
+    bearer token. Values are kept per worker process and a scrape is
+    answered by whichever worker takes it, so every series carries a
+    worker label (the process id): sum over it in queries, and expect
+    each scrape to cover one worker only.
+    """
+    token = current_app.config['METRICS_TOKEN']
+    if not token:
+        abort(404)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    worker = os.getpid()
+    lines = sql_queries.render(worker) + sql_seconds.render(worker) + sql_warnings.render(worker)
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,271 @@
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from flask import Blueprint, current_app, flash, g, has_request_context, request, session
+from flask_login import current_user
+from sqlalchemy import delete, event, exc, insert, select, update
+
+from app import db
+from models import Job
+from replicas import RoutingSession
+from shards import each_shard, moving_user_ids, shard_scope, sharded_engine
+from sqlite_profile import deferred_transactions, is_lock_error
+from utils import dialect_insert
+from achievement_rules import calculate_achievements
+
+logger = logging.getLogger(__name__)
+
+jobs_bp = Blueprint('jobs', __name__)
+
+# Due jobs looked at per claim; workers racing for the first one try the next
+JOB_CLAIM_CANDIDATES = 5
+
+# Pages that show flashed messages, where finished jobs' results are
+# delivered; API calls, streams and form posts leave them for the next one
+RESULT_PAGES = frozenset((
+    'main.dashboard',
+    'main.achievements',
+    'main.progress',
+    'main.profile',
+    'main.new_task',
+    'main.edit_task',
+    'main.new_category',
+))
+
+def _evaluate_achievements(user_id, payload):
+    awarded = calculate_achievements(user_id)
+    if not awarded:
+        return None
+    names = ', '.join(rule['name'] for rule in awarded)
+    return f'Congratulations! You earned new achievements: {names}', 'success'
+
+# Job handlers by kind. A handler gets (user_id, payload), makes its changes
+# in the session without committing, and returns a (message, category) to
+# flash to the user, or None. Its changes are committed together with the
+# job's completion, so a job that fails or dies halfway leaves nothing
+# behind and is simply run again.
+JOB_HANDLERS = {
+    'evaluate_achievements': _evaluate_achievements,
+}
+
+def enqueue_job(kind, user_id, payload=None, key=None):
+    """Queue a job in the caller's transaction; the caller commits.
+    
+    Costs one INSERT. A job whose idempotency key the user already used is
+    not queued again. Inside a request, the user's next page views look for
+    the job's result to flash.
+    """
+    stmt = dialect_insert(Job) if key is not None else None
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_nothing(index_elements=['user_id', 'idempotency_key'])
+    else:
+        stmt = insert(Job)
+    db.session.execute(stmt.values(
+        user_id=user_id,
+        kind=kind,
+        payload=json.dumps(payload) if payload is not None else None,
+        idempotency_key=key,
+        run_after=datetime.utcnow(),
+    ))
+    db.session.info['jobs_enqueued'] = True
+    if has_request_context():
+        session['awaiting_jobs'] = True
+
+def _claim_job():
+    """Take a due job on the current shard under a lease; returns its id or None.
+    
+    Looking for due jobs is a read: on SQLite, idle polls do not take the
+    write lock, which is only held for the claim itself. Jobs of users being
+    moved to another shard wait until the move is done.
+    """
+    now = datetime.utcnow()
+    lease = timedelta(seconds=current_app.config['JOB_LEASE_SECONDS'])
+    with deferred_transactions():
+        query = db.session.query(Job.id).filter(Job.status == 'pending', Job.run_after <= now)
+        moving = moving_user_ids()
+        if moving:
+            query = query.filter(Job.user_id.notin_(moving))
+        candidates = query.order_by(Job.run_after).limit(JOB_CLAIM_CANDIDATES).all()
+        db.session.commit()
+    for (job_id,) in candidates:
+        # Only one worker's UPDATE matches while the job is still due
+        claimed = db.session.execute(
+            update(Job).where(
+                Job.id == job_id, Job.status == 'pending', Job.run_after <= now
+            ).values(run_after=now + lease, attempts=Job.attempts + 1)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return job_id
+    return None
+
+def _run_job(job_id):
+    # The handler reads in a deferred transaction, so SQLite's write lock is
+    # only taken for its writes; if another writer wins, the job is retried
+    try:
+        with deferred_transactions():
+            job = db.session.get(Job, job_id)
+            handler = JOB_HANDLERS.get(job.kind)
+            if handler is None:
+                raise LookupError(f'no handler for job kind {job.kind!r}')
+            result = handler(job.user_id, json.loads(job.payload) if job.payload else None)
+            
+            job.status = 'done'
+            job.finished_at = datetime.utcnow()
+            if result:
+                job.message, job.message_category = result
+            else:
+                job.notified = True
+            db.session.commit()
+    except Exception as error:
+        db.session.rollback()
+        _job_failed(job_id, error)
+
+def _job_failed(job_id, error):
+    # Retry with exponential backoff until the attempts run out. Losing the
+    # SQLite write lock to another writer is not the job's fault: it is
+    # retried after the base delay without using up an attempt.
+    config = current_app.config
+    job = db.session.get(Job, job_id)
+    job.last_error = f'{type(error).__name__}: {error}'
+    if isinstance(error, exc.OperationalError) and is_lock_error(error):
+        job.attempts -= 1
+        job.run_after = datetime.utcnow() + timedelta(seconds=config['JOB_RETRY_SECONDS'])
+        logger.info('Job %s (%s) lost the write lock, retrying', job.id, job.kind)
+    elif job.attempts >= config['JOB_MAX_ATTEMPTS']:
+        job.status = 'failed'
+        job.finished_at = datetime.utcnow()
+        job.notified = True
+        logger.exception('Job %s (%s) failed after %s attempts', job.id, job.kind, job.attempts)
+    else:
+        delay = config['JOB_RETRY_SECONDS'] * 2 ** (job.attempts - 1)
+        job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+        logger.warning('Job %s (%s) failed, retrying in %ss: %s', job.id, job.kind, delay, error)
+    db.session.commit()
+
+def run_due_jobs(limit=None):
+    """Run due jobs on every shard until none is left (or limit have run).
+    
+    Returns the number of jobs run. Needs an app context.
+    """
+    ran = 0
+    while limit is None or ran < limit:
+        ran_before = ran
+        for shard in each_shard():
+            with shard_scope(shard):
+                job_id = _claim_job()
+                if job_id is not None:
+                    _run_job(job_id)
+                    ran += 1
+        db.session.remove()
+        if ran == ran_before:
+            break
+    return ran
+
+class JobWorkers:
+    """JOB_WORKERS threads running due jobs for one app.
+    
+    Started on the first request, so that forked gunicorn workers each run
+    their own. Workers wake up when a job is committed in this process and
+    poll every JOB_POLL_SECONDS for jobs queued elsewhere or due for retry.
+    The number of threads bounds how many jobs run at once per process.
+    """
+    def __init__(self, app):
+        self._app = app
+        self._wake = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+    
+    def start(self):
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self._app.config['JOB_WORKERS']:
+                thread = threading.Thread(
+                    target=self._run, name=f'jobs-{len(self._threads)}', daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+    
+    def wake(self):
+        self._wake.set()
+    
+    def _run(self):
+        poll = self._app.config['JOB_POLL_SECONDS']
+        while True:
+            self._wake.clear()
+            try:
+                with self._app.app_context():
+                    ran = run_due_jobs(limit=1)
+            except Exception:
+                logger.exception('Job worker error')
+                ran = 0
+            if not ran:
+                self._wake.wait(timeout=poll)
+
+def _workers(app):
+    workers = app.extensions.get('jobs')
+    if workers is None:
+        workers = app.extensions['jobs'] = JobWorkers(app)
+    return workers
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _wake_workers(db_session):
+    if db_session.info.pop('jobs_enqueued', False):
+        _workers(current_app._get_current_object()).wake()
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_jobs(db_session):
+    db_session.info.pop('jobs_enqueued', None)
+
+@jobs_bp.before_app_request
+def deliver_job_results():
+    _workers(current_app._get_current_object()).start()
+    
+    # Only sessions that queued a job look for results, and only on page
+    # views, where flashed messages are shown
+    if request.method != 'GET' or request.endpoint not in RESULT_PAGES:
+        return
+    if not session.get('awaiting_jobs') or not current_user.is_authenticated:
+        return
+    # Marking results delivered is a write, which a shard move would lose
+    if g.get('shard_moving'):
+        return
+    # Read from the primary (or the user's shard): results written a moment
+    # ago may not have reached the read replica yet
+    rows = db.session.execute(
+        select(Job.id, Job.status, Job.message, Job.message_category).where(
+            Job.user_id == current_user.id, Job.notified == False
+        ),
+        bind_arguments={'bind': sharded_engine(db, Job, None) or db.engine}
+    ).all()
+    finished = [row for row in rows if row.status != 'pending']
+    for row in finished:
+        flash(row.message, row.message_category)
+    if len(finished) == len(rows):
+        session.pop('awaiting_jobs')
+    if finished:
+        # End the read before writing, so SQLite waits for the write lock
+        db.session.commit()
+        db.session.execute(
+            update(Job).where(Job.id.in_([row.id for row in finished])).values(notified=True)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+def prune_jobs(older_than_days):
+    """Delete finished jobs older than older_than_days on the current shard.
+    
+    Their idempotency keys can be used again afterwards. Returns the number
+    of jobs deleted.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    deleted = db.session.execute(
+        delete(Job).where(
+            Job.status.in_(('done', 'failed')), Job.notified == True, Job.finished_at < cutoff
+        ).execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return deleted
@@ -0,0 +1,71 @@
+"""Add the archived task search index
+
+Revision ID: a41c9d2e7b53
+Revises: 6784c9e1cc7d
+Create Date: 2026-10-17 03:41:08.516322
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41c9d2e7b53'
+down_revision = '6784c9e1cc7d'
+branch_labels = None
+depends_on = None
+
+
+# The same text index as the task table's (revision cb1e30685c8e), over
+# archived_task, so that search still finds tasks after they are archived.
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS archived_task_fts USING fts5(
+        title, description, content='archived_task', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS archived_task_fts_insert AFTER INSERT ON archived_task BEGIN
+        INSERT INTO archived_task_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS archived_task_fts_delete AFTER DELETE ON archived_task BEGIN
+        INSERT INTO archived_task_fts(archived_task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS archived_task_fts_update AFTER UPDATE OF title, description ON archived_task BEGIN
+        INSERT INTO archived_task_fts(archived_task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO archived_task_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    # Index the tasks archived so far
+    "INSERT INTO archived_task_fts(archived_task_fts) VALUES ('rebuild')",
+]
+
+POSTGRESQL_SEARCH_DDL = [
+    """ALTER TABLE archived_task ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_archived_task_search_vector ON archived_task USING GIN (search_vector)",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        for statement in POSTGRESQL_SEARCH_DDL:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in ('archived_task_fts_insert', 'archived_task_fts_delete', 'archived_task_fts_update'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS archived_task_fts')
+    elif dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_archived_task_search_vector')
+        op.execute('ALTER TABLE archived_task DROP COLUMN IF EXISTS search_vector')
@@ -0,0 +1,75 @@
+"""Add the task search index
+
+Revision ID: cb1e30685c8e
+Revises: 8277526e3045
+Create Date: 2026-10-17 03:21:27.954108
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cb1e30685c8e'
+down_revision = '8277526e3045'
+branch_labels = None
+depends_on = None
+
+
+# Text index over task titles and descriptions, used by search.py.
+#
+# SQLite: an external-content FTS5 table (task_fts) kept in sync with the
+# task table by triggers. PostgreSQL: a generated tsvector column with a GIN
+# index. Either way every write path, including bulk statements, keeps the
+# index current without application code.
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS task_fts USING fts5(
+        title, description, content='task', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_insert AFTER INSERT ON task BEGIN
+        INSERT INTO task_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_delete AFTER DELETE ON task BEGIN
+        INSERT INTO task_fts(task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS task_fts_update AFTER UPDATE OF title, description ON task BEGIN
+        INSERT INTO task_fts(task_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO task_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    # Index the tasks that already exist
+    "INSERT INTO task_fts(task_fts) VALUES ('rebuild')",
+]
+
+POSTGRESQL_SEARCH_DDL = [
+    """ALTER TABLE task ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_task_search_vector ON task USING GIN (search_vector)",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        for statement in POSTGRESQL_SEARCH_DDL:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for trigger in ('task_fts_insert', 'task_fts_delete', 'task_fts_update'):
+            op.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        op.execute('DROP TABLE IF EXISTS task_fts')
+    elif dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_task_search_vector')
+        op.execute('ALTER TABLE task DROP COLUMN IF EXISTS search_vector')
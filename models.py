@@ -1,7 +1,7 @@
 from datetime import datetime
 from app import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from passwords import hash_password, verify_password, needs_rehash
 
 # Define User model with UserMixin for Flask-Login compatibility
 class User(UserMixin, db.Model):
@@ -15,12 +15,22 @@ class User(UserMixin, db.Model):
     tasks = db.relationship('Task', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     categories = db.relationship('Category', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     achievements = db.relationship('Achievement', backref='user', lazy='dynamic', cascade='all, delete-orphan')
+    stats = db.relationship('UserStats', backref='user', uselist=False, cascade='all, delete-orphan')
+    archived_tasks = db.relationship('ArchivedTask', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
-        
+        self.password_hash = hash_password(password)
+    
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        """Check a password, upgrading the stored hash if its parameters are outdated.
+        
+        The caller commits, so an upgraded hash is saved with the login.
+        """
+        if not verify_password(self.password_hash, password):
+            return False
+        if needs_rehash(self.password_hash):
+            self.set_password(password)
+        return True
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -29,11 +39,12 @@ class User(UserMixin, db.Model):
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     is_default = db.Column(db.Boolean, default=False)
     
     # Define relationship
     tasks = db.relationship('Task', backref='category', lazy='dynamic', cascade='all, delete-orphan')
+    archived_tasks = db.relationship('ArchivedTask', backref='category', lazy='dynamic', cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Category {self.name}>'
@@ -60,6 +71,10 @@ class Task(db.Model):
     # Track if a task has been selected for progress tracking
     track_progress = db.Column(db.Boolean, default=False)
     
+    # Subtask counters, kept in step with every subtask insert/delete/toggle
+    subtask_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    subtask_done = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
     # For recurring tasks
     is_recurring = db.Column(db.Boolean, default=False)
     
@@ -69,20 +84,43 @@ class Task(db.Model):
     
     # Foreign keys
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False, index=True)
     
     # Define relationship
     subtasks = db.relationship('SubTask', backref='task', lazy='dynamic', cascade='all, delete-orphan')
     
+    # Indexes follow the hot query shapes (see query_plans.HOT_QUERIES).
+    # Active-task lists (dashboard, filter_tasks, reminders, progress) read
+    # one user's incomplete tasks in due order from a partial index that
+    # leaves completed tasks out. Completed-task reads (recent completions,
+    # statistics over task_history) go through user_id, is_completed,
+    # completed_at.
+    __table_args__ = (
+        db.Index(
+            'ix_task_user_active_due', 'user_id', 'due_date', 'due_time', 'id',
+            sqlite_where=db.text('is_completed = 0'),
+            postgresql_where=db.text('is_completed = false')
+        ),
+        db.Index('ix_task_user_completed', 'user_id', 'is_completed', 'completed_at'),
+    )
+    
     def __repr__(self):
         return f'<Task {self.title}>'
     
+    def add_subtask(self, title, is_completed=False):
+        """Add a subtask to this task and count it in the subtask counters."""
+        subtask = SubTask(title=title, is_completed=is_completed)
+        self.subtasks.append(subtask)
+        self.subtask_total = (self.subtask_total or 0) + 1
+        if is_completed:
+            self.subtask_done = (self.subtask_done or 0) + 1
+        return subtask
+    
     def update_progress_from_subtasks(self):
         """Update task progress based on completed subtasks."""
-        subtasks_count = self.subtasks.count()
-        if subtasks_count > 0:
-            completed_count = self.subtasks.filter_by(is_completed=True).count()
-            self.progress = int((completed_count / subtasks_count) * 100)
+        if self.subtask_total:
+            # Integer arithmetic, matching the SQL used by toggle_subtask
+            self.progress = (self.subtask_done or 0) * 100 // self.subtask_total
         else:
             # If no subtasks, progress is based on task status
             if self.status == 0:  # Not Started
@@ -99,9 +137,58 @@ class SubTask(db.Model):
     is_completed = db.Column(db.Boolean, default=False)
     task_id = db.Column(db.Integer, db.ForeignKey('task.id'), nullable=False)
     
+    # A task's subtasks are read in id order
+    __table_args__ = (
+        db.Index('ix_sub_task_task', 'task_id', 'id'),
+    )
+    
     def __repr__(self):
         return f'<SubTask {self.title}>'
 
+# Define ArchivedTask model: completed tasks moved out of the task table by
+# `flask archive-tasks`, so that active-task queries stay small. Columns
+# mirror Task; task_id is the id the task had while it was live.
+class ArchivedTask(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    due_date = db.Column(db.Date, nullable=False)
+    due_time = db.Column(db.Time, nullable=False)
+    created_at = db.Column(db.DateTime)
+    last_updated = db.Column(db.DateTime)
+    priority = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.Integer, default=2)
+    progress = db.Column(db.Integer, default=100)
+    track_progress = db.Column(db.Boolean, default=False)
+    subtask_total = db.Column(db.Integer, nullable=False, default=0)
+    subtask_done = db.Column(db.Integer, nullable=False, default=0)
+    is_recurring = db.Column(db.Boolean, default=False)
+    is_completed = db.Column(db.Boolean, nullable=False, default=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    
+    # Define relationship
+    subtasks = db.relationship('ArchivedSubTask', backref='task', lazy='dynamic', cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        db.Index('ix_archived_task_user_completed', 'user_id', 'completed_at'),
+    )
+    
+    def __repr__(self):
+        return f'<ArchivedTask {self.title}>'
+
+class ArchivedSubTask(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(100), nullable=False)
+    is_completed = db.Column(db.Boolean, default=False)
+    archived_task_id = db.Column(db.Integer, db.ForeignKey('archived_task.id'), nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<ArchivedSubTask {self.title}>'
+
 # Define Achievement model for user rewards
 class Achievement(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -111,5 +198,93 @@ class Achievement(db.Model):
     earned_at = db.Column(db.DateTime, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     
+    # Each achievement is awarded at most once per user; the indexes serve
+    # the achievements page and the profile's most recent achievements
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'name', name='uq_achievement_user_name'),
+        db.Index('ix_achievement_user_level', 'user_id', 'trophy_level', 'earned_at'),
+        db.Index('ix_achievement_user_earned', 'user_id', 'earned_at'),
+    )
+    
     def __repr__(self):
         return f'<Achievement {self.name}>'
+
+# Define UserStats model holding denormalized per-user counters.
+# Rows are adjusted in the same transaction as the task writes that affect
+# them (see utils.adjust_user_stats) and can be rebuilt from source data with
+# `flask rebuild-user-stats`.
+class UserStats(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    tasks_count = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    high_priority_completed = db.Column(db.Integer, nullable=False, default=0)
+    achievements_count = db.Column(db.Integer, nullable=False, default=0)
+    categories_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Streak of consecutive days with completed tasks, ending on last_completion_day
+    current_streak = db.Column(db.Integer, nullable=False, default=0)
+    longest_streak = db.Column(db.Integer, nullable=False, default=0)
+    last_completion_day = db.Column(db.Date, nullable=True)
+    
+    # Bumped by every write to the user's data; read routes use it as the
+    # ETag/Last-Modified watermark for conditional GETs
+    data_version = db.Column(db.Integer, nullable=False, default=0)
+    data_updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UserStats {self.user_id}>'
+
+# Define DailyCompletion model: number of tasks a user completed per (UTC) day
+class DailyCompletion(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DailyCompletion {self.user_id} {self.day}>'
+
+# Define UserShard model: the shard directory, in the primary database.
+# Users without an entry live where the hash ring puts them (see shards.py);
+# moving is set while `flask move-user` copies the user's rows, and their
+# writes are refused until it is cleared.
+class UserShard(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    shard = db.Column(db.String(64), nullable=False, index=True)
+    moving = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    
+    def __repr__(self):
+        return f'<UserShard {self.user_id} {self.shard}>'
+
+# Define Job model: durable background jobs for one user, enqueued in the
+# same transaction as the write that calls for them (see jobs.py). A pending
+# job is due once run_after has passed; a worker running it pushes run_after
+# out by its lease, so a job whose worker died is picked up again.
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=True)  # JSON
+    idempotency_key = db.Column(db.String(128), nullable=True)
+    
+    # 'pending', 'done' or 'failed' (after JOB_MAX_ATTEMPTS attempts)
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    # Flashed to the user on their next page view, then marked notified
+    message = db.Column(db.Text, nullable=True)
+    message_category = db.Column(db.String(16), nullable=True)
+    notified = db.Column(db.Boolean, nullable=False, default=False)
+    
+    # Workers look for due jobs; page views for the user's undelivered results
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'idempotency_key', name='uq_job_user_key'),
+        db.Index('ix_job_status_run_after', 'status', 'run_after'),
+        db.Index('ix_job_user_notified', 'user_id', 'notified'),
+    )
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind}>'
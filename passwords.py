@@ -0,0 +1,106 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+class HashingBusy(Exception):
+    """Raised when too many password hashing jobs are already waiting."""
+
+_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+_pool = None
+_pool_lock = threading.Lock()
+_slots = None
+_canonical_methods = {}
+
+def _config(name):
+    return current_app.config[name]
+
+def _get_pool():
+    """Get this process's hashing pool, creating it on first use.
+    
+    Created lazily so that forked gunicorn workers each get their own pool.
+    Pool processes come from a fork server, a fresh interpreter that only
+    imports werkzeug.security: forking the worker itself could copy a lock
+    held by one of its other threads (request, reminder and job threads)
+    into a child that then deadlocks. Returns None when hashing is
+    configured to run inline.
+    """
+    global _pool, _slots
+    workers = _config('PASSWORD_HASH_WORKERS')
+    if workers <= 0:
+        return None
+    
+    with _pool_lock:
+        if _pool is None:
+            context = multiprocessing.get_context(_START_METHOD)
+            if _START_METHOD == 'forkserver':
+                context.set_forkserver_preload(['werkzeug.security'])
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(_config('PASSWORD_HASH_MAX_PENDING'))
+        return _pool
+
+def _discard_pool(pool):
+    # A pool whose process died refuses all further work; the next call
+    # starts a new one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _run(func, *args):
+    """Run a hashing function in the pool, applying the concurrency cap.
+    
+    Raises HashingBusy if no slot frees up within PASSWORD_HASH_TIMEOUT.
+    If a pool process died, the pool is replaced and the job run once more.
+    """
+    pool = _get_pool()
+    if pool is None:
+        return func(*args)
+    
+    if not _slots.acquire(timeout=_config('PASSWORD_HASH_TIMEOUT')):
+        raise HashingBusy()
+    try:
+        try:
+            return pool.submit(func, *args).result()
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            return _get_pool().submit(func, *args).result()
+    finally:
+        _slots.release()
+
+def hash_password(password):
+    """Hash a password with the configured method and salt length."""
+    return _run(
+        generate_password_hash,
+        password,
+        _config('PASSWORD_HASH_METHOD'),
+        _config('PASSWORD_SALT_LENGTH')
+    )
+
+def verify_password(password_hash, password):
+    """Check a password against a stored hash."""
+    return _run(check_password_hash, password_hash, password)
+
+def _canonical_method(method):
+    # werkzeug expands defaults ('scrypt' -> 'scrypt:32768:8:1'); hashing an
+    # empty password once tells us the full form to compare stored hashes to
+    if method not in _canonical_methods:
+        _canonical_methods[method] = generate_password_hash('', method, 1).split('$', 1)[0]
+    return _canonical_methods[method]
+
+def needs_rehash(password_hash):
+    """Whether a stored hash uses other parameters than the configured ones."""
+    try:
+        method, salt, _ = password_hash.split('$', 2)
+    except ValueError:
+        return True
+    return (
+        method != _canonical_method(_config('PASSWORD_HASH_METHOD'))
+        or len(salt) != _config('PASSWORD_SALT_LENGTH')
+    )
@@ -0,0 +1,210 @@
+from datetime import date, time
+
+from sqlalchemy import func, tuple_
+
+from app import db
+from models import Task, Category, SubTask, ArchivedTask, Achievement, Job
+from utils import apply_task_filters, task_history
+
+# Hot query registry.
+#
+# Each entry rebuilds, for one user, a query that runs on every request of
+# the view named in 'source'. 'ordered' entries must also return rows in
+# index order: on SQLite no temp B-tree may be used for their ORDER BY, on
+# PostgreSQL no Sort node may remain with sorting disabled. Keep the
+# shapes in step with the views when either changes.
+HOT_QUERIES = [
+    {
+        'name': 'active_tasks',
+        'source': 'routes.dashboard',
+        'ordered': True,
+        'query': lambda user_id, today: Task.query.filter_by(
+            user_id=user_id, is_completed=False
+        ).order_by(Task.due_date, Task.due_time),
+    },
+    {
+        'name': 'active_tasks_by_status',
+        'source': 'utils._compute_dashboard_stats',
+        'ordered': False,
+        'query': lambda user_id, today: db.session.query(Task.status, func.count(Task.id)).filter(
+            Task.user_id == user_id, Task.is_completed == False
+        ).group_by(Task.status),
+    },
+    {
+        'name': 'filter_tasks_page',
+        'source': 'routes.filter_tasks',
+        'ordered': True,
+        'query': lambda user_id, today: apply_task_filters(
+            db.session.query(Task.id, Task.title, Category.name).join(
+                Category, Task.category_id == Category.id
+            ).filter(Task.user_id == user_id, Task.is_completed == False),
+            {'priority': '3', 'status': 'upcoming'}
+        ).filter(
+            tuple_(Task.due_date, Task.due_time, Task.id) > (today, time(0, 0), 0)
+        ).order_by(Task.due_date, Task.due_time, Task.id).limit(51),
+    },
+    {
+        'name': 'categories',
+        'source': 'routes.dashboard',
+        'ordered': False,
+        'query': lambda user_id, today: Category.query.filter_by(user_id=user_id),
+    },
+    {
+        'name': 'tracking_tasks',
+        'source': 'routes.progress',
+        'ordered': False,
+        'query': lambda user_id, today: Task.query.filter_by(
+            user_id=user_id, track_progress=True, is_completed=False
+        ),
+    },
+    {
+        'name': 'recent_completions',
+        'source': 'routes.progress',
+        'ordered': True,
+        'query': lambda user_id, today: Task.query.filter_by(
+            user_id=user_id, is_completed=True
+        ).order_by(Task.completed_at.desc()).limit(5),
+    },
+    {
+        'name': 'api_completed_tasks',
+        'source': 'api.list_tasks',
+        'ordered': True,
+        'query': lambda user_id, today: db.session.query(Task.id, Task.title).filter(
+            Task.user_id == user_id, Task.is_completed == True
+        ).order_by(Task.completed_at.desc(), Task.id.desc()).limit(51),
+    },
+    {
+        'name': 'recent_archived_completions',
+        'source': 'routes.progress',
+        'ordered': True,
+        'query': lambda user_id, today: ArchivedTask.query.filter_by(
+            user_id=user_id
+        ).order_by(ArchivedTask.completed_at.desc()).limit(5),
+    },
+    {
+        'name': 'task_history',
+        'source': 'utils.get_category_stats',
+        'ordered': False,
+        'query': lambda user_id, today: db.session.query(task_history([user_id])),
+    },
+    {
+        'name': 'achievements',
+        'source': 'routes.achievements',
+        'ordered': True,
+        'query': lambda user_id, today: Achievement.query.filter_by(user_id=user_id).order_by(
+            Achievement.trophy_level.desc(), Achievement.earned_at.desc()
+        ),
+    },
+    {
+        'name': 'recent_achievements',
+        'source': 'routes.profile',
+        'ordered': True,
+        'query': lambda user_id, today: Achievement.query.filter_by(user_id=user_id).order_by(
+            Achievement.earned_at.desc()
+        ).limit(3),
+    },
+    {
+        'name': 'reminder_tasks',
+        'source': 'reminders.ReminderScheduler.load_user',
+        'ordered': False,
+        'query': lambda user_id, today: db.session.query(
+            Task.id, Task.title, Task.due_date, Task.due_time
+        ).filter(
+            Task.user_id == user_id, Task.is_completed == False, Task.due_date >= today
+        ),
+    },
+    {
+        'name': 'subtasks',
+        'source': 'routes.edit_task',
+        'ordered': True,
+        'query': lambda user_id, today: SubTask.query.filter_by(task_id=1).order_by(SubTask.id),
+    },
+    {
+        'name': 'due_jobs',
+        'source': 'jobs._claim_job',
+        'ordered': True,
+        'query': lambda user_id, today: db.session.query(Job.id).filter(
+            Job.status == 'pending', Job.run_after <= today
+        ).order_by(Job.run_after).limit(5),
+    },
+    {
+        'name': 'job_results',
+        'source': 'jobs.deliver_job_results',
+        'ordered': False,
+        'query': lambda user_id, today: db.session.query(Job.id, Job.status, Job.message).filter(
+            Job.user_id == user_id, Job.notified == False
+        ),
+    },
+]
+
+class QueryPlanUnavailable(Exception):
+    """The database has no query plan check explain_hot_queries can run."""
+
+def _sqlite_problems(connection, sql, ordered):
+    tables = set(db.metadata.tables)
+    problems = []
+    for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql):
+        detail = row[-1]
+        words = detail.split()
+        if words[0] == 'SCAN' and words[1] in tables:
+            problems.append(detail)
+        elif ordered and 'TEMP B-TREE' in detail and 'ORDER BY' in detail:
+            problems.append(detail)
+    return problems
+
+def _postgresql_problems(connection, sql, ordered):
+    # With sequential scans (and, for ordered queries, sorts) priced out,
+    # any that remain had no index to use instead
+    connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    if ordered:
+        connection.exec_driver_sql('SET LOCAL enable_sort = off')
+    plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + sql).scalar()[0]['Plan']
+    
+    problems = []
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get('Plans', ()))
+        kind = node['Node Type']
+        if kind == 'Seq Scan':
+            problems.append(f"Seq Scan on {node['Relation Name']}")
+        elif kind in ('Index Scan', 'Index Only Scan') and 'Index Cond' not in node:
+            problems.append(f"{kind} on {node['Relation Name']} without an index condition")
+        elif ordered and kind in ('Sort', 'Incremental Sort'):
+            problems.append(f"{kind} by {', '.join(node.get('Sort Key', ()))}")
+    return problems
+
+def explain_hot_queries(user_id, today=None):
+    """Check the plan of every hot query on the current database.
+    
+    Returns a dict mapping each query name to a list of problems: full
+    table scans and, for ordered queries, sorts that an index should have
+    made unnecessary. Plans are taken in a transaction that is rolled back,
+    on the database holding the tasks (the current shard when sharded).
+    Raises QueryPlanUnavailable on databases other than SQLite and
+    PostgreSQL.
+    """
+    today = today or date.today()
+    connection = db.session.connection(bind_arguments={'mapper': Task.__mapper__})
+    dialect = connection.dialect
+    if dialect.name == 'sqlite':
+        check = _sqlite_problems
+    elif dialect.name == 'postgresql':
+        check = _postgresql_problems
+    else:
+        raise QueryPlanUnavailable(f'Query plans are not checked on {dialect.name}')
+    
+    results = {}
+    try:
+        for entry in HOT_QUERIES:
+            statement = entry['query'](user_id, today).statement
+            sql = str(statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+            # Undo the planner settings before the next query
+            savepoint = connection.begin_nested()
+            try:
+                results[entry['name']] = check(connection, sql, entry['ordered'])
+            finally:
+                savepoint.rollback()
+    finally:
+        db.session.rollback()
+    return results
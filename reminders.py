@@ -0,0 +1,221 @@
+import heapq
+import itertools
+import json
+import queue
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from models import Task, UserStats
+
+class ReminderScheduler:
+    """Per-process scheduler that pushes due-date reminders to subscribers.
+    
+    Reminders sit in a min-heap keyed on when they should fire (due date and
+    time minus REMINDER_LEAD_MINUTES). A single background thread sleeps
+    until the earliest one is due and hands it to the user's subscriber
+    queues. Only users with an open stream in this process are scheduled:
+    a user's active tasks are loaded when they subscribe and dropped when
+    their last stream closes. Task writes update the schedule incrementally;
+    superseded heap entries are skipped lazily via a per-task generation.
+    A fired reminder is remembered with its due time, so reloads and edits
+    do not send it again unless the task is rescheduled.
+    """
+    def __init__(self):
+        self._heap = []
+        self._entries = {}  # task_id -> (generation, user_id, reminder)
+        self._user_tasks = defaultdict(set)
+        self._subscribers = defaultdict(set)
+        self._versions = {}
+        self._fired = defaultdict(dict)  # user_id -> {task_id: due_at}
+        self._generation = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+    
+    def _start(self):
+        # Started lazily so forked gunicorn workers each run their own thread
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='reminders', daemon=True)
+            self._thread.start()
+    
+    def _push(self, task_id, user_id, title, due_date, due_time, lead):
+        due_at = datetime.combine(due_date, due_time)
+        if due_at < datetime.now():
+            return
+        if self._fired.get(user_id, {}).get(task_id) == due_at:
+            return
+        generation = next(self._generation)
+        reminder = {
+            'id': task_id,
+            'title': title,
+            'due_date': due_date.isoformat(),
+            'due_time': due_time.strftime('%H:%M')
+        }
+        self._entries[task_id] = (generation, user_id, reminder, due_at)
+        self._user_tasks[user_id].add(task_id)
+        heapq.heappush(self._heap, (due_at - lead, generation, task_id))
+    
+    def _drop(self, task_id):
+        entry = self._entries.pop(task_id, None)
+        if entry is not None:
+            self._user_tasks[entry[1]].discard(task_id)
+    
+    def _drop_user(self, user_id):
+        for task_id in self._user_tasks.pop(user_id, set()):
+            self._entries.pop(task_id, None)
+        self._versions.pop(user_id, None)
+        self._forget_fired(user_id)
+        # Compact once superseded entries dominate the heap
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [item for item in self._heap
+                          if self._entries.get(item[2], (None,))[0] == item[1]]
+            heapq.heapify(self._heap)
+    
+    def _forget_fired(self, user_id):
+        # Past their due time, fired reminders would not be pushed anyway
+        now = datetime.now()
+        fired = self._fired.get(user_id, {})
+        for task_id, due_at in list(fired.items()):
+            if due_at < now:
+                del fired[task_id]
+        if not fired:
+            self._fired.pop(user_id, None)
+    
+    def load_user(self, user_id, version):
+        """(Re)load a user's active tasks into the schedule."""
+        lead = timedelta(minutes=current_app.config['REMINDER_LEAD_MINUTES'])
+        rows = db.session.query(
+            Task.id, Task.title, Task.due_date, Task.due_time
+        ).filter(
+            Task.user_id == user_id,
+            Task.is_completed == False,
+            Task.due_date >= datetime.now().date()
+        ).all()
+        
+        with self._cond:
+            for task_id in list(self._user_tasks.get(user_id, ())):
+                self._drop(task_id)
+            self._forget_fired(user_id)
+            for row in rows:
+                self._push(row.id, user_id, row.title, row.due_date, row.due_time, lead)
+            self._versions[user_id] = version
+            self._cond.notify()
+    
+    def loaded_version(self, user_id):
+        with self._cond:
+            return self._versions.get(user_id)
+    
+    def _current_version(self, user_id):
+        # The write being applied already bumped the user's data version;
+        # record it so the stream's heartbeat does not reload the schedule
+        return db.session.query(UserStats.data_version).filter(
+            UserStats.user_id == user_id
+        ).scalar()
+    
+    def task_changed(self, task):
+        """Reschedule a task after it was created or edited (no-op if its user has no stream)."""
+        if task.user_id not in self._subscribers:
+            return
+        if task.is_completed:
+            self.task_removed(task.user_id, task.id)
+            return
+        lead = timedelta(minutes=current_app.config['REMINDER_LEAD_MINUTES'])
+        version = self._current_version(task.user_id)
+        with self._cond:
+            self._drop(task.id)
+            self._push(task.id, task.user_id, task.title, task.due_date, task.due_time, lead)
+            if task.user_id in self._versions:
+                self._versions[task.user_id] = version
+            self._cond.notify()
+    
+    def task_removed(self, user_id, task_id):
+        """Cancel a task's reminder after it was completed or deleted."""
+        if user_id not in self._subscribers:
+            return
+        version = self._current_version(user_id)
+        with self._cond:
+            self._drop(task_id)
+            if user_id in self._versions:
+                self._versions[user_id] = version
+    
+    def subscribe(self, user_id):
+        events = queue.Queue(maxsize=100)
+        with self._cond:
+            self._subscribers[user_id].add(events)
+            self._start()
+        return events
+    
+    def unsubscribe(self, user_id, events):
+        with self._cond:
+            self._subscribers[user_id].discard(events)
+            if not self._subscribers[user_id]:
+                del self._subscribers[user_id]
+                self._drop_user(user_id)
+    
+    def _run(self):
+        with self._cond:
+            while True:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                
+                fire_at, generation, task_id = self._heap[0]
+                delay = (fire_at - datetime.now()).total_seconds()
+                if delay > 0:
+                    self._cond.wait(timeout=delay)
+                    continue
+                
+                heapq.heappop(self._heap)
+                entry = self._entries.get(task_id)
+                if entry is None or entry[0] != generation:
+                    continue  # Superseded or cancelled
+                self._drop(task_id)
+                
+                _, user_id, reminder, due_at = entry
+                self._fired[user_id][task_id] = due_at
+                for events in self._subscribers.get(user_id, ()):
+                    try:
+                        events.put_nowait(reminder)
+                    except queue.Full:
+                        pass
+
+reminder_scheduler = ReminderScheduler()
+
+def _data_version(user_id):
+    version = db.session.query(UserStats.data_version).filter(
+        UserStats.user_id == user_id
+    ).scalar()
+    # Don't hold a connection for the lifetime of the stream
+    db.session.close()
+    return version
+
+def reminder_stream(user_id):
+    """Generate the Server-Sent Events stream of reminders for a user.
+    
+    Writes made by other worker processes are picked up on the heartbeat by
+    comparing the user's data version with the one the schedule was loaded
+    at. Each open stream occupies a worker thread, so serve it from threaded
+    or async gunicorn workers.
+    """
+    heartbeat = current_app.config['REMINDER_HEARTBEAT_SECONDS']
+    events = reminder_scheduler.subscribe(user_id)
+    try:
+        reminder_scheduler.load_user(user_id, _data_version(user_id))
+        db.session.close()
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                reminder = events.get(timeout=heartbeat)
+            except queue.Empty:
+                version = _data_version(user_id)
+                if version != reminder_scheduler.loaded_version(user_id):
+                    reminder_scheduler.load_user(user_id, version)
+                    db.session.close()
+                yield ': keepalive\n\n'
+                continue
+            yield f'event: reminder\ndata: {json.dumps(reminder)}\n\n'
+    finally:
+        reminder_scheduler.unsubscribe(user_id, events)
@@ -0,0 +1,72 @@
+import time
+
+from flask import Blueprint, current_app, g, has_request_context, request, session
+from flask_login import current_user
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+from shards import sharded_engine
+from sqlite_profile import READ_ONLY_METHODS
+
+# Bind key of the read replica in SQLALCHEMY_BINDS
+REPLICA_BIND = 'replica'
+
+replicas_bp = Blueprint('replicas', __name__)
+
+class RoutingSession(Session):
+    """Session that routes per-user data to shards and reads to the replica.
+    
+    Statements on per-user tables go to the current shard when sharding is
+    on (see shards.py); shards have no replicas. Other statements go to the
+    replica bind only inside a request that route_request() marked for it,
+    and only until the session writes anything: flushes and
+    INSERT/UPDATE/DELETE statements always go to the primary, and so does
+    every statement after them, so a request reads its own writes. CLI
+    commands and background jobs use the primary.
+    """
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            engine = sharded_engine(self._db, mapper, clause)
+            if engine is not None:
+                return engine
+        if bind is None and self._reads_from_replica(clause):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+    
+    def _reads_from_replica(self, clause):
+        if self._flushing or self.info.get('wrote'):
+            return False
+        if clause is not None and getattr(clause, 'is_dml', False):
+            return False
+        return has_request_context() and g.get('read_replica', False)
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _flushed(db_session, flush_context):
+    db_session.info['wrote'] = True
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _executed(orm_execute_state):
+    # Bulk insert()/update()/delete() statements do not flush
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info['wrote'] = True
+
+@replicas_bp.before_app_request
+def route_request():
+    # Users who wrote something recently read from the primary until the
+    # replica has had time to catch up (stored in the signed session cookie,
+    # so the pin holds across workers)
+    g.read_replica = (
+        REPLICA_BIND in current_app.config['SQLALCHEMY_BINDS']
+        and request.method in READ_ONLY_METHODS
+        and session.get('primary_until', 0) < time.time()
+    )
+
+@replicas_bp.after_app_request
+def pin_writers(response):
+    db_session = current_app.extensions['sqlalchemy'].session
+    if db_session.info.get('wrote') and current_user.is_authenticated:
+        session['primary_until'] = time.time() + current_app.config['READ_YOUR_WRITES_SECONDS']
+    return response
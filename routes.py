@@ -1,76 +1,42 @@
-from flask import render_template, redirect, url_for, flash, request, jsonify
-from flask_login import login_user, logout_user, login_required, current_user
-from urllib.parse import urlparse
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort, Response, stream_with_context
+from flask_login import login_required, current_user
 from datetime import datetime, date, time, timedelta
-import json
+import io
 
-from app import app, db
-from models import User, Task, Category, SubTask, Achievement
-from forms import LoginForm, RegistrationForm, TaskForm, CategoryForm
-from utils import calculate_achievements, get_task_progress_stats, get_task_completion_stats
+from sqlalchemy import tuple_
 
-@app.route('/')
-@app.route('/index')
-def index():
-    if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
-    return redirect(url_for('login'))
+from app import db
+from models import Task, Category, SubTask, ArchivedTask, Achievement, UserStats
+from forms import TaskForm, CategoryForm
+from utils import get_dashboard_stats
+from utils import get_user_stats, adjust_user_stats, touch_user_data, record_completion, remove_completion
+from utils import effective_streak, get_task_completion_stats, COMPLETION_PERIODS
+from utils import apply_task_filters, encode_task_cursor, decode_task_cursor, get_category_stats
+from utils import toggle_subtask_completion, sync_subtasks
+from achievement_rules import calculate_achievements
+from jobs import enqueue_job
+from batch import apply_task_batch, BATCH_MAX_OPERATIONS
+from conditional import conditional_on_user_data
+from search import search_tasks, SearchUnavailable, SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE
+from reminders import reminder_scheduler, reminder_stream
+from transfer import export_user_data, import_user_data, TransferError, TRANSFER_FORMATS, TRANSFER_MIMETYPES
 
-@app.route('/login.html', methods=['GET', 'POST'])
-def login():
-    if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
-    
-    form = LoginForm()
-    if form.validate_on_submit():
-        user = User.query.filter_by(email=form.email.data).first()
-        if user is None or not user.check_password(form.password.data):
-            flash('Invalid email or password', 'danger')
-            return redirect(url_for('login'))
-        
-        login_user(user)
-        next_page = request.args.get('next')
-        if not next_page or urlparse(next_page).netloc != '':
-            next_page = url_for('dashboard')
-        return redirect(next_page)
-    
-    return render_template('login.html', title='Sign In', form=form)
+main_bp = Blueprint('main', __name__)
 
-@app.route('/register.html', methods=['GET', 'POST'])
-def register():
-    if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
-    
-    form = RegistrationForm()
-    if form.validate_on_submit():
-        user = User(username=form.username.data, email=form.email.data)
-        user.set_password(form.password.data)
-        
-        db.session.add(user)
-        
-        # Create default categories for new user
-        default_categories = [
-            {"name": "Work", "is_default": True},
-            {"name": "Personal", "is_default": True}
-        ]
-        
-        for cat in default_categories:
-            category = Category(name=cat["name"], is_default=cat["is_default"], user=user)
-            db.session.add(category)
-        
-        db.session.commit()
-        flash('Congratulations, you are now a registered user!', 'success')
-        return redirect(url_for('login'))
-    
-    return render_template('register.html', title='Register', form=form)
+# Page size limits for the JSON task list
+FILTER_TASKS_PAGE_SIZE = 50
+FILTER_TASKS_MAX_PAGE_SIZE = 200
 
-@app.route('/logout')
-def logout():
-    logout_user()
-    return redirect(url_for('login'))
+@main_bp.route('/')
+@main_bp.route('/index')
+def index():
+    if current_user.is_authenticated:
+        return redirect(url_for('main.dashboard'))
+    return redirect(url_for('auth.login'))
 
-@app.route('/dashboard.html')
+@main_bp.route('/dashboard.html')
 @login_required
+@conditional_on_user_data
 def dashboard():
     # Get active tasks (non-completed)
     active_tasks = Task.query.filter_by(
@@ -91,23 +57,10 @@ def dashboard():
     # Get categories for filtering
     categories = Category.query.filter_by(user_id=current_user.id).all()
     
-    # Get progress stats
-    progress_stats = get_task_progress_stats(current_user.id)
-    
-    # Get completion stats
-    completion_stats = get_task_completion_stats(current_user.id)
-    
-    # Prepare tasks data for notifications
-    tasks_data = []
-    for task in today_tasks + upcoming_tasks + overdue_tasks:
-        task_data = {
-            'id': task.id,
-            'title': task.title,
-            'due_date': task.due_date.isoformat(),
-            'due_time': task.due_time.strftime('%H:%M'),
-            'completed': task.is_completed
-        }
-        tasks_data.append(task_data)
+    # Get progress and completion stats (cached per user)
+    stats = get_dashboard_stats(current_user.id)
+    progress_stats = stats['progress']
+    completion_stats = stats['completion']
     
     return render_template(
         'dashboard.html', 
@@ -117,11 +70,22 @@ def dashboard():
         overdue_tasks=overdue_tasks,
         categories=categories,
         progress_stats=progress_stats,
-        completion_stats=completion_stats,
-        tasks_data=json.dumps(tasks_data)
+        completion_stats=completion_stats
+    )
+
+@main_bp.route('/reminders/stream')
+@login_required
+def reminders_stream():
+    """Push due-date reminders to the browser as Server-Sent Events."""
+    response = Response(
+        stream_with_context(reminder_stream(current_user.id)),
+        mimetype='text/event-stream'
     )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
-@app.route('/task/new', methods=['GET', 'POST'])
+@main_bp.route('/task/new', methods=['GET', 'POST'])
 @login_required
 def new_task():
     form = TaskForm()
@@ -144,32 +108,27 @@ def new_task():
             user_id=current_user.id
         )
         db.session.add(task)
-        db.session.commit()
         
         # Add subtasks if there are any
-        if form.subtasks.data:
-            for subtask_form in form.subtasks:
-                # Check if the title is not empty
-                if subtask_form.title.data and subtask_form.title.data.strip():
-                    subtask = SubTask(
-                        title=subtask_form.title.data,
-                        is_completed=subtask_form.is_completed.data,
-                        task_id=task.id
-                    )
-                    db.session.add(subtask)
-            
-            db.session.commit()
-            
-            # Update task progress based on subtasks
+        for subtask_form in form.subtasks:
+            # Check if the title is not empty
+            if subtask_form.title.data and subtask_form.title.data.strip():
+                task.add_subtask(subtask_form.title.data, subtask_form.is_completed.data)
+        
+        # Update task progress based on subtasks
+        if task.subtask_total:
             task.update_progress_from_subtasks()
-            db.session.commit()
         
+        adjust_user_stats(current_user.id, tasks_count=1)
+        db.session.commit()
+        
+        reminder_scheduler.task_changed(task)
         flash('Task created successfully!', 'success')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     return render_template('task_form.html', title='New Task', form=form, task=None)
 
-@app.route('/task/<int:task_id>/edit', methods=['GET', 'POST'])
+@main_bp.route('/task/<int:task_id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit_task(task_id):
     task = Task.query.filter_by(id=task_id, user_id=current_user.id).first_or_404()
@@ -185,15 +144,18 @@ def edit_task(task_id):
         # Clear any existing entries
         while len(form.subtasks) > 0:
             form.subtasks.pop_entry()
-            
+        
         # Add the task's subtasks
-        for subtask in task.subtasks:
+        for subtask in task.subtasks.order_by(SubTask.id):
             form.subtasks.append_entry({
+                'subtask_id': subtask.id,
                 'title': subtask.title,
                 'is_completed': subtask.is_completed
             })
     
     if form.validate_on_submit():
+        was_high_priority = task.priority == 3
+        
         task.title = form.title.data
         task.description = form.description.data
         task.due_date = form.due_date.data
@@ -203,52 +165,70 @@ def edit_task(task_id):
         task.is_recurring = form.is_recurring.data
         task.track_progress = form.track_progress.data
         
-        # Delete existing subtasks
-        SubTask.query.filter_by(task_id=task.id).delete()
+        # Keep the high-priority completion counter in step with priority changes
+        high_priority_delta = 0
+        if task.is_completed and was_high_priority != (task.priority == 3):
+            high_priority_delta = 1 if task.priority == 3 else -1
+        adjust_user_stats(current_user.id, high_priority_completed=high_priority_delta)
+        
+        # Reconcile the submitted subtasks with the stored ones
+        entries = []
+        for subtask_form in form.subtasks:
+            # Check if the title is not empty
+            if subtask_form.title.data and subtask_form.title.data.strip():
+                entries.append((
+                    subtask_form.subtask_id.data,
+                    subtask_form.title.data,
+                    subtask_form.is_completed.data
+                ))
+        sync_subtasks(task, entries)
         
-        # Add new subtasks if there are any
-        if form.subtasks.data:
-            for subtask_form in form.subtasks:
-                # Check if the title is not empty
-                if subtask_form.title.data and subtask_form.title.data.strip():
-                    subtask = SubTask(
-                        title=subtask_form.title.data,
-                        is_completed=subtask_form.is_completed.data,
-                        task_id=task.id
-                    )
-                    db.session.add(subtask)
-            
-            db.session.commit()
-            
+        if task.subtask_total:
             # Update task progress based on subtasks
             task.update_progress_from_subtasks()
-            db.session.commit()
         else:
             # If no subtasks, set progress based on completion status
             if task.is_completed:
                 task.progress = 100
             else:
                 task.progress = 0
-            db.session.commit()
+        db.session.commit()
         
+        reminder_scheduler.task_changed(task)
         flash('Task updated successfully!', 'success')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     return render_template('task_form.html', title='Edit Task', form=form, task=task)
 
-@app.route('/task/<int:task_id>/delete', methods=['POST'])
+@main_bp.route('/task/<int:task_id>/delete', methods=['POST'])
 @login_required
 def delete_task(task_id):
     task = Task.query.filter_by(id=task_id, user_id=current_user.id).first_or_404()
+    is_completed, priority, completed_at = task.is_completed, task.priority, task.completed_at
     db.session.delete(task)
+    
+    adjust_user_stats(
+        current_user.id,
+        tasks_count=-1,
+        completed_count=-1 if is_completed else 0,
+        high_priority_completed=-1 if is_completed and priority == 3 else 0
+    )
+    if is_completed and completed_at:
+        remove_completion(current_user.id, completed_at)
     db.session.commit()
+    reminder_scheduler.task_removed(current_user.id, task_id)
     flash('Task deleted successfully!', 'success')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
-@app.route('/task/<int:task_id>/complete', methods=['POST'])
+@main_bp.route('/task/<int:task_id>/complete', methods=['POST'])
 @login_required
 def complete_task(task_id):
     task = Task.query.filter_by(id=task_id, user_id=current_user.id).first_or_404()
+    if task.is_completed:
+        # Completing again would move completed_at off the day the rollup
+        # counted and copy a recurring task once more
+        flash('Task is already completed.', 'info')
+        return redirect(url_for('main.dashboard'))
     
     # If the task is recurring, create a new task for tomorrow
     if task.is_recurring:
@@ -266,13 +246,9 @@ def complete_task(task_id):
         db.session.add(new_task)
         
         # Copy subtasks
-        for subtask in task.subtasks:
-            new_subtask = SubTask(
-                title=subtask.title,
-                is_completed=False,
-                task_id=new_task.id
-            )
-            db.session.add(new_subtask)
+        if task.subtask_total:
+            for subtask in task.subtasks:
+                new_task.add_subtask(subtask.title)
     
     # Mark the task as completed
     task.is_completed = True
@@ -281,21 +257,36 @@ def complete_task(task_id):
     task.completed_at = datetime.utcnow()
     
     # Mark all subtasks as completed
-    for subtask in task.subtasks:
-        subtask.is_completed = True
+    if task.subtask_done != task.subtask_total:
+        SubTask.query.filter_by(task_id=task.id).update(
+            {'is_completed': True}, synchronize_session=False
+        )
+        task.subtask_done = task.subtask_total
+    
+    # Update the user's counters and completion history
+    adjust_user_stats(
+        current_user.id,
+        tasks_count=1 if task.is_recurring else 0,
+        completed_count=1,
+        high_priority_completed=1 if task.priority == 3 else 0
+    )
+    record_completion(current_user.id, task.completed_at)
+    # Check for achievements in the background; new ones are flashed on a
+    # later page view
+    enqueue_job(
+        'evaluate_achievements', current_user.id,
+        key=f'task-completed:{task.id}:{task.completed_at.isoformat()}'
+    )
     
     db.session.commit()
-    
-    # Check for achievements
-    new_achievements = calculate_achievements(current_user.id)
-    if new_achievements:
-        achievement_names = [a.name for a in new_achievements]
-        flash(f'Congratulations! You earned new achievements: {", ".join(achievement_names)}', 'success')
+    reminder_scheduler.task_removed(current_user.id, task.id)
+    if task.is_recurring:
+        reminder_scheduler.task_changed(new_task)
     
     flash('Task completed successfully!', 'success')
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('main.dashboard'))
 
-@app.route('/task/<int:task_id>/progress', methods=['POST'])
+@main_bp.route('/task/<int:task_id>/progress', methods=['POST'])
 @login_required
 def update_task_progress(task_id):
     task = Task.query.filter_by(id=task_id, user_id=current_user.id).first_or_404()
@@ -311,29 +302,108 @@ def update_task_progress(task_id):
     else:
         task.status = 2  # Completed
     
+    touch_user_data(current_user.id)
     db.session.commit()
     return jsonify({'success': True})
 
-@app.route('/task/<int:task_id>/subtask/<int:subtask_id>/toggle', methods=['POST'])
+@main_bp.route('/tasks/batch', methods=['POST'])
 @login_required
-def toggle_subtask(task_id, subtask_id):
-    task = Task.query.filter_by(id=task_id, user_id=current_user.id).first_or_404()
-    subtask = SubTask.query.filter_by(id=subtask_id, task_id=task.id).first_or_404()
+def batch_tasks():
+    """Apply a batch of create/complete/delete/progress operations.
+    
+    Expects {"operations": [...]} and returns one result per operation.
+    Valid operations are applied in a single transaction; achievements are
+    evaluated once afterwards.
+    """
+    operations = (request.json or {}).get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations must be a non-empty list'}), 400
+    if len(operations) > BATCH_MAX_OPERATIONS:
+        return jsonify({'error': f'At most {BATCH_MAX_OPERATIONS} operations per batch'}), 400
+    
+    results = apply_task_batch(current_user.id, operations)
+    db.session.commit()
+    
+    # Check for achievements once for the whole batch
+    new_achievements = []
+    if any(result['ok'] and op.get('op') == 'complete' for result, op in zip(results, operations)):
+        new_achievements = calculate_achievements(current_user.id)
+        db.session.commit()
     
-    # Toggle subtask completion
-    subtask.is_completed = not subtask.is_completed
+    return jsonify({
+        'results': results,
+        'achievements': [a['name'] for a in new_achievements]
+    })
+
+@main_bp.route('/tasks/export')
+@login_required
+def export_tasks():
+    """Download the user's categories, tasks and subtasks as NDJSON or CSV."""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in TRANSFER_FORMATS:
+        return jsonify({'error': f'format must be one of {", ".join(TRANSFER_FORMATS)}'}), 400
+    
+    response = Response(
+        stream_with_context(export_user_data(current_user.id, fmt)),
+        mimetype=TRANSFER_MIMETYPES[fmt]
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename=taskito-export.{fmt}'
+    return response
+
+@main_bp.route('/tasks/import', methods=['POST'])
+@login_required
+def import_tasks():
+    """Import an NDJSON or CSV export uploaded as the "file" form field.
+    
+    The format comes from the format argument or the file extension. The
+    import is applied in one transaction and nothing is written on error.
+    """
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'error': 'file is required'}), 400
+    fmt = request.args.get('format') or upload.filename.rsplit('.', 1)[-1].lower()
+    if fmt not in TRANSFER_FORMATS:
+        return jsonify({'error': f'format must be one of {", ".join(TRANSFER_FORMATS)}'}), 400
+    
+    try:
+        counts = import_user_data(
+            current_user.id, io.TextIOWrapper(upload.stream, encoding='utf-8', newline=''), fmt
+        )
+    except (TransferError, UnicodeDecodeError) as error:
+        db.session.rollback()
+        return jsonify({'error': str(error)}), 400
     db.session.commit()
+    return jsonify(counts)
+
+@main_bp.route('/task/<int:task_id>/subtask/<int:subtask_id>/toggle', methods=['POST'])
+@login_required
+def toggle_subtask(task_id, subtask_id):
+    result = toggle_subtask_completion(current_user.id, task_id, subtask_id)
+    if result is None:
+        abort(404)
     
-    # Update task progress
-    task.update_progress_from_subtasks()
+    subtask_completed, task_progress = result
+    touch_user_data(current_user.id)
     db.session.commit()
     
     return jsonify({
-        'subtask_completed': subtask.is_completed,
-        'task_progress': task.progress
+        'subtask_completed': subtask_completed,
+        'task_progress': task_progress
     })
 
-@app.route('/category/new', methods=['GET', 'POST'])
+@main_bp.route('/stats/completion')
+@login_required
+@conditional_on_user_data
+def completion_stats():
+    days = request.args.get('days', 7, type=int)
+    period = request.args.get('period', 'day')
+    
+    if days not in (7, 30, 90, 365) or period not in COMPLETION_PERIODS:
+        return jsonify({'error': 'Invalid days or period'}), 400
+    
+    return jsonify(get_task_completion_stats(current_user.id, days=days, period=period))
+
+@main_bp.route('/category/new', methods=['GET', 'POST'])
 @login_required
 def new_category():
     form = CategoryForm()
@@ -345,34 +415,28 @@ def new_category():
             is_default=False
         )
         db.session.add(category)
+        adjust_user_stats(current_user.id, categories_count=1)
         db.session.commit()
         flash('Category created successfully!', 'success')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('main.dashboard'))
     
     return render_template('category_form.html', title='New Category', form=form)
 
-@app.route('/achievements.html')
+@main_bp.route('/achievements.html')
 @login_required
+@conditional_on_user_data
 def achievements():
     user_achievements = Achievement.query.filter_by(user_id=current_user.id).order_by(
         Achievement.trophy_level.desc(), Achievement.earned_at.desc()
     ).all()
     
     # Get stats for achievements page
-    completed_tasks_count = Task.query.filter_by(
-        user_id=current_user.id, 
-        is_completed=True
-    ).count()
+    stats = get_user_stats(current_user.id, commit=True)
+    completed_tasks_count = stats.completed_count
+    high_priority_completed = stats.high_priority_completed
     
-    high_priority_completed = Task.query.filter_by(
-        user_id=current_user.id, 
-        is_completed=True,
-        priority=3
-    ).count()
-    
-    # Calculate streak (consecutive days with completed tasks)
-    streak = 0
-    # Implementation of streak calculation would go here
+    # Current streak (consecutive days with completed tasks)
+    streak = effective_streak(stats)
     
     return render_template(
         'achievements.html', 
@@ -384,8 +448,9 @@ def achievements():
         Achievement=Achievement
     )
 
-@app.route('/progress.html')
+@main_bp.route('/progress.html')
 @login_required
+@conditional_on_user_data
 def progress():
     # Get tracking tasks
     tracking_tasks = Task.query.filter_by(
@@ -394,39 +459,19 @@ def progress():
         is_completed=False
     ).all()
     
-    # Get recently completed tasks
+    # Get recently completed tasks, topped up from the archive when the
+    # live table has fewer than five
     completed_tasks = Task.query.filter_by(
         user_id=current_user.id,
         is_completed=True
     ).order_by(Task.completed_at.desc()).limit(5).all()
+    if len(completed_tasks) < 5:
+        completed_tasks += ArchivedTask.query.filter_by(
+            user_id=current_user.id
+        ).order_by(ArchivedTask.completed_at.desc()).limit(5 - len(completed_tasks)).all()
     
     # Get progress stats by category
-    categories = Category.query.filter_by(user_id=current_user.id).all()
-    category_stats = []
-    
-    for category in categories:
-        total_tasks = Task.query.filter_by(
-            user_id=current_user.id,
-            category_id=category.id
-        ).count()
-        
-        completed_count = Task.query.filter_by(
-            user_id=current_user.id,
-            category_id=category.id,
-            is_completed=True
-        ).count()
-        
-        if total_tasks > 0:
-            completion_rate = (completed_count / total_tasks) * 100
-        else:
-            completion_rate = 0
-            
-        category_stats.append({
-            'name': category.name,
-            'total': total_tasks,
-            'completed': completed_count,
-            'completion_rate': completion_rate
-        })
+    category_stats = get_category_stats(current_user.id)
     
     return render_template(
         'progress.html',
@@ -436,17 +481,15 @@ def progress():
         category_stats=category_stats
     )
 
-@app.route('/profile.html')
+@main_bp.route('/profile.html')
 @login_required
+@conditional_on_user_data
 def profile():
-    tasks_count = Task.query.filter_by(user_id=current_user.id).count()
-    completed_count = Task.query.filter_by(
-        user_id=current_user.id, 
-        is_completed=True
-    ).count()
-    
-    achievements_count = Achievement.query.filter_by(user_id=current_user.id).count()
-    categories_count = Category.query.filter_by(user_id=current_user.id).count()
+    stats = get_user_stats(current_user.id, commit=True)
+    tasks_count = stats.tasks_count
+    completed_count = stats.completed_count
+    achievements_count = stats.achievements_count
+    categories_count = stats.categories_count
     
     # Get recent achievements for display
     recent_achievements = Achievement.query.filter_by(user_id=current_user.id).order_by(Achievement.earned_at.desc()).limit(3).all()
@@ -462,47 +505,123 @@ def profile():
         recent_achievements=recent_achievements
     )
 
-@app.route('/filter_tasks', methods=['POST'])
+@main_bp.route('/filter_tasks', methods=['GET', 'POST'])
 @login_required
+@conditional_on_user_data
 def filter_tasks():
-    # Get filter parameters
-    category_id = request.json.get('category_id')
-    priority = request.json.get('priority')
-    status = request.json.get('status')
+    """Return one page of the user's active tasks, ordered by due date.
     
-    # Base query
-    query = Task.query.filter_by(user_id=current_user.id, is_completed=False)
+    Pages are keyset-paginated on (due_date, due_time, id): pass the
+    X-Next-Cursor header of one response as "cursor" to get the next page.
+    Parameters come as JSON for POST or as query arguments for GET; GETs
+    support conditional requests.
+    """
+    if request.method == 'GET':
+        params = request.args
+    else:
+        params = request.json or {}
+    
+    try:
+        limit = int(params.get('limit') or FILTER_TASKS_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid limit'}), 400
+    limit = max(1, min(limit, FILTER_TASKS_MAX_PAGE_SIZE))
+    
+    # Project only the columns the JSON needs, with the category name joined in
+    query = db.session.query(
+        Task.id,
+        Task.title,
+        Task.due_date,
+        Task.due_time,
+        Task.priority,
+        Task.progress,
+        Task.category_id,
+        Category.name.label('category_name')
+    ).join(
+        Category, Task.category_id == Category.id
+    ).filter(
+        Task.user_id == current_user.id,
+        Task.is_completed == False
+    )
     
     # Apply filters
-    if category_id and category_id != 'all':
-        query = query.filter_by(category_id=int(category_id))
-    
-    if priority and priority != 'all':
-        query = query.filter_by(priority=int(priority))
+    try:
+        query = apply_task_filters(query, params)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid category_id or priority'}), 400
+    
+    # Continue after the last task of the previous page
+    if params.get('cursor'):
+        try:
+            cursor = decode_task_cursor(params['cursor'])
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        query = query.filter(tuple_(Task.due_date, Task.due_time, Task.id) > cursor)
+    
+    # Fetch one extra row to know whether there is a next page
+    rows = query.order_by(Task.due_date, Task.due_time, Task.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
     
-    if status and status != 'all':
-        if status == 'upcoming':
-            query = query.filter(Task.due_date > date.today())
-        elif status == 'today':
-            query = query.filter(Task.due_date == date.today())
-        elif status == 'overdue':
-            query = query.filter(Task.due_date < date.today())
+    # Convert tasks to JSON
+    tasks_json = []
+    for row in rows:
+        tasks_json.append({
+            'id': row.id,
+            'title': row.title,
+            'due_date': row.due_date.strftime('%Y-%m-%d'),
+            'due_time': row.due_time.strftime('%H:%M'),
+            'priority': row.priority,
+            'progress': row.progress,
+            'category_id': row.category_id,
+            'category_name': row.category_name
+        })
     
-    # Get filtered tasks
-    tasks = query.order_by(Task.due_date, Task.due_time).all()
+    response = jsonify(tasks_json)
+    if has_more:
+        last = rows[-1]
+        response.headers['X-Next-Cursor'] = encode_task_cursor(last.due_date, last.due_time, last.id)
+    return response
+
+@main_bp.route('/search_tasks')
+@login_required
+@conditional_on_user_data
+def search_tasks_view():
+    """Full-text search over the user's task titles and descriptions.
+    
+    Takes q plus the filter_tasks filters as query arguments and returns
+    one page of matches, best first. X-Next-Page is set when there are more.
+    """
+    page = max(1, request.args.get('page', 1, type=int))
+    limit = request.args.get('limit', SEARCH_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, SEARCH_MAX_PAGE_SIZE))
+    
+    try:
+        rows, has_more = search_tasks(
+            current_user.id, request.args.get('q'), request.args, page=page, per_page=limit
+        )
+    except SearchUnavailable as error:
+        return jsonify({'error': str(error)}), 501
+    except ValueError:
+        return jsonify({'error': 'Invalid category_id or priority'}), 400
     
-    # Convert tasks to JSON
     tasks_json = []
-    for task in tasks:
+    for row in rows:
         tasks_json.append({
-            'id': task.id,
-            'title': task.title,
-            'due_date': task.due_date.strftime('%Y-%m-%d'),
-            'due_time': task.due_time.strftime('%H:%M'),
-            'priority': task.priority,
-            'progress': task.progress,
-            'category_id': task.category_id,
-            'category_name': task.category.name
+            'id': row.id,
+            'title': row.title,
+            'description': row.description,
+            'due_date': row.due_date.strftime('%Y-%m-%d'),
+            'due_time': row.due_time.strftime('%H:%M'),
+            'priority': row.priority,
+            'progress': row.progress,
+            'completed': row.is_completed,
+            'category_id': row.category_id,
+            'category_name': row.category_name,
+            'archived': row.archived
         })
     
-    return jsonify(tasks_json)
+    response = jsonify(tasks_json)
+    if has_more:
+        response.headers['X-Next-Page'] = str(page + 1)
+    return response
@@ -0,0 +1,112 @@
+import re
+
+from sqlalchemy import and_, column, func, literal, literal_column, select, table, union_all
+
+from app import db
+from models import Task, ArchivedTask, Category
+from utils import apply_task_filters
+
+# Text indexes over task titles and descriptions, created by the search
+# index migrations for both the task and the archived_task table: FTS5
+# tables (task_fts, archived_task_fts) kept in sync by triggers on SQLite,
+# generated tsvector columns (search_vector) with GIN indexes on PostgreSQL.
+
+# Title matches weigh more than description matches when ranking
+SQLITE_TITLE_WEIGHT = 10.0
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+
+class SearchUnavailable(Exception):
+    """The database has no text index search_tasks can use."""
+
+def _fts5_query(terms):
+    # Quote every term so user input cannot use FTS5 query syntax; the last
+    # term also matches as a prefix for search-as-you-type
+    quoted = ['"' + term.replace('"', '""') + '"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+def _matches(model, dialect, terms):
+    """Select the ids and ranks of the task or archived_task rows matching terms."""
+    if dialect == 'sqlite':
+        index = f'{model.__tablename__}_fts'
+        fts_table = table(index, column('rowid'))
+        fts = literal_column(index)
+        rank = func.bm25(fts, SQLITE_TITLE_WEIGHT, 1.0).label('rank')
+        return select(model.id, rank).select_from(model).join(
+            fts_table, fts_table.c.rowid == model.id
+        ).where(fts.op('MATCH')(_fts5_query(terms)))
+    
+    ts_query = func.websearch_to_tsquery('english', ' '.join(terms))
+    vector = literal_column(f'{model.__tablename__}.search_vector')
+    rank = func.ts_rank(vector, ts_query).label('rank')
+    return select(model.id, rank).where(vector.op('@@')(ts_query))
+
+def search_tasks(user_id, q, filters, page=1, per_page=SEARCH_PAGE_SIZE):
+    """Search a user's tasks by title and description, best matches first.
+    
+    filters takes the same category_id/priority/status options as
+    filter_tasks. status also accepts 'active' and 'completed'; without a
+    status, completed tasks are searched too, archived ones included.
+    Returns (rows, has_more); archived rows have archived set and the id the
+    task had before it was archived. Raises SearchUnavailable on databases
+    other than SQLite and PostgreSQL.
+    """
+    terms = re.findall(r'\w+', q or '')
+    if not terms:
+        return [], False
+    
+    dialect = db.session.get_bind(mapper=Task.__mapper__).dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        raise SearchUnavailable(f'Text search is not available on {dialect}')
+    
+    status = filters.get('status')
+    live = _matches(Task, dialect, terms).where(Task.user_id == user_id)
+    if status == 'completed':
+        live = live.where(Task.is_completed == True)
+    elif status and status != 'all':
+        live = live.where(Task.is_completed == False)
+    matches = [apply_task_filters(live.add_columns(literal(False).label('archived')), filters)]
+    # Archived tasks are all completed
+    if not status or status in ('all', 'completed'):
+        archived = _matches(ArchivedTask, dialect, terms).where(ArchivedTask.user_id == user_id)
+        matches.append(apply_task_filters(
+            archived.add_columns(literal(True).label('archived')), filters, ArchivedTask
+        ))
+    
+    ranked = union_all(*matches).subquery('ranked')
+    order = ranked.c.rank.asc() if dialect == 'sqlite' else ranked.c.rank.desc()
+    page_rows = select(ranked).order_by(order, ranked.c.archived, ranked.c.id).limit(
+        per_page + 1
+    ).offset((page - 1) * per_page).subquery('page')
+    
+    # Project the page's rows with the category name joined in
+    projections = []
+    for model, task_id, is_archived in ((Task, Task.id, False), (ArchivedTask, ArchivedTask.task_id, True)):
+        projections.append(select(
+            task_id.label('id'),
+            model.title,
+            model.description,
+            model.due_date,
+            model.due_time,
+            model.priority,
+            model.progress,
+            model.is_completed,
+            model.category_id,
+            Category.name.label('category_name'),
+            page_rows.c.archived,
+            page_rows.c.rank,
+            model.id.label('row_id')
+        ).join(
+            page_rows, and_(page_rows.c.id == model.id, page_rows.c.archived == is_archived)
+        ).join(
+            Category, model.category_id == Category.id
+        ))
+    projected = union_all(*projections).subquery('projected')
+    order = projected.c.rank.asc() if dialect == 'sqlite' else projected.c.rank.desc()
+    rows = db.session.execute(
+        select(projected).order_by(order, projected.c.archived, projected.c.row_id)
+    ).all()
+    
+    return rows[:per_page], len(rows) > per_page
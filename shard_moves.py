@@ -0,0 +1,225 @@
+import time
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import delete, insert, select, update
+
+from app import db
+from models import (
+    User, UserShard, Category, Task, SubTask, ArchivedTask, ArchivedSubTask,
+    Achievement, UserStats, DailyCompletion, Job,
+)
+from shards import add_user_stub, hash_ring, lookup_shard, shard_engine
+
+# Per-user tables, parents first; together they are shards.SHARDED_TABLES.
+# 'rows' selects a user's rows, 'parents' maps foreign key columns to the
+# table whose ids they hold: ids are per database, so moved rows get new
+# ids on the target and their children are renumbered to match.
+MOVED_TABLES = [
+    {'model': Category, 'rows': lambda user_id: Category.user_id == user_id},
+    {
+        'model': Task,
+        'rows': lambda user_id: Task.user_id == user_id,
+        'parents': {'category_id': 'category'},
+    },
+    {
+        'model': SubTask,
+        'rows': lambda user_id: SubTask.task_id.in_(select(Task.id).where(Task.user_id == user_id)),
+        'parents': {'task_id': 'task'},
+    },
+    {
+        'model': ArchivedTask,
+        'rows': lambda user_id: ArchivedTask.user_id == user_id,
+        'parents': {'category_id': 'category'},
+    },
+    {
+        'model': ArchivedSubTask,
+        'rows': lambda user_id: ArchivedSubTask.archived_task_id.in_(
+            select(ArchivedTask.id).where(ArchivedTask.user_id == user_id)
+        ),
+        'parents': {'archived_task_id': 'archived_task'},
+    },
+    {'model': Achievement, 'rows': lambda user_id: Achievement.user_id == user_id},
+    {'model': UserStats, 'rows': lambda user_id: UserStats.user_id == user_id},
+    {'model': DailyCompletion, 'rows': lambda user_id: DailyCompletion.user_id == user_id},
+    {'model': Job, 'rows': lambda user_id: Job.user_id == user_id},
+]
+
+class ShardMoveError(Exception):
+    """A user could not be moved; their data stays where it was."""
+
+def _copy_rows(source, target, user_id):
+    """Copy a user's rows between two shard connections.
+    
+    Returns a dict of table name -> rows copied.
+    """
+    new_ids = {}
+    counts = {}
+    for entry in MOVED_TABLES:
+        table = entry['model'].__table__
+        query = select(table).where(entry['rows'](user_id))
+        if 'id' in table.c:
+            query = query.order_by(table.c.id)
+        rows = [dict(row._mapping) for row in source.execute(query)]
+        counts[table.name] = len(rows)
+        if not rows:
+            new_ids[table.name] = {}
+            continue
+        
+        for column, parent in entry.get('parents', {}).items():
+            for row in rows:
+                row[column] = new_ids[parent][row[column]]
+        if 'id' in table.c:
+            old_ids = [row.pop('id') for row in rows]
+            inserted = target.execute(
+                insert(table).returning(table.c.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+            new_ids[table.name] = dict(zip(old_ids, inserted))
+        else:
+            target.execute(insert(table), rows)
+    return counts
+
+def _delete_rows(connection, user_id, stub):
+    """Delete a user's rows from a shard, and their stub user row if stub."""
+    for entry in reversed(MOVED_TABLES):
+        connection.execute(delete(entry['model'].__table__).where(entry['rows'](user_id)))
+    if stub:
+        connection.execute(delete(User.__table__).where(User.id == user_id))
+
+def _lock_source(connection, user_id):
+    """Take the locks that keep a user's source rows still until the move commits.
+    
+    Bumping the data version is a write: on SQLite it takes the database's
+    write lock, on PostgreSQL it locks the counters row every write route
+    updates. The job rows, which change without a version bump, are locked
+    as well (a no-op on SQLite, where the write lock covers them).
+    """
+    connection.execute(
+        update(UserStats.__table__).where(UserStats.user_id == user_id).values(
+            data_version=UserStats.data_version + 1
+        )
+    )
+    connection.execute(select(Job.id).where(Job.user_id == user_id).with_for_update())
+
+def _set_directory(user_id, shard, moving=False, connection=None):
+    """Point a user's directory entry at shard (None: remove the entry).
+    
+    With a connection to the primary, the entry (which must exist) is
+    changed in that connection's transaction and the caller commits.
+    """
+    if connection is not None:
+        table = UserShard.__table__
+        if shard is None:
+            connection.execute(delete(table).where(table.c.user_id == user_id))
+        else:
+            connection.execute(
+                update(table).where(table.c.user_id == user_id).values(shard=shard, moving=moving)
+            )
+        return
+    entry = db.session.get(UserShard, user_id)
+    if shard is None:
+        if entry is not None:
+            db.session.delete(entry)
+    elif entry is None:
+        db.session.add(UserShard(user_id=user_id, shard=shard, moving=moving))
+    else:
+        entry.shard, entry.moving = shard, moving
+    db.session.commit()
+
+def _pins(user_id, shard):
+    # Under the hash strategy a directory entry is only kept while it
+    # differs from where the ring would put the user anyway
+    config = current_app.config
+    return config['SHARD_STRATEGY'] != 'hash' or hash_ring(config).shard_for(user_id) != shard
+
+def move_user(user_id, target, drain_seconds=None):
+    """Move a user's rows to the shard called target while the site runs.
+    
+    The user's directory entry is marked as moving first: from their next
+    request on, writes are refused with 503, reads are still served from
+    the source shard, and job workers leave their jobs alone. After
+    drain_seconds (for writes already under way to finish) one source
+    transaction locks the user's rows against any write that still comes
+    in, copies them to the target under new ids, points the directory at
+    the target, which serves the user from their next request, and deletes
+    them from the source. A write that waited on the lock finds the rows
+    gone instead of being lost. Links to a moved user's tasks change with
+    the ids. Returns a dict of table name -> rows moved.
+    """
+    config = current_app.config
+    if drain_seconds is None:
+        drain_seconds = config['SHARD_MOVE_DRAIN_SECONDS']
+    if target not in config['SHARDS']:
+        raise ShardMoveError(f'unknown shard {target!r}')
+    user = db.session.execute(
+        select(User.id, User.username, User.email, User.joined_at).where(User.id == user_id)
+    ).first()
+    if user is None:
+        raise ShardMoveError(f'user {user_id} does not exist')
+    source, moving = lookup_shard(user_id)
+    if moving:
+        raise ShardMoveError(f'user {user_id} is already being moved')
+    if source == target:
+        raise ShardMoveError(f'user {user_id} is already on {target}')
+    
+    source_engine = shard_engine(db, source)
+    target_engine = shard_engine(db, target)
+    pinned = db.session.get(UserShard, user_id) is not None
+    final_shard = target if _pins(user_id, target) else None
+    _set_directory(user_id, source, moving=True)
+    db.session.close()
+    try:
+        time.sleep(drain_seconds)
+        with source_engine.begin() as source_connection:
+            _lock_source(source_connection, user_id)
+            with target_engine.begin() as target_connection:
+                add_user_stub(target_connection, user._mapping)
+                counts = _copy_rows(source_connection, target_connection, user_id)
+                # Cached pages and ETags refer to the old ids
+                target_connection.execute(
+                    update(UserStats.__table__).where(UserStats.user_id == user_id).values(
+                        data_version=UserStats.data_version + 1, data_updated_at=datetime.utcnow()
+                    )
+                )
+            # The directory lives in the primary: when that is the source,
+            # switch it in the locked transaction, which is the only one
+            # SQLite lets write
+            if source_engine is db.engine:
+                _set_directory(user_id, final_shard, connection=source_connection)
+            else:
+                _set_directory(user_id, final_shard)
+            _delete_rows(source_connection, user_id, stub=source_engine is not db.engine)
+    except BaseException:
+        # While the directory still says moving, the source is untouched and
+        # serving the user; drop the copy in case it was committed
+        if lookup_shard(user_id)[1]:
+            with target_engine.begin() as target_connection:
+                _delete_rows(target_connection, user_id, stub=target_engine is not db.engine)
+            _set_directory(user_id, source if pinned else None)
+        raise
+    return counts
+
+def rebalance_plan(names=None):
+    """Yield (user_id, source, target) for users not where the ring puts them.
+    
+    The ring is the hash ring over names (default: SHARD_RING). Meant for
+    the hash strategy: when a shard joins, run the moves with the new ring
+    before deploying it as SHARD_RING.
+    """
+    ring = hash_ring(current_app.config, names)
+    for (user_id,) in db.session.execute(select(User.id).order_by(User.id)).all():
+        source, _ = lookup_shard(user_id)
+        target = ring.shard_for(user_id)
+        if source != target:
+            yield user_id, source, target
+
+def drop_redundant_pins():
+    """Remove directory entries that match the hash ring; returns how many."""
+    ring = hash_ring(current_app.config)
+    dropped = 0
+    for entry in UserShard.query.filter(UserShard.moving == False).all():
+        if ring.shard_for(entry.user_id) == entry.shard:
+            db.session.delete(entry)
+            dropped += 1
+    db.session.commit()
+    return dropped
@@ -0,0 +1,294 @@
+import bisect
+import hashlib
+from contextlib import contextmanager
+from functools import lru_cache
+
+from flask import Blueprint, current_app, g, request
+from flask_login import current_user
+from sqlalchemy import func, inspect, insert, select
+from sqlalchemy.sql.util import find_tables
+
+from sqlite_profile import READ_ONLY_METHODS
+
+# Sharding of per-user data.
+#
+# With DATABASE_SHARDS set, the tables below live in one of several shard
+# databases, chosen per user; users and the shard directory stay in the
+# primary database. Every shard carries the full schema (`flask
+# upgrade-shards`) plus a stub row in its user table for each user living
+# there, so foreign keys hold on PostgreSQL too. A user's shard is their
+# entry in the user_shard directory if they have one, otherwise the owner of
+# their id on a consistent-hash ring over SHARD_RING. Requests route to the
+# logged-in user's shard; CLI commands pick one with shard_scope().
+#
+# The primary database can itself be listed as a shard (same URL as
+# DATABASE_URL), which is how an unsharded deployment starts moving users
+# out with `flask move-user`.
+SHARDED_TABLES = frozenset((
+    'category',
+    'task',
+    'sub_task',
+    'archived_task',
+    'archived_sub_task',
+    'achievement',
+    'user_stats',
+    'daily_completion',
+    'job',
+))
+
+# Points per shard on the hash ring; more points spread users more evenly
+HASH_RING_POINTS = 128
+
+shards_bp = Blueprint('shards', __name__)
+
+class ShardNotSelected(RuntimeError):
+    """Per-user tables were queried with no shard chosen for the query."""
+
+def parse_shards(value):
+    """Parse DATABASE_SHARDS ("name=url,name=url") into a dict of name -> url."""
+    shards = {}
+    for item in value.split(','):
+        if item.strip():
+            name, _, url = item.partition('=')
+            shards[name.strip()] = url.strip()
+    return shards
+
+def shard_bind(name):
+    """Bind key of a shard in SQLALCHEMY_BINDS."""
+    return f'shard_{name}'
+
+def shard_binds(config):
+    """SQLALCHEMY_BINDS entries for the configured shards.
+    
+    A shard on the primary database gets no bind of its own: it uses the
+    primary engine, so a request writing both users and per-user rows does
+    not hold two write transactions on the same SQLite file.
+    """
+    return {
+        shard_bind(name): url
+        for name, url in config['SHARDS'].items()
+        if url != config['SQLALCHEMY_DATABASE_URI']
+    }
+
+def shard_engine(db, name):
+    """Engine of the shard called name."""
+    if name not in current_app.config['SHARDS']:
+        raise ShardNotSelected(f'Unknown shard {name!r}; check DATABASE_SHARDS')
+    return db.engines.get(shard_bind(name), db.engine)
+
+def each_shard():
+    """Shard names to run a job on, one shard_scope() each.
+    
+    Without sharding this is [None], and shard_scope(None) changes nothing,
+    so jobs loop the same way on either kind of deployment.
+    """
+    return list(current_app.config['SHARDS']) or [None]
+
+class HashRing:
+    """Consistent-hash ring mapping user ids to shard names.
+    
+    Each shard owns HASH_RING_POINTS points on the ring and a user belongs
+    to the first point at or after the hash of their id. Adding a shard
+    takes over about 1/N of the users and leaves everyone else in place.
+    """
+    def __init__(self, names, points=HASH_RING_POINTS):
+        ring = sorted(
+            (_hash(f'{name}#{point}'), name) for name in names for point in range(points)
+        )
+        self._hashes = [point for point, _ in ring]
+        self._names = [name for _, name in ring]
+    
+    def shard_for(self, user_id):
+        index = bisect.bisect(self._hashes, _hash(str(user_id))) % len(self._hashes)
+        return self._names[index]
+
+def _hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+@lru_cache(maxsize=8)
+def _ring(names):
+    return HashRing(names)
+
+def hash_ring(config, names=None):
+    """The hash ring over names, by default SHARD_RING (or every shard)."""
+    return _ring(tuple(names or config['SHARD_RING'] or config['SHARDS']))
+
+def _place_by_hash(user_id):
+    return hash_ring(current_app.config).shard_for(user_id)
+
+def _place_on_emptiest(user_id):
+    from models import UserShard
+    db = current_app.extensions['sqlalchemy']
+    counts = dict.fromkeys(current_app.config['SHARDS'], 0)
+    counts.update(db.session.execute(
+        select(UserShard.shard, func.count()).group_by(UserShard.shard),
+        bind_arguments={'bind': db.engine}
+    ).all())
+    return min(counts, key=lambda name: (counts[name], name))
+
+# Placement strategies for new users, by SHARD_STRATEGY. 'place' picks the
+# shard; 'pin' records it in the directory. Unpinned users stay where the
+# hash ring puts them, so changing SHARD_RING moves them (see `flask
+# rebalance-shards`); pinned users only move with `flask move-user`.
+SHARD_STRATEGIES = {
+    'hash': {'place': _place_by_hash, 'pin': False},
+    'directory': {'place': _place_on_emptiest, 'pin': True},
+}
+
+def lookup_shard(user_id):
+    """Get (shard name, moving) for a user from the directory or the ring.
+    
+    Always read from the primary: a replica could still show a user on
+    the shard they just moved away from.
+    """
+    from models import UserShard
+    db = current_app.extensions['sqlalchemy']
+    entry = db.session.execute(
+        select(UserShard.shard, UserShard.moving).where(UserShard.user_id == user_id),
+        bind_arguments={'bind': db.engine}
+    ).first()
+    if entry is not None:
+        return entry.shard, entry.moving
+    return hash_ring(current_app.config).shard_for(user_id), False
+
+def moving_user_ids():
+    """Ids of the users being moved between shards (empty without sharding).
+    
+    Background work leaves them alone until the move is done, since their
+    rows are about to leave the shard it would write to.
+    """
+    if not current_app.config['SHARDS']:
+        return set()
+    from models import UserShard
+    db = current_app.extensions['sqlalchemy']
+    return set(db.session.execute(
+        select(UserShard.user_id).where(UserShard.moving == True),
+        bind_arguments={'bind': db.engine}
+    ).scalars())
+
+def shard_for(user_id):
+    """Name of the shard holding a user's data (None without sharding)."""
+    if not current_app.config['SHARDS']:
+        return None
+    return lookup_shard(user_id)[0]
+
+def add_user_stub(connection, user):
+    """Insert the stub user row per-user rows reference, unless it exists.
+    
+    user is a mapping with the User columns. The stub cannot log in and is
+    never read: User queries always go to the primary.
+    """
+    from models import User
+    table = User.__table__
+    exists = connection.execute(
+        select(table.c.id).where(table.c.id == user['id'])
+    ).first()
+    if exists is None:
+        connection.execute(insert(table).values(
+            id=user['id'], username=user['username'], email=user['email'],
+            password_hash='!', joined_at=user['joined_at']
+        ))
+
+def place_user(user):
+    """Choose the shard of a new user and route their rows there.
+    
+    Call once the user row has been flushed, so it has an id, and before
+    any of the user's rows are added. Does nothing without sharding.
+    """
+    config = current_app.config
+    if not config['SHARDS']:
+        return
+    from models import UserShard
+    db = current_app.extensions['sqlalchemy']
+    strategy = SHARD_STRATEGIES[config['SHARD_STRATEGY']]
+    name = strategy['place'](user.id)
+    if strategy['pin']:
+        db.session.add(UserShard(user_id=user.id, shard=name))
+    add_user_stub(db.session.connection(bind_arguments={'bind': shard_engine(db, name)}), {
+        'id': user.id, 'username': user.username, 'email': user.email,
+        'joined_at': user.joined_at,
+    })
+    g.shard = name
+
+def resident_user_ids(name):
+    """Ids of the users whose data lives on the shard called name."""
+    from models import User, UserShard
+    db = current_app.extensions['sqlalchemy']
+    pinned = dict(db.session.execute(
+        select(UserShard.user_id, UserShard.shard), bind_arguments={'bind': db.engine}
+    ).all())
+    ring = hash_ring(current_app.config)
+    return {
+        user_id for (user_id,) in db.session.execute(
+            select(User.id), bind_arguments={'bind': db.engine}
+        )
+        if (pinned.get(user_id) or ring.shard_for(user_id)) == name
+    }
+
+def current_shard_residents():
+    """Users living on the current shard, or None when not sharded."""
+    if not current_app.config['SHARDS']:
+        return None
+    name = g.get('shard')
+    if name is None:
+        raise ShardNotSelected('Per-user data was read with no shard selected')
+    return resident_user_ids(name)
+
+@contextmanager
+def shard_scope(name):
+    """Send queries on per-user tables to the shard called name in the block.
+    
+    shard_scope(None) leaves routing alone. On the way out pending changes
+    are flushed and the session's objects are dropped: rows of different
+    shards can share a primary key, so the next shard's queries must not
+    find this shard's objects in the identity map. Callers commit.
+    """
+    if name is None:
+        yield
+        return
+    
+    db = current_app.extensions['sqlalchemy']
+    previous = g.get('shard')
+    g.shard = name
+    try:
+        yield
+        db.session.flush()
+    finally:
+        db.session.expunge_all()
+        g.shard = previous
+
+def sharded_engine(db, mapper, clause):
+    """The current shard's engine if the statement uses per-user tables.
+    
+    Returns None for statements on other tables and when sharding is off.
+    """
+    if not current_app.config['SHARDS']:
+        return None
+    if mapper is not None:
+        tables = [inspect(mapper).local_table]
+    elif clause is not None:
+        tables = find_tables(clause, include_crud=True)
+    else:
+        return None
+    if not any(table.name in SHARDED_TABLES for table in tables):
+        return None
+    
+    name = g.get('shard')
+    if name is None:
+        raise ShardNotSelected(
+            'Per-user data was queried with no shard selected; '
+            'requests use the logged-in user\'s shard, jobs need shard_scope()'
+        )
+    return shard_engine(db, name)
+
+@shards_bp.before_app_request
+def route_to_shard():
+    # The directory lookup runs on every authenticated request so that a
+    # user's requests follow them as soon as a move completes; while a move
+    # is copying their rows, their writes are turned away
+    if not current_app.config['SHARDS'] or not current_user.is_authenticated:
+        return
+    g.shard, moving = lookup_shard(current_user.id)
+    g.shard_moving = moving
+    if moving and request.method not in READ_ONLY_METHODS:
+        return 'Your data is being moved, please try again in a moment.', 503, {'Retry-After': '5'}
@@ -0,0 +1,120 @@
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from flask import has_request_context, request
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+# Requests with these methods run their transactions as deferred readers;
+# everything else (other requests, CLI commands, background jobs) takes the
+# write lock up front
+READ_ONLY_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+_deferred = ContextVar('sqlite_deferred', default=False)
+
+def is_file_database(uri):
+    """Whether uri points at an SQLite database file (not :memory:)."""
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+def sqlite_engine_options(config):
+    """Engine options for a file-backed SQLite database.
+    
+    Each worker thread gets its own connection from a fixed-size pool, so
+    readers never queue behind each other. Pings and recycling are dropped:
+    an SQLite connection cannot go stale, and the ping was an extra
+    statement per checkout. Waiting on locks is left to busy_timeout.
+    """
+    return {
+        'pool_size': config['SQLITE_POOL_SIZE'],
+        'max_overflow': config['SQLITE_POOL_OVERFLOW'],
+        'pool_timeout': config['SQLITE_POOL_TIMEOUT'],
+        'connect_args': {
+            'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000,
+            'check_same_thread': False,
+        },
+    }
+
+def _pragmas(config):
+    return (
+        ('journal_mode', 'WAL'),
+        ('synchronous', config['SQLITE_SYNCHRONOUS']),
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT_MS']),
+        # Negative values are in KiB rather than pages
+        ('cache_size', -config['SQLITE_CACHE_SIZE_KB']),
+        ('mmap_size', config['SQLITE_MMAP_SIZE']),
+        ('temp_store', 'MEMORY'),
+    )
+
+@contextmanager
+def deferred_transactions():
+    """Begin the transactions opened in the block as deferred readers.
+    
+    For code outside requests that mostly reads, such as background jobs
+    polling for work. A deferred transaction only takes the write lock when
+    it first writes, and can fail there with "database is locked"; use it
+    where that failure is retried anyway.
+    """
+    token = _deferred.set(True)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+
+def _wants_write_lock():
+    if _deferred.get():
+        return False
+    return not has_request_context() or request.method not in READ_ONLY_METHODS
+
+def is_lock_error(error):
+    """Whether an OperationalError is SQLite refusing a lock another connection holds."""
+    message = str(error.orig).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+def install_sqlite_profile(engine, config):
+    """Tune an SQLite engine for several concurrent worker processes.
+    
+    Every new connection gets the WAL journal, so readers and the writer
+    don't block each other, plus the configured pragmas. The driver's own
+    transaction handling is switched off and transactions are begun here:
+    requests that may write open theirs with BEGIN IMMEDIATE, which takes
+    the single write lock before any statement runs. A deferred transaction
+    that later writes can fail with "database is locked" halfway through
+    a request; an immediate one can only fail at BEGIN, where nothing has
+    happened yet and retrying is safe. BEGIN IMMEDIATE is retried with
+    jittered exponential backoff on top of busy_timeout.
+    """
+    pragmas = _pragmas(config)
+    retries = config['SQLITE_WRITE_RETRIES']
+    backoff = config['SQLITE_WRITE_BACKOFF_MS'] / 1000
+    
+    @event.listens_for(engine, 'connect')
+    def _configure_connection(dbapi_connection, connection_record):
+        # Let the begin hook below emit BEGIN instead of the driver
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+    
+    @event.listens_for(engine, 'begin')
+    def _begin(conn):
+        if not _wants_write_lock():
+            conn.exec_driver_sql('BEGIN')
+            return
+        
+        for attempt in range(retries + 1):
+            try:
+                conn.exec_driver_sql('BEGIN IMMEDIATE')
+                return
+            except exc.OperationalError as error:
+                if attempt == retries or not is_lock_error(error):
+                    raise
+                delay = backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                logger.info('SQLite write lock busy, retrying in %.0f ms', delay * 1000)
+                time.sleep(delay)
@@ -0,0 +1,73 @@
+import os
+import sys
+
+import pytest
+from flask_migrate import upgrade
+from jinja2 import FunctionLoader
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, MIGRATIONS_DIRECTORY  # noqa: E402
+from shards import shard_binds  # noqa: E402
+
+PASSWORD = 'password123'
+
+def make_app(database_url, revision='head', **config):
+    """An app on database_url, migrated to revision (the latest by default).
+    
+    config overrides further settings; shards get migrated too.
+    """
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': database_url,
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        # No background threads or hashing processes in tests
+        'PASSWORD_HASH_WORKERS': 0,
+        'JOB_WORKERS': 0,
+        **config,
+    })
+    # The page templates are not part of the repository; pages render empty
+    app.jinja_loader = FunctionLoader(lambda name: '')
+    app.jinja_env.loader = app.jinja_loader
+    with app.app_context():
+        upgrade(directory=MIGRATIONS_DIRECTORY, revision=revision)
+        for bind in shard_binds(app.config):
+            upgrade(directory=MIGRATIONS_DIRECTORY, revision=revision, x_arg=[f'bind={bind}'])
+    return app
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(f'sqlite:///{tmp_path / "taskito.db"}')
+    yield app
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+def register(app, username, email):
+    """Register and log in a user; returns (test client, user id)."""
+    from models import User
+    client = app.test_client()
+    client.post('/register.html', data={
+        'username': username, 'email': email,
+        'password': PASSWORD, 'confirm_password': PASSWORD,
+    })
+    client.post('/login.html', data={'email': email, 'password': PASSWORD})
+    with app.app_context():
+        user_id = User.query.filter_by(email=email).one().id
+    return client, user_id
+
+def assert_stats_match(app, user_id):
+    """Check a user's counters and rollup against a recount from source data."""
+    from models import UserStats, DailyCompletion
+    from utils import USER_STATS_COUNTERS, USER_STATS_STREAK_FIELDS, compute_daily_completions, compute_user_stats
+    with app.app_context():
+        stats = db.session.get(UserStats, user_id)
+        expected = compute_user_stats([user_id])[user_id]
+        for name in USER_STATS_COUNTERS + USER_STATS_STREAK_FIELDS:
+            assert getattr(stats, name) == expected[name], name
+        rollup = {
+            row.day: row.count
+            for row in DailyCompletion.query.filter_by(user_id=user_id)
+        }
+        assert rollup == compute_daily_completions([user_id]).get(user_id, {})
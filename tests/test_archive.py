@@ -0,0 +1,49 @@
+from datetime import date, datetime, time, timedelta
+
+from app import db
+from archive import archive_completed_tasks
+from models import ArchivedTask, Category, SubTask, Task
+from conftest import register
+
+def add_tasks(app, user_id):
+    """Add a task completed long ago, with a subtask, and a recent one."""
+    with app.app_context():
+        category = Category(name='Paperwork', user_id=user_id)
+        db.session.add(category)
+        db.session.flush()
+        tasks = []
+        for title, days_ago in (('File quarterly taxes', 60), ('Quarterly review', 1)):
+            task = Task(
+                title=title, description='', due_date=date(2026, 1, 1), due_time=time(9),
+                priority=2, user_id=user_id, category_id=category.id,
+                is_completed=True, status=2, progress=100,
+                completed_at=datetime.utcnow() - timedelta(days=days_ago),
+            )
+            db.session.add(task)
+            tasks.append(task)
+        db.session.flush()
+        tasks[0].add_subtask('Find the receipts')
+        db.session.commit()
+        return [task.id for task in tasks]
+
+def test_archived_tasks_are_searched_and_listed(app):
+    client, user_id = register(app, 'alice', 'alice@example.com')
+    old_id, recent_id = add_tasks(app, user_id)
+    with app.app_context():
+        assert archive_completed_tasks(30) == 1
+        assert ArchivedTask.query.filter_by(task_id=old_id).count() == 1
+    
+    results = client.get('/search_tasks?q=quarterly').get_json()
+    assert {(task['id'], task['archived']) for task in results} == {(old_id, True), (recent_id, False)}
+    assert [task['id'] for task in client.get('/search_tasks?q=taxes&status=active').get_json()] == []
+    
+    # Most recent first, one page at a time across both tables
+    first = client.get('/api/v1/tasks?status=completed&limit=1&include=subtasks').get_json()
+    assert [task['id'] for task in first['data']] == [recent_id]
+    second = client.get(
+        f"/api/v1/tasks?status=completed&limit=1&include=subtasks&cursor={first['next_cursor']}"
+    ).get_json()
+    assert [task['id'] for task in second['data']] == [old_id]
+    assert [subtask['title'] for subtask in second['data'][0]['subtasks']] == ['Find the receipts']
+    assert 'archived' not in second['data'][0]
+    assert second['next_cursor'] is None
@@ -0,0 +1,78 @@
+from datetime import date, time
+
+from app import db
+from models import Category, SubTask, Task
+from batch import BATCH_MAX_OPERATIONS
+from conftest import assert_stats_match, register
+
+def create(category_id, title, **values):
+    return {
+        'op': 'create', 'title': title, 'description': 'From a batch',
+        'due_date': '2030-01-01', 'due_time': '09:00', 'priority': 2,
+        'category_id': category_id, **values,
+    }
+
+def test_batch_applies_valid_operations_and_reports_the_rest(app):
+    client, user_id = register(app, 'alice', 'alice@example.com')
+    _, bob_id = register(app, 'bob', 'bob@example.com')
+    with app.app_context():
+        category_id = Category.query.filter_by(user_id=user_id).first().id
+        bob_task = Task(
+            title='Not yours', description='', due_date=date(2030, 1, 1), due_time=time(9),
+            priority=1, user_id=bob_id, category_id=Category.query.filter_by(user_id=bob_id).first().id,
+        )
+        db.session.add(bob_task)
+        db.session.commit()
+        bob_task_id = bob_task.id
+    
+    response = client.post('/tasks/batch', json={'operations': [
+        create(category_id, 'Water plants', is_recurring=True, subtasks=['Balcony', 'Kitchen']),
+        create(category_id, 'File taxes', priority=3),
+        create(category_id, 'Read'),
+        create(category_id, ''),
+    ]})
+    results = response.get_json()['results']
+    assert [result['ok'] for result in results] == [True, True, True, False]
+    plants, taxes, reading = (result['task_id'] for result in results[:3])
+    
+    response = client.post('/tasks/batch', json={'operations': [
+        {'op': 'complete', 'task_id': plants},
+        {'op': 'complete', 'task_id': taxes},
+        {'op': 'progress', 'task_id': reading, 'progress': 40},
+        {'op': 'delete', 'task_id': reading},
+        {'op': 'delete', 'task_id': bob_task_id},
+        {'op': 'progress', 'task_id': taxes + 1000, 'progress': 10},
+        {'op': 'archive', 'task_id': taxes},
+    ]})
+    assert [
+        result.get('error') for result in response.get_json()['results']
+    ] == [
+        None, None, None,
+        'Task is already changed by an earlier operation in this batch',
+        'Task not found', 'Task not found', 'Unknown operation',
+    ]
+    
+    with app.app_context():
+        assert db.session.get(Task, taxes).is_completed
+        assert db.session.get(Task, reading).progress == 40
+        assert db.session.get(Task, bob_task_id) is not None
+        # The recurring task got a copy due the next day, with fresh subtasks
+        copy = Task.query.filter(
+            Task.user_id == user_id, Task.title == 'Water plants', Task.is_completed == False
+        ).one()
+        assert [(s.title, s.is_completed) for s in copy.subtasks.order_by(SubTask.id)] == [
+            ('Balcony', False), ('Kitchen', False)
+        ]
+        assert (copy.subtask_total, copy.subtask_done) == (2, 0)
+    assert_stats_match(app, user_id)
+    
+    # A second complete of the same task is refused
+    response = client.post('/tasks/batch', json={'operations': [{'op': 'complete', 'task_id': taxes}]})
+    assert response.get_json()['results'][0]['error'] == 'Task is already completed'
+    assert_stats_match(app, user_id)
+
+def test_batch_rejects_empty_and_oversized_requests(app):
+    client, _ = register(app, 'alice', 'alice@example.com')
+    assert client.post('/tasks/batch', json={'operations': []}).status_code == 400
+    operations = [{'op': 'delete', 'task_id': 1}] * (BATCH_MAX_OPERATIONS + 1)
+    assert client.post('/tasks/batch', json={'operations': operations}).status_code == 400
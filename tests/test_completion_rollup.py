@@ -0,0 +1,38 @@
+from datetime import date, datetime, time, timedelta
+
+from app import db
+from models import Category, Task
+from utils import refresh_user_stats
+from conftest import assert_stats_match, register
+
+def test_completing_a_completed_task_again_changes_nothing(app):
+    client, user_id = register(app, 'alice', 'alice@example.com')
+    with app.app_context():
+        category = Category(name='Home', user_id=user_id)
+        db.session.add(category)
+        db.session.flush()
+        # Completed three days ago, so that moving completed_at to today
+        # would leave the rollup on the wrong day
+        task = Task(
+            title='Water the plants', description='', due_date=date.today(), due_time=time(9),
+            priority=3, user_id=user_id, category_id=category.id, is_recurring=True,
+            is_completed=True, status=2, progress=100,
+            completed_at=datetime.utcnow() - timedelta(days=3),
+        )
+        db.session.add(task)
+        db.session.flush()
+        refresh_user_stats(user_id)
+        db.session.commit()
+        task_id, completed_at = task.id, task.completed_at
+    
+    for _ in range(2):
+        assert client.post(f'/task/{task_id}/complete').status_code == 302
+    
+    with app.app_context():
+        assert db.session.get(Task, task_id).completed_at == completed_at
+        assert Task.query.filter_by(user_id=user_id).count() == 1
+    assert_stats_match(app, user_id)
+    
+    # Deleting it takes the completion off the day it was counted on
+    assert client.post(f'/task/{task_id}/delete').status_code == 302
+    assert_stats_match(app, user_id)
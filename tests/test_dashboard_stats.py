@@ -0,0 +1,47 @@
+from contextlib import contextmanager
+from datetime import date, datetime, time
+
+from flask import template_rendered
+
+from app import db
+from models import Category, Task
+from utils import adjust_user_stats
+from conftest import register
+
+@contextmanager
+def rendered_context(app):
+    contexts = []
+    
+    def _record(sender, template, context, **extra):
+        contexts.append(context)
+    
+    template_rendered.connect(_record, app)
+    try:
+        yield contexts
+    finally:
+        template_rendered.disconnect(_record, app)
+
+def completed_on_dashboard(app, client):
+    with rendered_context(app) as contexts:
+        assert client.get('/dashboard.html').status_code == 200
+    return contexts[0]['progress_stats']['completed']
+
+def test_dashboard_stats_follow_writes_from_other_workers(app):
+    client, user_id = register(app, 'alice', 'alice@example.com')
+    assert completed_on_dashboard(app, client) == 0
+    
+    # Written directly, as another worker would: nothing here tells this
+    # worker's cache about it except the bumped data version
+    with app.app_context():
+        category = Category(name='Home', user_id=user_id)
+        db.session.add(category)
+        db.session.flush()
+        db.session.add(Task(
+            title='Water the plants', description='', due_date=date.today(), due_time=time(9),
+            priority=2, user_id=user_id, category_id=category.id,
+            is_completed=True, status=2, progress=100, completed_at=datetime.utcnow(),
+        ))
+        adjust_user_stats(user_id, tasks_count=1, completed_count=1)
+        db.session.commit()
+    
+    assert completed_on_dashboard(app, client) == 1
@@ -0,0 +1,49 @@
+from datetime import date, time
+
+from app import db
+from models import Category, SubTask, Task
+from conftest import register
+
+def test_edit_keeps_subtasks_posted_without_their_ids(app):
+    client, user_id = register(app, 'alice', 'alice@example.com')
+    with app.app_context():
+        category = Category(name='Home', user_id=user_id)
+        db.session.add(category)
+        db.session.flush()
+        task = Task(
+            title='Spring cleaning', description='Whole house', due_date=date(2030, 1, 1),
+            due_time=time(9), priority=2, user_id=user_id, category_id=category.id,
+            track_progress=True,
+        )
+        db.session.add(task)
+        task.add_subtask('Windows', is_completed=True)
+        task.add_subtask('Garage')
+        # Rows inserted afterwards, so re-inserted subtasks would get new ids
+        other = Task(
+            title='Taxes', description='', due_date=date(2030, 1, 1), due_time=time(9),
+            priority=2, user_id=user_id, category_id=category.id,
+        )
+        db.session.add(other)
+        other.add_subtask('Receipts')
+        db.session.commit()
+        task_id, category_id = task.id, category.id
+        before = {subtask.title: subtask.id for subtask in task.subtasks}
+    
+    # The edit form as a template that does not render subtask_id posts it
+    response = client.post(f'/task/{task_id}/edit', data={
+        'title': 'Spring cleaning', 'description': 'Whole house',
+        'due_date': '2030-01-01', 'due_time': '09:00', 'priority': '2',
+        'category_id': str(category_id), 'track_progress': 'y',
+        'subtasks-0-title': 'Windows', 'subtasks-0-is_completed': 'y',
+        'subtasks-1-title': 'Garage and shed',
+    })
+    assert response.status_code == 302
+    
+    with app.app_context():
+        subtasks = SubTask.query.filter_by(task_id=task_id).order_by(SubTask.id).all()
+        assert [(subtask.id, subtask.title, subtask.is_completed) for subtask in subtasks] == [
+            (before['Windows'], 'Windows', True),
+            (before['Garage'], 'Garage and shed', False),
+        ]
+        task = db.session.get(Task, task_id)
+        assert (task.subtask_total, task.subtask_done) == (2, 1)
@@ -0,0 +1,31 @@
+from datetime import date, time
+
+from app import db
+from models import Category, Task
+from conftest import register
+
+def test_filter_tasks_pages_and_rejects_bad_filters(app):
+    client, user_id = register(app, 'alice', 'alice@example.com')
+    with app.app_context():
+        category = Category(name='Home', user_id=user_id)
+        db.session.add(category)
+        db.session.flush()
+        for day in (3, 1, 2):
+            db.session.add(Task(
+                title=f'Task {day}', description='', due_date=date(2030, 1, day), due_time=time(9),
+                priority=day, user_id=user_id, category_id=category.id,
+            ))
+        db.session.commit()
+        category_id = category.id
+    
+    first = client.get(f'/filter_tasks?limit=2&category_id={category_id}')
+    assert [task['title'] for task in first.get_json()] == ['Task 1', 'Task 2']
+    second = client.get(f"/filter_tasks?limit=2&cursor={first.headers['X-Next-Cursor']}")
+    assert [task['title'] for task in second.get_json()] == ['Task 3']
+    assert 'X-Next-Cursor' not in second.headers
+    
+    for query in ('category_id=abc', 'priority=high'):
+        response = client.get(f'/filter_tasks?{query}')
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Invalid category_id or priority'}
+    assert client.post('/filter_tasks', json={'priority': ['high']}).status_code == 400
@@ -0,0 +1,58 @@
+from datetime import date, time
+
+import jobs
+from app import db
+from models import Achievement, Category, Job, Task
+from jobs import enqueue_job, run_due_jobs
+from conftest import register
+
+def test_completion_awards_achievements_in_the_background(app):
+    client, user_id = register(app, 'alice', 'alice@example.com')
+    with app.app_context():
+        category = Category.query.filter_by(user_id=user_id).first()
+        task = Task(
+            title='Taxes', description='', due_date=date(2030, 1, 1), due_time=time(9),
+            priority=1, user_id=user_id, category_id=category.id,
+        )
+        db.session.add(task)
+        db.session.commit()
+        task_id = task.id
+    
+    assert client.post(f'/task/{task_id}/complete').status_code == 302
+    with client.session_transaction() as session:
+        session.pop('_flashes', None)
+    with app.app_context():
+        assert Achievement.query.filter_by(user_id=user_id).count() == 0
+        assert run_due_jobs() == 1
+        assert [a.name for a in Achievement.query.filter_by(user_id=user_id)] == ['Task Beginner']
+    
+    # The result is flashed on the next page view, once
+    client.get('/dashboard.html')
+    with client.session_transaction() as session:
+        messages = session.pop('_flashes', [])
+        assert 'awaiting_jobs' not in session
+    assert messages == [('success', 'Congratulations! You earned new achievements: Task Beginner')]
+    client.get('/dashboard.html')
+    with client.session_transaction() as session:
+        assert '_flashes' not in session
+
+def test_jobs_are_deduplicated_and_retried_until_they_fail(app, monkeypatch):
+    _, user_id = register(app, 'alice', 'alice@example.com')
+    calls = []
+    
+    def flaky(user_id, payload):
+        calls.append(payload)
+        raise RuntimeError('boom')
+    
+    monkeypatch.setitem(jobs.JOB_HANDLERS, 'flaky', flaky)
+    app.config.update(JOB_RETRY_SECONDS=0, JOB_MAX_ATTEMPTS=3)
+    with app.app_context():
+        enqueue_job('flaky', user_id, {'n': 1}, key='once')
+        enqueue_job('flaky', user_id, {'n': 2}, key='once')
+        db.session.commit()
+        assert Job.query.filter_by(kind='flaky').count() == 1
+        
+        assert run_due_jobs() == 3
+        job = Job.query.filter_by(kind='flaky').one()
+        assert (job.status, job.attempts, job.last_error) == ('failed', 3, 'RuntimeError: boom')
+    assert calls == [{'n': 1}] * 3
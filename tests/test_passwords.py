@@ -0,0 +1,44 @@
+import threading
+
+from werkzeug.security import generate_password_hash
+
+import passwords
+from app import db
+from models import User
+from passwords import needs_rehash
+from conftest import PASSWORD, register
+
+def test_needs_rehash_follows_the_configured_parameters(app):
+    with app.app_context():
+        assert not needs_rehash(generate_password_hash('secret', 'scrypt', 16))
+        assert needs_rehash(generate_password_hash('secret', 'scrypt', 8))
+        assert needs_rehash(generate_password_hash('secret', 'pbkdf2:sha256', 16))
+        assert needs_rehash(generate_password_hash('secret', 'scrypt:16384:8:1', 16))
+        assert needs_rehash('not-a-hash')
+
+def test_login_upgrades_an_outdated_hash(app):
+    register(app, 'alice', 'alice@example.com')
+    with app.app_context():
+        user = User.query.filter_by(email='alice@example.com').one()
+        user.password_hash = generate_password_hash(PASSWORD, 'pbkdf2:sha256', 8)
+        db.session.commit()
+    
+    client = app.test_client()
+    assert client.post('/login.html', data={'email': 'alice@example.com', 'password': PASSWORD}).status_code == 302
+    with app.app_context():
+        password_hash = User.query.filter_by(email='alice@example.com').one().password_hash
+        assert password_hash.startswith('scrypt:') and not needs_rehash(password_hash)
+
+def test_login_answers_503_while_hashing_is_saturated(app, monkeypatch):
+    register(app, 'alice', 'alice@example.com')
+    # A pool with its only slot taken: the login waits out the timeout
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    monkeypatch.setattr(passwords, '_get_pool', lambda: object())
+    monkeypatch.setattr(passwords, '_slots', slots)
+    app.config['PASSWORD_HASH_TIMEOUT'] = 0.01
+    
+    client = app.test_client()
+    response = client.post('/login.html', data={'email': 'alice@example.com', 'password': PASSWORD})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
@@ -0,0 +1,59 @@
+from contextlib import contextmanager
+from datetime import date, time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import db
+from models import Category, Task
+from utils import touch_user_data
+from conftest import register
+
+@contextmanager
+def count_statements():
+    statements = []
+    
+    def _count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(Engine, 'before_cursor_execute', _count)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'before_cursor_execute', _count)
+
+def add_categories(app, user_id, count, completed_per_category=1):
+    """Add count categories with an active, a tracked and completed tasks each."""
+    with app.app_context():
+        for i in range(count):
+            category = Category(name=f'Category {i}', user_id=user_id)
+            db.session.add(category)
+            db.session.flush()
+            kinds = [(False, False), (True, False)] + [(False, True)] * completed_per_category
+            for n, (tracked, completed) in enumerate(kinds):
+                db.session.add(Task(
+                    title=f'Task {i}.{n}', description='', due_date=date(2030, 1, 1), due_time=time(9),
+                    priority=2, user_id=user_id, category_id=category.id,
+                    track_progress=tracked, is_completed=completed,
+                ))
+        touch_user_data(user_id)
+        db.session.commit()
+
+def progress_statements(client):
+    # The first view may build per-user rows and caches; count the second
+    assert client.get('/progress.html').status_code == 200
+    with count_statements() as statements:
+        assert client.get('/progress.html').status_code == 200
+    return len(statements)
+
+def test_progress_statements_do_not_grow_with_categories(app):
+    client, user_id = register(app, 'alice', 'alice@example.com')
+    # Five completed tasks from the start, so that the recent completions
+    # never need topping up from the archive
+    add_categories(app, user_id, 1, completed_per_category=5)
+    with_one = progress_statements(client)
+    
+    add_categories(app, user_id, 20)
+    with_many = progress_statements(client)
+    
+    assert with_many == with_one
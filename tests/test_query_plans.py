@@ -0,0 +1,34 @@
+import os
+
+import pytest
+from flask_migrate import downgrade
+
+from app import db, MIGRATIONS_DIRECTORY
+from query_plans import HOT_QUERIES, explain_hot_queries
+from conftest import make_app, register
+
+# A scratch PostgreSQL database to plan the queries on as well, e.g.
+# postgresql://taskito@localhost/taskito_test; it is migrated up and back
+# down to an empty schema
+POSTGRESQL_URL = os.environ.get('TEST_POSTGRESQL_URL')
+
+def check_plans(app, user_id):
+    with app.app_context():
+        results = explain_hot_queries(user_id)
+    assert set(results) == {entry['name'] for entry in HOT_QUERIES}
+    assert {name: problems for name, problems in results.items() if problems} == {}
+
+def test_hot_queries_use_indexes_on_sqlite(app):
+    _, user_id = register(app, 'alice', 'alice@example.com')
+    check_plans(app, user_id)
+
+@pytest.mark.skipif(not POSTGRESQL_URL, reason='TEST_POSTGRESQL_URL is not set')
+def test_hot_queries_use_indexes_on_postgresql():
+    app = make_app(POSTGRESQL_URL)
+    try:
+        _, user_id = register(app, 'alice', 'alice@example.com')
+        check_plans(app, user_id)
+    finally:
+        with app.app_context():
+            db.session.remove()
+            downgrade(directory=MIGRATIONS_DIRECTORY, revision='base')
@@ -0,0 +1,48 @@
+import queue
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from models import Category, Task
+from reminders import ReminderScheduler
+from conftest import register
+
+def test_reminder_fires_once_across_reloads_and_edits(app):
+    _, user_id = register(app, 'alice', 'alice@example.com')
+    due_at = datetime.now() + timedelta(minutes=5)
+    scheduler = ReminderScheduler()
+    with app.app_context():
+        category = Category(name='Home', user_id=user_id)
+        db.session.add(category)
+        db.session.flush()
+        # Inside the lead window, so the reminder fires at once
+        task = Task(
+            title='Water the plants', description='', due_date=due_at.date(),
+            due_time=due_at.time().replace(microsecond=0), priority=2,
+            user_id=user_id, category_id=category.id,
+        )
+        db.session.add(task)
+        db.session.commit()
+        
+        events = scheduler.subscribe(user_id)
+        try:
+            scheduler.load_user(user_id, 1)
+            assert events.get(timeout=5)['id'] == task.id
+            
+            # Writes bump the data version, which reloads the schedule
+            scheduler.load_user(user_id, 2)
+            task.title = 'Water the ferns'
+            db.session.commit()
+            scheduler.task_changed(task)
+            with pytest.raises(queue.Empty):
+                events.get(timeout=0.5)
+            
+            # Rescheduling the task arms its reminder again
+            due_at += timedelta(minutes=1)
+            task.due_date, task.due_time = due_at.date(), due_at.time().replace(microsecond=0)
+            db.session.commit()
+            scheduler.task_changed(task)
+            assert events.get(timeout=5)['id'] == task.id
+        finally:
+            scheduler.unsubscribe(user_id, events)
@@ -0,0 +1,26 @@
+from datetime import date, time
+
+from app import db
+from models import Category, Task
+from conftest import register
+
+def test_search_filters_matches_and_rejects_bad_filters(app):
+    client, user_id = register(app, 'alice', 'alice@example.com')
+    with app.app_context():
+        category = Category(name='Home', user_id=user_id)
+        db.session.add(category)
+        db.session.flush()
+        for title, priority in (('Water the plants', 1), ('Water the lawn', 3)):
+            db.session.add(Task(
+                title=title, description='', due_date=date(2030, 1, 1), due_time=time(9),
+                priority=priority, user_id=user_id, category_id=category.id,
+            ))
+        db.session.commit()
+    
+    results = client.get('/search_tasks?q=wat&priority=3').get_json()
+    assert [task['title'] for task in results] == ['Water the lawn']
+    
+    for query in ('category_id=abc', 'priority=high'):
+        response = client.get(f'/search_tasks?q=water&{query}')
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Invalid category_id or priority'}
@@ -0,0 +1,71 @@
+import threading
+import time as clock
+from datetime import date, time
+
+import pytest
+from sqlalchemy import func, select
+
+from app import db
+from jobs import run_due_jobs
+from models import Achievement, Category, Job, Task
+from shard_moves import move_user
+from shards import shard_engine, shard_for, shard_scope
+from conftest import make_app, register
+
+def user_rows(app, shard, model, user_id):
+    with app.app_context():
+        return db.session.execute(
+            select(func.count()).select_from(model).where(model.user_id == user_id),
+            bind_arguments={'bind': shard_engine(db, shard)}
+        ).scalar()
+
+# New users land on b (the emptiest shard, by name) or on main (the only
+# shard on the ring), so the move runs both ways off the primary
+@pytest.mark.parametrize('placement', [
+    {'SHARD_STRATEGY': 'directory'},
+    {'SHARD_STRATEGY': 'hash', 'SHARD_RING': ['main']},
+])
+def test_jobs_wait_for_a_move_and_run_on_the_target(tmp_path, placement):
+    primary = f'sqlite:///{tmp_path / "main.db"}'
+    app = make_app(
+        primary,
+        SHARDS={'main': primary, 'b': f'sqlite:///{tmp_path / "b.db"}'},
+        **placement,
+    )
+    client, user_id = register(app, 'alice', 'alice@example.com')
+    with app.app_context():
+        source = shard_for(user_id)
+        with shard_scope(source):
+            category = Category(name='Home', user_id=user_id)
+            db.session.add(category)
+            db.session.flush()
+            task = Task(
+                title='Water the plants', description='', due_date=date.today(), due_time=time(9),
+                priority=3, user_id=user_id, category_id=category.id,
+            )
+            db.session.add(task)
+            db.session.commit()
+            task_id = task.id
+    target = 'main' if source == 'b' else 'b'
+    # Queues the achievements job, which is left for later
+    assert client.post(f'/task/{task_id}/complete').status_code == 302
+    
+    def move():
+        with app.app_context():
+            move_user(user_id, target, drain_seconds=1)
+    
+    mover = threading.Thread(target=move)
+    mover.start()
+    clock.sleep(0.3)
+    # While the move runs the job waits and result pages do not write
+    with app.app_context():
+        assert run_due_jobs() == 0
+    assert client.get('/dashboard.html').status_code == 200
+    mover.join()
+    
+    with app.app_context():
+        assert run_due_jobs() == 1
+    assert user_rows(app, target, Achievement, user_id) > 0
+    assert user_rows(app, target, Job, user_id) == 1
+    for model in (Achievement, Job, Task, Category):
+        assert user_rows(app, source, model, user_id) == 0
@@ -0,0 +1,70 @@
+from flask_migrate import upgrade
+from sqlalchemy import text
+
+from app import db, MIGRATIONS_DIRECTORY
+from models import Category, SubTask, Task
+from conftest import assert_stats_match, make_app, register
+
+# The revision before the subtask counters were added
+BEFORE_COUNTERS = '333549373835'
+
+def add_task(app, client, user_id, done, total):
+    """Create a category and a task with subtasks through the routes."""
+    client.post('/category/new', data={'name': 'Home'})
+    with app.app_context():
+        category_id = Category.query.filter_by(user_id=user_id, name='Home').one().id
+    data = {
+        'title': 'Spring cleaning', 'description': 'Whole house',
+        'due_date': '2030-01-01', 'due_time': '09:00', 'priority': '2',
+        'category_id': str(category_id), 'track_progress': 'y',
+    }
+    for n in range(total):
+        data[f'subtasks-{n}-title'] = f'Room {n}'
+        if n < done:
+            data[f'subtasks-{n}-is_completed'] = 'y'
+    assert client.post('/task/new', data=data).status_code == 302
+    with app.app_context():
+        task = Task.query.filter_by(user_id=user_id).one()
+        return task.id, [subtask.id for subtask in task.subtasks.order_by(SubTask.id)]
+
+def test_toggles_keep_the_counters_and_progress(app):
+    client, user_id = register(app, 'alice', 'alice@example.com')
+    task_id, subtask_ids = add_task(app, client, user_id, done=1, total=4)
+    
+    toggle = f'/task/{task_id}/subtask/{subtask_ids[1]}/toggle'
+    assert client.post(toggle).get_json() == {'subtask_completed': True, 'task_progress': 50}
+    assert client.post(toggle).get_json() == {'subtask_completed': False, 'task_progress': 25}
+    assert client.post(f'/task/{task_id}/subtask/{subtask_ids[2]}/toggle').get_json()['task_progress'] == 50
+    
+    with app.app_context():
+        task = db.session.get(Task, task_id)
+        done = SubTask.query.filter_by(task_id=task_id, is_completed=True).count()
+        assert (task.subtask_total, task.subtask_done, task.progress) == (4, done, 50)
+    assert_stats_match(app, user_id)
+    
+    # Someone else's subtask is not found, and nothing changes
+    other, _ = register(app, 'bob', 'bob@example.com')
+    assert other.post(toggle).status_code == 404
+    with app.app_context():
+        assert db.session.get(Task, task_id).subtask_done == 2
+
+def test_migration_counts_existing_subtasks(tmp_path):
+    app = make_app(f'sqlite:///{tmp_path / "taskito.db"}', revision=BEFORE_COUNTERS)
+    with app.app_context():
+        for statement in (
+            "INSERT INTO user (id, username, email, password_hash) VALUES (1, 'alice', 'a@example.com', '!')",
+            "INSERT INTO category (id, name, user_id) VALUES (1, 'Home', 1)",
+            "INSERT INTO task (id, title, description, due_date, due_time, priority, user_id, category_id) "
+            "VALUES (1, 'Spring cleaning', '', '2030-01-01', '09:00:00', 2, 1, 1), "
+            "(2, 'Taxes', '', '2030-01-01', '09:00:00', 2, 1, 1)",
+            "INSERT INTO sub_task (title, is_completed, task_id) "
+            "VALUES ('Kitchen', 1, 1), ('Garage', 0, 1), ('Attic', 0, 1)",
+        ):
+            db.session.execute(text(statement))
+        db.session.commit()
+        
+        upgrade(directory=MIGRATIONS_DIRECTORY)
+        counters = db.session.execute(
+            text('SELECT id, subtask_total, subtask_done FROM task ORDER BY id')
+        ).all()
+    assert [tuple(row) for row in counters] == [(1, 3, 1), (2, 0, 0)]
@@ -0,0 +1,49 @@
+from datetime import date, time
+
+import pytest
+
+from app import db
+from models import Category, Task
+from utils import encode_task_cursor, decode_task_cursor
+from conftest import register
+
+def test_task_cursor_round_trip():
+    key = (date(2030, 1, 31), time(23, 59, 30), 12345)
+    assert decode_task_cursor(encode_task_cursor(*key)) == key
+    for cursor in ('', 'not-a-cursor', encode_task_cursor(date(2030, 1, 1), time(9), 1)[:-4]):
+        with pytest.raises(ValueError):
+            decode_task_cursor(cursor)
+
+@pytest.mark.parametrize('url, titles', [
+    ('/filter_tasks?limit=1', lambda response: [task['title'] for task in response.get_json()]),
+    ('/api/v1/tasks?limit=1&fields=title', lambda response: [task['title'] for task in response.get_json()['data']]),
+])
+def test_pages_split_tasks_due_at_the_same_time(app, url, titles):
+    client, user_id = register(app, 'alice', 'alice@example.com')
+    with app.app_context():
+        category = Category(name='Home', user_id=user_id)
+        db.session.add(category)
+        db.session.flush()
+        # Three tasks share a due date and time, so only the id orders them
+        for title, day, hour in (('B', 2, 9), ('A', 1, 9), ('C', 2, 9), ('D', 2, 9), ('E', 2, 10)):
+            db.session.add(Task(
+                title=title, description='', due_date=date(2030, 1, day), due_time=time(hour),
+                priority=1, user_id=user_id, category_id=category.id,
+            ))
+        db.session.commit()
+    
+    seen = []
+    cursor = None
+    while True:
+        response = client.get(url + (f'&cursor={cursor}' if cursor else ''))
+        assert response.status_code == 200
+        seen += titles(response)
+        if url.startswith('/api'):
+            cursor = response.get_json()['next_cursor']
+        else:
+            cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+    assert seen == ['A', 'B', 'C', 'D', 'E']
+    
+    assert client.get(url + '&cursor=not-a-cursor').status_code == 400
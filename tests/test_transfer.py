@@ -0,0 +1,75 @@
+import io
+import json
+from datetime import date, datetime, time
+
+import pytest
+
+from app import db
+from models import Category, SubTask, Task
+from transfer import read_records
+from conftest import assert_stats_match, register
+
+def exported(client, fmt):
+    """Get (body, records) of a user's export; records lose the ids, which imports renumber."""
+    response = client.get(f'/tasks/export?format={fmt}')
+    assert response.status_code == 200
+    records = []
+    for _, record in read_records(io.StringIO(response.get_data(as_text=True), newline=''), fmt):
+        record.pop('id', None)
+        record.pop('task_id', None)
+        records.append({name: value for name, value in record.items() if value not in (None, '')})
+    return response.data, records
+
+@pytest.mark.parametrize('fmt', ['ndjson', 'csv'])
+def test_export_imports_back_unchanged(app, fmt):
+    client, user_id = register(app, 'alice', 'alice@example.com')
+    with app.app_context():
+        category = Category(name='Home, garden', user_id=user_id)
+        db.session.add(category)
+        db.session.flush()
+        task = Task(
+            title='Spring "cleaning"', description='Whole house\nand the shed',
+            due_date=date(2030, 1, 1), due_time=time(9, 30), priority=2,
+            track_progress=True, subtask_total=2, subtask_done=1, progress=50,
+            user_id=user_id, category_id=category.id,
+        )
+        done = Task(
+            title='Taxes', description='Filed', due_date=date(2029, 4, 1), due_time=time(17),
+            priority=3, is_completed=True, completed_at=datetime(2029, 3, 30, 12), status=2, progress=100,
+            user_id=user_id, category_id=category.id,
+        )
+        db.session.add_all([task, done])
+        db.session.flush()
+        db.session.add_all([
+            SubTask(task_id=task.id, title='Kitchen', is_completed=True),
+            SubTask(task_id=task.id, title='Shed', is_completed=False),
+        ])
+        db.session.commit()
+    
+    data, records = exported(client, fmt)
+    assert [record['type'] for record in records].count('task') == 2
+    
+    other, other_id = register(app, 'bob', 'bob@example.com')
+    response = other.post('/tasks/import', data={'file': (io.BytesIO(data), f'export.{fmt}')})
+    assert response.get_json() == {'categories': 1, 'tasks': 2, 'subtasks': 2}
+    
+    # Both users have the default categories from registration, which the
+    # import matches by name
+    assert exported(other, fmt)[1] == records
+    with app.app_context():
+        task = Task.query.filter_by(user_id=other_id, title='Spring "cleaning"').one()
+        assert (task.subtask_total, task.subtask_done) == (2, 1)
+    assert_stats_match(app, other_id)
+
+def test_bad_import_writes_nothing(app):
+    client, user_id = register(app, 'alice', 'alice@example.com')
+    lines = [
+        {'type': 'category', 'category': 'Errands'},
+        {'type': 'subtask', 'task_id': '7', 'title': 'Orphan'},
+    ]
+    data = '\n'.join(json.dumps(line) for line in lines).encode()
+    response = client.post('/tasks/import', data={'file': (io.BytesIO(data), 'export.ndjson')})
+    assert response.status_code == 400
+    assert 'unknown task 7' in response.get_json()['error']
+    with app.app_context():
+        assert Category.query.filter_by(user_id=user_id, name='Errands').count() == 0
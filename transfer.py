@@ -0,0 +1,332 @@
+import csv
+import io
+import json
+from datetime import date, datetime, time
+
+from sqlalchemy import bindparam, insert, select, update
+
+from app import db
+from models import Task, Category, SubTask, ArchivedTask, ArchivedSubTask
+from utils import refresh_user_stats
+
+# Import/export formats: newline-delimited JSON objects, or one CSV table
+# with a "type" column saying which fields of a row apply
+TRANSFER_FORMATS = ('ndjson', 'csv')
+
+TRANSFER_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+EXPORT_FIELDS = (
+    'type', 'id', 'task_id', 'category', 'is_default', 'title', 'description',
+    'due_date', 'due_time', 'priority', 'status', 'progress', 'track_progress',
+    'is_recurring', 'is_completed', 'completed_at', 'created_at',
+)
+
+# Rows fetched per round trip while exporting, and rows per INSERT batch
+# while importing
+EXPORT_FETCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 1000
+
+# Size of the chunks handed to the response or output file
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+class TransferError(ValueError):
+    """Raised for an import record that cannot be read; nothing is imported."""
+
+def _stream(statement):
+    # yield_per uses a server-side cursor where the driver has one, so only
+    # one batch of rows is held in memory at a time
+    return db.session.execute(statement.execution_options(yield_per=EXPORT_FETCH_SIZE))
+
+def export_records(user_id):
+    """Yield a user's categories, tasks and subtasks as flat dicts.
+    
+    Ids only link subtasks to their task within one export; imports assign
+    new ones.
+    """
+    for row in _stream(
+        select(Category.id, Category.name, Category.is_default)
+        .where(Category.user_id == user_id).order_by(Category.id)
+    ):
+        yield {'type': 'category', 'id': row.id, 'category': row.name, 'is_default': row.is_default}
+    
+    # Archived tasks are exported like live ones; their ids get an "a" prefix
+    # since they are numbered separately
+    for model, prefix in ((Task, ''), (ArchivedTask, 'a')):
+        for row in _stream(
+            select(
+                model.id, Category.name.label('category'), model.title, model.description,
+                model.due_date, model.due_time, model.priority, model.status, model.progress,
+                model.track_progress, model.is_recurring, model.is_completed,
+                model.completed_at, model.created_at
+            ).join(Category, model.category_id == Category.id)
+            .where(model.user_id == user_id).order_by(model.id)
+        ):
+            record = {'type': 'task'}
+            record.update(row._mapping)
+            record['id'] = f'{prefix}{row.id}' if prefix else row.id
+            yield record
+    
+    for model, task_model, task_id, prefix in (
+        (SubTask, Task, SubTask.task_id, ''),
+        (ArchivedSubTask, ArchivedTask, ArchivedSubTask.archived_task_id, 'a')
+    ):
+        for row in _stream(
+            select(model.id, task_id.label('task_id'), model.title, model.is_completed)
+            .join(task_model, task_id == task_model.id)
+            .where(task_model.user_id == user_id).order_by(task_id, model.id)
+        ):
+            yield {
+                'type': 'subtask', 'id': f'{prefix}{row.id}' if prefix else row.id,
+                'task_id': f'{prefix}{row.task_id}' if prefix else row.task_id,
+                'title': row.title, 'is_completed': row.is_completed
+            }
+
+def _json_value(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    return value
+
+def export_user_data(user_id, fmt='ndjson'):
+    """Generate a user's data as NDJSON or CSV text, in chunks.
+    
+    Memory use does not depend on the size of the user's history, so the
+    result can be returned as a streaming response or written to a file.
+    """
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(record):
+            buffer.write(json.dumps({k: _json_value(v) for k, v in record.items()}))
+            buffer.write('\n')
+    
+    for record in export_records(user_id):
+        write(record)
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def read_records(stream, fmt='ndjson'):
+    """Yield (line number, record dict) pairs from a text stream."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, {k: v for k, v in record.items() if v not in ('', None)}
+        return
+    
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            raise TransferError(f'line {line_number}: invalid JSON')
+        if not isinstance(record, dict):
+            raise TransferError(f'line {line_number}: expected an object')
+        yield line_number, record
+
+def _parse_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes')
+    return bool(value)
+
+def _parse_field(record, name, parse, required=True, default=None):
+    value = record.get(name)
+    if value is None:
+        if required:
+            raise ValueError(f'{name} is required')
+        return default
+    try:
+        return parse(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} is invalid')
+
+def _task_row(record):
+    title = _parse_field(record, 'title', str)
+    if not title.strip() or len(title) > 100:
+        raise ValueError('title must be 1 to 100 characters')
+    priority = _parse_field(record, 'priority', int)
+    if priority not in (1, 2, 3):
+        raise ValueError('priority must be 1, 2 or 3')
+    return {
+        'title': title,
+        'description': _parse_field(record, 'description', str),
+        'due_date': _parse_field(record, 'due_date', date.fromisoformat),
+        'due_time': _parse_field(record, 'due_time', time.fromisoformat),
+        'priority': priority,
+        'status': _parse_field(record, 'status', int, False, 0),
+        'progress': _parse_field(record, 'progress', int, False, 0),
+        'track_progress': _parse_field(record, 'track_progress', _parse_bool, False, False),
+        'is_recurring': _parse_field(record, 'is_recurring', _parse_bool, False, False),
+        'is_completed': _parse_field(record, 'is_completed', _parse_bool, False, False),
+        'completed_at': _parse_field(record, 'completed_at', datetime.fromisoformat, False),
+        'created_at': _parse_field(record, 'created_at', datetime.fromisoformat, False, datetime.utcnow()),
+    }
+
+def _copy_subtasks(rows):
+    # COPY streams the batch to PostgreSQL in one round trip
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([row['task_id'], row['title'], 't' if row['is_completed'] else 'f'])
+    buffer.seek(0)
+    
+    cursor = db.session.connection(bind_arguments={'mapper': SubTask.__mapper__}).connection.cursor()
+    try:
+        cursor.copy_expert(
+            f'COPY {SubTask.__tablename__} (task_id, title, is_completed) FROM STDIN WITH (FORMAT csv)',
+            buffer
+        )
+    finally:
+        cursor.close()
+
+class _Importer:
+    """Buffer imported records and write them in batches."""
+    
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.dialect = db.session.get_bind(mapper=Task.__mapper__).dialect.name
+        # Resolve categories by name against everything the user already has
+        self.categories = {
+            name: category_id for category_id, name in db.session.query(
+                Category.id, Category.name
+            ).filter(Category.user_id == user_id)
+        }
+        self.new_categories = {}
+        self.task_ids = {}  # exported task id -> new task id
+        self.tasks = []
+        self.subtasks = []
+        self.counts = {'categories': 0, 'tasks': 0, 'subtasks': 0}
+    
+    def add_category(self, name, is_default=False):
+        if name not in self.categories and name not in self.new_categories:
+            self.new_categories[name] = is_default
+    
+    def add(self, record):
+        kind = record.get('type')
+        if kind == 'category':
+            name = _parse_field(record, 'category', str)
+            if not name.strip() or len(name) > 50:
+                raise ValueError('category must be 1 to 50 characters')
+            self.add_category(name, _parse_field(record, 'is_default', _parse_bool, False, False))
+        elif kind == 'task':
+            row = _task_row(record)
+            name = _parse_field(record, 'category', str)
+            self.add_category(name)
+            self.tasks.append((_parse_field(record, 'id', str, False), name, row))
+            if len(self.tasks) >= IMPORT_BATCH_SIZE:
+                self.flush_tasks()
+        elif kind == 'subtask':
+            title = _parse_field(record, 'title', str)
+            if not title.strip() or len(title) > 100:
+                raise ValueError('title must be 1 to 100 characters')
+            self.subtasks.append((
+                _parse_field(record, 'task_id', str),
+                title,
+                _parse_field(record, 'is_completed', _parse_bool, False, False)
+            ))
+            if len(self.subtasks) >= IMPORT_BATCH_SIZE:
+                self.flush_subtasks()
+        else:
+            raise ValueError('type must be category, task or subtask')
+    
+    def flush_categories(self):
+        if not self.new_categories:
+            return
+        names = list(self.new_categories)
+        ids = db.session.execute(
+            insert(Category).returning(Category.id, sort_by_parameter_order=True),
+            [
+                {'name': name, 'is_default': self.new_categories[name], 'user_id': self.user_id}
+                for name in names
+            ]
+        ).scalars().all()
+        self.categories.update(zip(names, ids))
+        self.counts['categories'] += len(names)
+        self.new_categories = {}
+    
+    def flush_tasks(self):
+        if not self.tasks:
+            return
+        self.flush_categories()
+        rows = []
+        for _, name, row in self.tasks:
+            row['category_id'] = self.categories[name]
+            row['user_id'] = self.user_id
+            rows.append(row)
+        ids = db.session.execute(
+            insert(Task).returning(Task.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        for (exported_id, _, _), task_id in zip(self.tasks, ids):
+            if exported_id is not None:
+                self.task_ids[exported_id] = task_id
+        self.counts['tasks'] += len(ids)
+        self.tasks = []
+    
+    def flush_subtasks(self):
+        if not self.subtasks:
+            return
+        # Subtasks may refer to tasks that are still buffered
+        self.flush_tasks()
+        rows = []
+        totals = {}
+        for exported_task_id, title, is_completed in self.subtasks:
+            task_id = self.task_ids.get(exported_task_id)
+            if task_id is None:
+                raise TransferError(f'subtask refers to unknown task {exported_task_id}')
+            rows.append({'task_id': task_id, 'title': title, 'is_completed': is_completed})
+            total, done = totals.get(task_id, (0, 0))
+            totals[task_id] = (total + 1, done + (1 if is_completed else 0))
+        
+        if self.dialect == 'postgresql':
+            _copy_subtasks(rows)
+        else:
+            db.session.execute(insert(SubTask), rows)
+        
+        # Keep the tasks' subtask counters in step, relative to earlier batches
+        c = Task.__table__.c
+        db.session.execute(
+            update(Task.__table__).where(c.id == bindparam('b_id')).values(
+                subtask_total=c.subtask_total + bindparam('b_total'),
+                subtask_done=c.subtask_done + bindparam('b_done')
+            ),
+            [
+                {'b_id': task_id, 'b_total': total, 'b_done': done}
+                for task_id, (total, done) in totals.items()
+            ]
+        )
+        self.counts['subtasks'] += len(rows)
+        self.subtasks = []
+    
+    def finish(self):
+        self.flush_categories()
+        self.flush_tasks()
+        self.flush_subtasks()
+        refresh_user_stats(self.user_id)
+        return self.counts
+
+def import_user_data(user_id, stream, fmt='ndjson'):
+    """Import categories, tasks and subtasks from an export stream.
+    
+    Categories are matched by name with the user's existing ones and created
+    when missing. Rows are written in batches of IMPORT_BATCH_SIZE, in the
+    caller's transaction; the caller commits. Raises TransferError for the
+    first record that cannot be read. Returns counts of the created rows.
+    """
+    importer = _Importer(user_id)
+    for line_number, record in read_records(stream, fmt):
+        try:
+            importer.add(record)
+        except ValueError as error:
+            raise TransferError(f'line {line_number}: {error}')
+    try:
+        return importer.finish()
+    except TransferError as error:
+        raise TransferError(f'end of input: {error}')
@@ -1,144 +1,420 @@
-from datetime import datetime, timedelta
-from models import User, Task, Category, SubTask, Achievement
+import base64
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, time as dt_time, timedelta
+from flask import g
+from sqlalchemy import and_, case, delete, func, insert, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from models import User, Task, Category, SubTask, ArchivedTask, Achievement, UserStats, DailyCompletion
 from app import db
+from shards import current_shard_residents
 
-def calculate_achievements(user_id):
-    """Calculate and award achievements based on task completion."""
-    user = User.query.get(user_id)
-    if not user:
-        return []
-    
-    new_achievements = []
-    
-    # Get completed tasks count
-    completed_tasks_count = Task.query.filter_by(
-        user_id=user_id, 
-        is_completed=True
-    ).count()
-    
-    # Achievement definitions with thresholds
-    achievement_definitions = [
-        {
-            'name': 'Task Beginner',
-            'description': 'Complete your first task',
-            'threshold': 1,
-            'trophy_level': 1
-        },
-        {
-            'name': 'Task Enthusiast',
-            'description': 'Complete 10 tasks',
-            'threshold': 10,
-            'trophy_level': 1
-        },
-        {
-            'name': 'Task Master',
-            'description': 'Complete 25 tasks',
-            'threshold': 25,
-            'trophy_level': 2
-        },
-        {
-            'name': 'Task Guru',
-            'description': 'Complete 50 tasks',
-            'threshold': 50,
-            'trophy_level': 2
-        },
-        {
-            'name': 'Task Legend',
-            'description': 'Complete 100 tasks',
-            'threshold': 100,
-            'trophy_level': 3
-        }
-    ]
+def dialect_insert(model):
+    """Get an INSERT for a model that supports ON CONFLICT clauses.
     
-    # Check each achievement definition
-    for achievement_def in achievement_definitions:
-        # Skip if already earned
-        existing_achievement = Achievement.query.filter_by(
-            user_id=user_id, 
-            name=achievement_def['name']
-        ).first()
-        
-        if existing_achievement:
-            continue
-            
-        # Award achievement if threshold met
-        if completed_tasks_count >= achievement_def['threshold']:
-            achievement = Achievement(
-                name=achievement_def['name'],
-                description=achievement_def['description'],
-                trophy_level=achievement_def['trophy_level'],
-                user_id=user_id
+    Returns None when the bound database has no upsert support we use.
+    """
+    dialect = db.session.get_bind(mapper=model.__mapper__).dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(model)
+    if dialect == 'sqlite':
+        return sqlite.insert(model)
+    return None
+
+USER_STATS_COUNTERS = (
+    'tasks_count',
+    'completed_count',
+    'high_priority_completed',
+    'achievements_count',
+    'categories_count',
+)
+
+USER_STATS_STREAK_FIELDS = (
+    'current_streak',
+    'longest_streak',
+    'last_completion_day',
+)
+
+def _as_date(value):
+    # SQLite returns DATE() results as strings
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+TASK_HISTORY_COLUMNS = (
+    'id',
+    'user_id',
+    'category_id',
+    'priority',
+    'is_completed',
+    'completed_at',
+    'last_updated',
+)
+
+def task_history(user_ids=None):
+    """Select live and archived tasks together, for statistics over all history.
+    
+    Returns a subquery with the TASK_HISTORY_COLUMNS of both the task and
+    archived_task tables.
+    """
+    selects = []
+    for model in (Task, ArchivedTask):
+        query = select(*(getattr(model, name) for name in TASK_HISTORY_COLUMNS))
+        if user_ids is not None:
+            query = query.where(model.user_id.in_(user_ids))
+        selects.append(query)
+    return union_all(*selects).subquery('task_history')
+
+def compute_daily_completions(user_ids=None):
+    """Count completed tasks per user and UTC day from source data.
+    
+    Returns a dict mapping user_id to a dict of day -> count.
+    """
+    tasks = task_history(user_ids)
+    day = func.date(tasks.c.completed_at)
+    query = db.session.query(tasks.c.user_id, day, func.count(tasks.c.id)).filter(
+        tasks.c.is_completed == True,
+        tasks.c.completed_at.isnot(None)
+    )
+    
+    daily = {}
+    for user_id, completed_day, count in query.group_by(tasks.c.user_id, day):
+        daily.setdefault(user_id, {})[_as_date(completed_day)] = count
+    return daily
+
+def compute_streaks(days):
+    """Compute the streak fields from a collection of completion days."""
+    current = longest = 0
+    previous = None
+    for day in sorted(days):
+        if previous is not None and day - previous == timedelta(days=1):
+            current += 1
+        else:
+            current = 1
+        longest = max(longest, current)
+        previous = day
+    return {
+        'current_streak': current,
+        'longest_streak': longest,
+        'last_completion_day': previous
+    }
+
+def effective_streak(stats, today=None):
+    """Get the current streak, which lapses once a whole day is missed."""
+    today = today or datetime.utcnow().date()
+    if stats.last_completion_day and stats.last_completion_day >= today - timedelta(days=1):
+        return stats.current_streak
+    return 0
+
+def compute_user_stats(user_ids=None, daily=None):
+    """Count the UserStats counters and streaks from source data.
+    
+    Returns a dict mapping user_id to a dict of field values; the data
+    watermark (data_updated_at) is derived from Task.last_updated. Counts
+    for all users of the current shard (or the given ones) are gathered with
+    one grouped query per source table, archived tasks included. Pass the
+    result of compute_daily_completions as daily to avoid counting
+    completions twice.
+    """
+    def scoped(query, column):
+        if user_ids is not None:
+            query = query.filter(column.in_(user_ids))
+        return query.group_by(column)
+    
+    user_query = db.session.query(User.id)
+    if user_ids is not None:
+        user_query = user_query.filter(User.id.in_(user_ids))
+    # On a shard, only the users living there have source data to count
+    residents = current_shard_residents() if user_ids is None else None
+    counters = {
+        user_id: dict.fromkeys(USER_STATS_COUNTERS, 0) for (user_id,) in user_query
+        if residents is None or user_id in residents
+    }
+    
+    if daily is None:
+        daily = compute_daily_completions(user_ids)
+    for user_id in counters:
+        counters[user_id].update(compute_streaks(daily.get(user_id, {})))
+    
+    tasks = task_history(user_ids)
+    completed = case((tasks.c.is_completed == True, 1), else_=0)
+    high_priority = case((and_(tasks.c.is_completed == True, tasks.c.priority == 3), 1), else_=0)
+    task_rows = db.session.query(
+        tasks.c.user_id, func.count(tasks.c.id), func.sum(completed), func.sum(high_priority),
+        func.max(tasks.c.last_updated)
+    ).group_by(tasks.c.user_id)
+    for user_id, tasks_count, completed_count, high_priority_count, last_updated in task_rows:
+        if user_id in counters:
+            counters[user_id].update(
+                tasks_count=tasks_count,
+                completed_count=completed_count or 0,
+                high_priority_completed=high_priority_count or 0,
+                data_updated_at=last_updated
             )
-            db.session.add(achievement)
-            new_achievements.append(achievement)
-    
-    # Check for priority achievements
-    high_priority_completed = Task.query.filter_by(
-        user_id=user_id, 
-        is_completed=True,
-        priority=3
-    ).count()
-    
-    priority_achievements = [
-        {
-            'name': 'Priority Handler',
-            'description': 'Complete 5 high-priority tasks',
-            'threshold': 5,
-            'trophy_level': 1
-        },
-        {
-            'name': 'Priority Master',
-            'description': 'Complete 20 high-priority tasks',
-            'threshold': 20,
-            'trophy_level': 2
-        }
+    
+    for model, counter in ((Achievement, 'achievements_count'), (Category, 'categories_count')):
+        rows = scoped(db.session.query(model.user_id, func.count(model.id)), model.user_id)
+        for user_id, count in rows:
+            if user_id in counters:
+                counters[user_id][counter] = count
+    
+    return counters
+
+def get_user_stats(user_id, commit=False):
+    """Get the UserStats row for a user, building it if it does not exist yet.
+    
+    A built row is inserted in the caller's transaction, and concurrent
+    requests building the same row do not conflict. Read-only requests pass
+    commit=True so that it is saved at once instead of being rolled back at
+    teardown and rebuilt on every view.
+    """
+    stats = db.session.get(UserStats, user_id)
+    if stats is not None:
+        return stats
+    
+    values = compute_user_stats([user_id])[user_id]
+    stmt = dialect_insert(UserStats)
+    if stmt is not None:
+        db.session.execute(
+            stmt.values(user_id=user_id, **values).on_conflict_do_nothing(index_elements=['user_id'])
+        )
+        stats = db.session.get(UserStats, user_id)
+    else:
+        stats = UserStats(user_id=user_id, **values)
+        db.session.add(stats)
+        db.session.flush()
+    if commit:
+        db.session.commit()
+    return stats
+
+def adjust_user_stats(user_id, **deltas):
+    """Apply counter deltas to a user's UserStats row and bump its data version.
+    
+    The row is updated with a single relative UPDATE in the caller's
+    transaction, so concurrent requests cannot lose increments. Callers
+    commit as usual. Every write route calls this (with no deltas if it
+    changes no counter) so conditional GETs see the change.
+    """
+    c = UserStats.__table__.c
+    values = {
+        name: getattr(c, name) + delta
+        for name, delta in deltas.items() if delta
+    }
+    values['data_version'] = c.data_version + 1
+    values['data_updated_at'] = datetime.utcnow()
+    
+    result = db.session.execute(
+        update(UserStats.__table__)
+        .where(UserStats.__table__.c.user_id == user_id)
+        .values(**values)
+    )
+    if result.rowcount == 0:
+        # Users created before the counters existed have no row yet; counting
+        # from source now already includes this transaction's changes.
+        db.session.flush()
+        get_user_stats(user_id)
+
+def touch_user_data(user_id):
+    """Bump a user's data version after a write that changes no counter."""
+    adjust_user_stats(user_id)
+
+def refresh_user_stats(user_id):
+    """Recount a user's UserStats row and completion rollup from source data.
+    
+    For writes that bypass the incremental counters, such as imports. Runs in
+    the caller's transaction and bumps the user's data version.
+    """
+    daily = compute_daily_completions([user_id])
+    fields = compute_user_stats([user_id], daily=daily)[user_id]
+    fields.pop('data_updated_at', None)
+    
+    db.session.execute(delete(DailyCompletion).where(DailyCompletion.user_id == user_id))
+    rows = [
+        {'user_id': user_id, 'day': day, 'count': count}
+        for day, count in daily.get(user_id, {}).items()
     ]
+    if rows:
+        db.session.execute(insert(DailyCompletion), rows)
     
-    for achievement_def in priority_achievements:
-        existing_achievement = Achievement.query.filter_by(
-            user_id=user_id, 
-            name=achievement_def['name']
-        ).first()
-        
-        if existing_achievement:
-            continue
-            
-        if high_priority_completed >= achievement_def['threshold']:
-            achievement = Achievement(
-                name=achievement_def['name'],
-                description=achievement_def['description'],
-                trophy_level=achievement_def['trophy_level'],
-                user_id=user_id
+    db.session.flush()
+    stats = get_user_stats(user_id)
+    for name, value in fields.items():
+        setattr(stats, name, value)
+    adjust_user_stats(user_id)
+
+def record_completion(user_id, completed_at, count=1):
+    """Count task completions in the daily rollup and the user's streak.
+    
+    Call after the tasks have been marked completed, in the same transaction.
+    """
+    day = completed_at.date()
+    
+    stmt = dialect_insert(DailyCompletion)
+    if stmt is not None:
+        db.session.execute(
+            stmt.values(user_id=user_id, day=day, count=count).on_conflict_do_update(
+                index_elements=['user_id', 'day'],
+                set_={'count': DailyCompletion.__table__.c.count + count}
             )
-            db.session.add(achievement)
-            new_achievements.append(achievement)
+        )
+    else:
+        result = db.session.execute(
+            update(DailyCompletion.__table__)
+            .where(DailyCompletion.__table__.c.user_id == user_id)
+            .where(DailyCompletion.__table__.c.day == day)
+            .values(count=DailyCompletion.__table__.c.count + count)
+        )
+        if result.rowcount == 0:
+            db.session.add(DailyCompletion(user_id=user_id, day=day, count=count))
     
-    # Check for streak achievements (consecutive days with completed tasks)
-    # Implementation of streak achievement would go here
+    # Extend the streak if the last completion was yesterday, restart it
+    # after a gap, and leave it alone for further completions on the same day
+    c = UserStats.__table__.c
+    streak = case(
+        (c.last_completion_day >= day, c.current_streak),
+        (c.last_completion_day == day - timedelta(days=1), c.current_streak + 1),
+        else_=1
+    )
+    result = db.session.execute(
+        update(UserStats.__table__)
+        .where(c.user_id == user_id)
+        .values(
+            current_streak=streak,
+            longest_streak=case((streak > c.longest_streak, streak), else_=c.longest_streak),
+            last_completion_day=case((c.last_completion_day >= day, c.last_completion_day), else_=day)
+        )
+    )
+    if result.rowcount == 0:
+        db.session.flush()
+        get_user_stats(user_id)
+
+def remove_completion(user_id, completed_at, count=1):
+    """Remove deleted tasks' completions from the daily rollup.
     
-    db.session.commit()
-    return new_achievements
+    Streaks are recomputed from the rollup when a day drops out of it.
+    """
+    c = DailyCompletion.__table__.c
+    day = completed_at.date()
+    db.session.execute(
+        update(DailyCompletion.__table__)
+        .where(c.user_id == user_id, c.day == day)
+        .values(count=c.count - count)
+    )
+    emptied = db.session.execute(
+        delete(DailyCompletion.__table__)
+        .where(c.user_id == user_id, c.day == day, c.count <= 0)
+    )
+    if emptied.rowcount:
+        days = [
+            day for (day,) in db.session.query(DailyCompletion.day).filter(
+                DailyCompletion.user_id == user_id
+            )
+        ]
+        db.session.execute(
+            update(UserStats.__table__)
+            .where(UserStats.__table__.c.user_id == user_id)
+            .values(**compute_streaks(days))
+        )
 
-def get_task_progress_stats(user_id):
-    """Get statistics about task progress for the dashboard."""
-    # Count tasks by status
-    not_started = Task.query.filter_by(
-        user_id=user_id, 
-        is_completed=False,
-        status=0
-    ).count()
-    
-    in_progress = Task.query.filter_by(
-        user_id=user_id, 
-        is_completed=False,
-        status=1
-    ).count()
-    
-    completed = Task.query.filter_by(
-        user_id=user_id, 
-        is_completed=True
-    ).count()
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after a TTL.
+    
+    The cache is per process: invalidations in one worker are not seen by
+    the others, so the TTL bounds how long they can serve stale entries.
+    """
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Get a cached value, or None if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
     
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+# Cache of dashboard statistics keyed on the user's data version, which
+# every write bumps, so workers never serve stats older than the ETag
+STATS_CACHE_TTL = 60
+STATS_CACHE_MAX_USERS = 1024
+_stats_cache = TTLCache(STATS_CACHE_TTL, STATS_CACHE_MAX_USERS)
+
+def _user_data_version(user_id):
+    # conditional_on_user_data has usually read it for the ETag already
+    known = g.get('user_data_version')
+    if known is not None and known[0] == user_id:
+        return known[1]
+    return db.session.query(UserStats.data_version).filter(
+        UserStats.user_id == user_id
+    ).scalar()
+
+def get_dashboard_stats(user_id):
+    """Get progress and completion statistics for the dashboard.
+    
+    Both are computed from the active tasks, the user's counters and the
+    completion rollup, and cached per user, data version and (UTC) day.
+    """
+    version = _user_data_version(user_id)
+    if version is None:
+        # No counters row yet; computing the stats builds it
+        return _compute_dashboard_stats(user_id)
+    
+    key = (user_id, version, datetime.utcnow().date())
+    stats = _stats_cache.get(key)
+    if stats is None:
+        stats = _compute_dashboard_stats(user_id)
+        _stats_cache.set(key, stats)
+    return stats
+
+def _compute_dashboard_stats(user_id):
+    """Compute the status breakdown and 7-day completion histogram.
+    
+    Only active tasks are grouped by status; completed tasks, most of which
+    may be archived, are taken from the user's counters and daily rollup.
+    """
+    rows = db.session.query(Task.status, func.count(Task.id)).filter(
+        Task.user_id == user_id,
+        Task.is_completed == False
+    ).group_by(Task.status)
+    
+    not_started = in_progress = 0
+    for status, count in rows:
+        if status == 0:
+            not_started += count
+        elif status == 1:
+            in_progress += count
+    completed = get_user_stats(user_id, commit=True).completed_count
+    
+    return {
+        'progress': _progress_stats(not_started, in_progress, completed),
+        'completion': get_task_completion_stats(user_id, days=7)
+    }
+
+def _progress_stats(not_started, in_progress, completed):
     # Calculate percentage distribution
     total = not_started + in_progress + completed
     
@@ -162,38 +438,233 @@ def get_task_progress_stats(user_id):
         'completed_percent': completed_percent
     }
 
-def get_task_completion_stats(user_id):
-    """Get statistics about task completion over time."""
-    # Get tasks completed in the last 7 days
-    now = datetime.utcnow()
-    seven_days_ago = now - timedelta(days=7)
+def get_task_progress_stats(user_id):
+    """Get statistics about task progress for the dashboard."""
+    return get_dashboard_stats(user_id)['progress']
+
+COMPLETION_PERIODS = ('day', 'week', 'month')
+
+def _period_label(day, period):
+    if period == 'week':
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if period == 'month':
+        return day.strftime('%Y-%m')
+    return day.isoformat()
+
+def get_task_completion_stats(user_id, days=7, period='day'):
+    """Get statistics about task completion over time.
     
-    completed_tasks = Task.query.filter(
-        Task.user_id == user_id,
-        Task.is_completed == True,
-        Task.completed_at >= seven_days_ago
-    ).all()
-    
-    # Group by day
-    daily_completion = {}
-    for i in range(7):
-        day = now - timedelta(days=i)
-        day_str = day.strftime('%Y-%m-%d')
-        daily_completion[day_str] = 0
-    
-    for task in completed_tasks:
-        day_str = task.completed_at.strftime('%Y-%m-%d')
-        if day_str in daily_completion:
-            daily_completion[day_str] += 1
+    Reads the daily completion rollup for the last `days` days and groups
+    it by day, week (labelled by its Monday) or month.
+    """
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
     
-    # Format for chart.js
-    labels = list(daily_completion.keys())
-    labels.reverse()  # Show oldest first
+    counts = dict(db.session.query(DailyCompletion.day, DailyCompletion.count).filter(
+        DailyCompletion.user_id == user_id,
+        DailyCompletion.day >= start
+    ))
     
-    data = list(daily_completion.values())
-    data.reverse()  # Match labels order
+    # Group by period, oldest first
+    buckets = OrderedDict()
+    for i in range(days):
+        day = start + timedelta(days=i)
+        label = _period_label(day, period)
+        buckets[label] = buckets.get(label, 0) + counts.get(day, 0)
     
+    # Format for chart.js
     return {
-        'labels': labels,
-        'data': data
+        'labels': list(buckets.keys()),
+        'data': list(buckets.values())
+    }
+
+def get_category_stats(user_id):
+    """Get total/completed/completion_rate per category in one grouped query.
+    
+    Archived tasks are counted too.
+    """
+    tasks = task_history([user_id])
+    completed = func.sum(case((tasks.c.is_completed == True, 1), else_=0))
+    rows = db.session.query(
+        Category.name, func.count(tasks.c.id), completed
+    ).outerjoin(
+        tasks, tasks.c.category_id == Category.id
+    ).filter(
+        Category.user_id == user_id
+    ).group_by(
+        Category.id, Category.name
+    ).order_by(
+        Category.id
+    )
+    
+    category_stats = []
+    for name, total_tasks, completed_count in rows:
+        completed_count = completed_count or 0
+        if total_tasks > 0:
+            completion_rate = (completed_count / total_tasks) * 100
+        else:
+            completion_rate = 0
+        
+        category_stats.append({
+            'name': name,
+            'total': total_tasks,
+            'completed': completed_count,
+            'completion_rate': completion_rate
+        })
+    return category_stats
+
+def toggle_subtask_completion(user_id, task_id, subtask_id):
+    """Flip a subtask and update its task's counters and progress.
+    
+    Issues one UPDATE per table without loading either row, in the caller's
+    transaction. Returns (subtask_completed, task_progress), or None if the
+    subtask does not exist or the task does not belong to the user.
+    """
+    subtasks = SubTask.__table__
+    tasks = Task.__table__
+    
+    owned_task = select(tasks.c.id).where(tasks.c.id == task_id, tasks.c.user_id == user_id)
+    flip = update(subtasks).where(
+        subtasks.c.id == subtask_id,
+        subtasks.c.task_id == task_id,
+        subtasks.c.task_id.in_(owned_task.scalar_subquery())
+    ).values(
+        is_completed=case((subtasks.c.is_completed == True, False), else_=True)
+    )
+    
+    dialect = db.session.get_bind(mapper=SubTask.__mapper__).dialect
+    if dialect.update_returning:
+        subtask_completed = db.session.execute(flip.returning(subtasks.c.is_completed)).scalar()
+    else:
+        if db.session.execute(flip).rowcount == 0:
+            return None
+        subtask_completed = db.session.execute(
+            select(subtasks.c.is_completed).where(subtasks.c.id == subtask_id)
+        ).scalar()
+    if subtask_completed is None:
+        return None
+    
+    delta = 1 if subtask_completed else -1
+    bump = update(tasks).where(tasks.c.id == task_id).values(
+        subtask_done=tasks.c.subtask_done + delta,
+        progress=case(
+            (tasks.c.subtask_total > 0, (tasks.c.subtask_done + delta) * 100 // tasks.c.subtask_total),
+            else_=tasks.c.progress
+        )
+    )
+    if dialect.update_returning:
+        task_progress = db.session.execute(bump.returning(tasks.c.progress)).scalar()
+    else:
+        db.session.execute(bump)
+        task_progress = db.session.execute(
+            select(tasks.c.progress).where(tasks.c.id == task_id)
+        ).scalar()
+    
+    return bool(subtask_completed), task_progress
+
+def sync_subtasks(task, entries):
+    """Reconcile a task's subtasks with the submitted ones, by identity.
+    
+    entries is a list of (subtask_id, title, is_completed), where subtask_id
+    is empty for new subtasks. Entries without a known subtask_id, as posted
+    by forms that do not render it, are matched to the remaining stored
+    subtasks by title, then by position. Unchanged rows are left alone,
+    changed rows are updated with one executemany UPDATE, and new and
+    removed rows go in with one INSERT and one DELETE. The task's subtask
+    counters are set to match; the caller commits.
+    """
+    existing = {
+        row.id: row for row in db.session.query(
+            SubTask.id, SubTask.title, SubTask.is_completed
+        ).filter(SubTask.task_id == task.id).order_by(SubTask.id)
     }
+    
+    kept = set()
+    matched = []
+    for subtask_id, title, is_completed in entries:
+        try:
+            subtask_id = int(subtask_id)
+        except (TypeError, ValueError):
+            subtask_id = None
+        if subtask_id not in existing or subtask_id in kept:
+            subtask_id = None
+        else:
+            kept.add(subtask_id)
+        matched.append([subtask_id, title, bool(is_completed)])
+    
+    unmatched = [subtask_id for subtask_id in existing if subtask_id not in kept]
+    for entry in matched:
+        if entry[0] is None:
+            same_title = [subtask_id for subtask_id in unmatched if existing[subtask_id].title == entry[1]]
+            if same_title:
+                entry[0] = same_title[0]
+                unmatched.remove(same_title[0])
+    for entry, subtask_id in zip([entry for entry in matched if entry[0] is None], list(unmatched)):
+        entry[0] = subtask_id
+        unmatched.remove(subtask_id)
+    
+    inserts = []
+    updates = []
+    for subtask_id, title, is_completed in matched:
+        if subtask_id is None:
+            inserts.append({'task_id': task.id, 'title': title, 'is_completed': is_completed})
+            continue
+        
+        kept.add(subtask_id)
+        row = existing[subtask_id]
+        if row.title != title or bool(row.is_completed) != is_completed:
+            updates.append({'id': subtask_id, 'title': title, 'is_completed': is_completed})
+    
+    removed = [subtask_id for subtask_id in existing if subtask_id not in kept]
+    if removed:
+        db.session.execute(
+            delete(SubTask)
+            .where(SubTask.task_id == task.id, SubTask.id.in_(removed))
+            .execution_options(synchronize_session=False)
+        )
+    if updates:
+        db.session.execute(update(SubTask), updates)
+    if inserts:
+        db.session.execute(insert(SubTask), inserts)
+    
+    task.subtask_total = len(entries)
+    task.subtask_done = sum(1 for entry in entries if entry[2])
+
+def apply_task_filters(query, filters, model=Task):
+    """Apply the category/priority/status filters used by the task list.
+    
+    Pass model=ArchivedTask to filter archived tasks the same way. Raises
+    ValueError when category_id or priority is not a number.
+    """
+    category_id = filters.get('category_id')
+    priority = filters.get('priority')
+    status = filters.get('status')
+    
+    if category_id and category_id != 'all':
+        query = query.filter(model.category_id == int(category_id))
+    
+    if priority and priority != 'all':
+        query = query.filter(model.priority == int(priority))
+    
+    if status and status != 'all':
+        if status == 'upcoming':
+            query = query.filter(model.due_date > date.today())
+        elif status == 'today':
+            query = query.filter(model.due_date == date.today())
+        elif status == 'overdue':
+            query = query.filter(model.due_date < date.today())
+    
+    return query
+
+def encode_task_cursor(due_date, due_time, task_id):
+    """Encode a task's (due_date, due_time, id) sort key as an opaque cursor."""
+    key = [due_date.isoformat(), due_time.isoformat(), task_id]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+def decode_task_cursor(cursor):
+    """Decode a cursor from encode_task_cursor. Raises ValueError if invalid."""
+    try:
+        due_date, due_time, task_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return date.fromisoformat(due_date), dt_time.fromisoformat(due_time), int(task_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError('Invalid cursor') from e